@@ -1,3 +1,31 @@
-from .datadict_class import datadict
-from .datadict_main import cli
-from .datadict_yaml import *
+import importlib
+
+# Attributes are imported on first access, so that importing the package, or running a CLI command, only pays for
+# the modules it uses.
+_LAZY_ATTRIBUTES = {
+    "datadict": "datadict_class",
+    "cli": "datadict_main",
+    "check_files_for_models": "datadict_yaml",
+    "combine_column_lists": "datadict_yaml",
+    "merge_file_models": "datadict_yaml",
+    "updated_existing_files": "datadict_yaml",
+    "run_codegen": "datadict_yaml",
+    "add_missing_models": "datadict_yaml",
+    "yaml_for_each_model": "datadict_yaml",
+    "generate_model_yamls": "datadict_yaml",
+}
+
+__all__ = list(_LAZY_ATTRIBUTES)
+
+
+def __getattr__(name):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f"{__name__}.{_LAZY_ATTRIBUTES[name]}")
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -0,0 +1,424 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from datadict import datadict_helpers, datadict_index, datadict_report
+from datadict.datadict_profile import phase
+
+DEFAULT_INDEX_PATH = os.path.join(".datadict", "index.json")
+
+# The events recorded as column changes, with the kind of change each is recorded as
+COLUMN_EVENTS = {
+    "column_updated": "description_updated",
+    "column_added": "added",
+    "column_removed": "removed",
+    "data_type_added": "data_type_added",
+}
+
+
+class ColumnChange:
+    """
+    A change made to a column of a model file.
+    """
+
+    __slots__ = ("column", "model", "change", "old", "new")
+
+    def __init__(self, column, model, change, old=None, new=None) -> None:
+        """
+        Initialize a column change.
+
+        Parameters:
+            column (str): The name of the column.
+            model (str): The name of the model.
+            change (str): The kind of change, one of the values of COLUMN_EVENTS.
+            old (str, optional): The description before the change, or None if the column had none.
+            new (str, optional): The description after the change, or the data type added.
+
+        Returns:
+            None
+        """
+        self.column = column
+        self.model = model
+        self.change = change
+        self.old = old
+        self.new = new
+
+    def __repr__(self) -> str:
+        return (
+            f"ColumnChange(column={self.column!r}, model={self.model!r}, change={self.change!r}, "
+            f"old={self.old!r}, new={self.new!r})"
+        )
+
+
+class FileChange:
+    """
+    The changes made to a single file during a run.
+    """
+
+    __slots__ = ("path", "columns", "written", "created", "removed")
+
+    def __init__(self, path) -> None:
+        """
+        Initialize the changes of a file, with nothing changed yet.
+
+        Parameters:
+            path (str): The normalised path of the file.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.columns = []
+        self.written = False
+        self.created = False
+        self.removed = False
+
+    def __repr__(self) -> str:
+        return (
+            f"FileChange(path={self.path!r}, columns={len(self.columns)}, written={self.written}, "
+            f"created={self.created}, removed={self.removed})"
+        )
+
+
+class PendingWrite:
+    """
+    A write of a file, or its removal, that has been deferred until the caller writes it.
+    """
+
+    __slots__ = ("path", "content")
+
+    def __init__(self, path, content) -> None:
+        """
+        Initialize a deferred write.
+
+        Parameters:
+            path (str): The normalised path of the file.
+            content (str): The content to write, or None to remove the file.
+
+        Returns:
+            None
+        """
+        self.path = path
+        self.content = content
+
+    def write(self) -> None:
+        """
+        Write the content to the file, or remove the file.
+
+        Returns:
+            None
+        """
+        if self.content is None:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        with phase("write", self.path), open(self.path, "w") as file:
+            file.write(self.content)
+
+    def __repr__(self) -> str:
+        return f"PendingWrite(path={self.path!r}, remove={self.content is None})"
+
+
+class RunResult:
+    """
+    The result of a recorded run: the changes made to each file, the writes still pending and the timing.
+    """
+
+    __slots__ = ("files", "pending_writes", "counts", "seconds")
+
+    def __init__(self) -> None:
+        """
+        Initialize an empty result.
+
+        Returns:
+            None
+        """
+        self.files = {}
+        self.pending_writes = {}
+        self.counts = {}
+        self.seconds = 0.0
+
+    @property
+    def changed_files(self) -> list:
+        """
+        The files that were written, removed or had columns changed, sorted by path.
+        """
+        return [
+            self.files[path]
+            for path in sorted(self.files)
+            if self.files[path].written
+            or self.files[path].removed
+            or self.files[path].columns
+        ]
+
+    @property
+    def created_files(self) -> list:
+        """
+        The sorted paths of the files that didn't exist before the run.
+        """
+        return sorted(path for path, file in self.files.items() if file.created)
+
+    @property
+    def removed_files(self) -> list:
+        """
+        The sorted paths of the files that were removed.
+        """
+        return sorted(path for path, file in self.files.items() if file.removed)
+
+    def write(self, paths=None) -> list:
+        """
+        Write the pending writes, e.g. after filtering them or to write them in a batch.
+
+        Parameters:
+            paths (iterable, optional): The paths of the files to write. Defaults to every pending write.
+
+        Returns:
+            list: The normalised paths that were written or removed, in the order they were first deferred.
+        """
+        if paths is None:
+            selected = list(self.pending_writes)
+        else:
+            wanted = {os.path.normpath(path) for path in paths}
+            selected = [path for path in self.pending_writes if path in wanted]
+        for path in selected:
+            self.pending_writes.pop(path).write()
+        return selected
+
+    def __repr__(self) -> str:
+        return (
+            f"RunResult(changed_files={len(self.changed_files)}, pending_writes={len(self.pending_writes)}, "
+            f"seconds={self.seconds:.3f})"
+        )
+
+
+class _recorder:
+    def __init__(self, write) -> None:
+        self.write = write
+        self.result = RunResult()
+        self._lock = threading.Lock()
+
+    def _file(self, path) -> FileChange:
+        path = os.path.normpath(path)
+        file = self.result.files.get(path)
+        if file is None:
+            file = self.result.files[path] = FileChange(path)
+        return file
+
+    def event(self, name, fields) -> None:
+        with self._lock:
+            self.result.counts[name] = self.result.counts.get(name, 0) + 1
+            change = COLUMN_EVENTS.get(name)
+            if change is None or fields.get("file") is None:
+                return
+            self._file(fields["file"]).columns.append(
+                ColumnChange(
+                    fields["column"],
+                    fields.get("model"),
+                    change,
+                    fields.get("old"),
+                    fields.get("data_type", fields.get("new")),
+                )
+            )
+
+    def _mark_written(self, file_path) -> None:
+        file = self._file(file_path)
+        if not file.written and not os.path.exists(file_path):
+            file.created = True
+        file.written = True
+
+    def write_file(self, file_path, content) -> None:
+        pending = PendingWrite(os.path.normpath(file_path), content)
+        with self._lock:
+            self._mark_written(file_path)
+            if self.write:
+                pending.write()
+            else:
+                self.result.pending_writes[pending.path] = pending
+
+    def append_file(self, file_path, content) -> None:
+        path = os.path.normpath(file_path)
+        with self._lock:
+            self._mark_written(file_path)
+            if self.write:
+                with phase("write", path), open(path, "a") as file:
+                    file.write(content)
+                return
+            # A deferred append extends the content the file will be written with
+            pending = self.result.pending_writes.get(path)
+            if pending is not None:
+                current = pending.content or ""
+            elif os.path.exists(path):
+                with open(path, "r") as file:
+                    current = file.read()
+            else:
+                current = ""
+            self.result.pending_writes[path] = PendingWrite(path, current + content)
+
+    def remove_file(self, file_path) -> None:
+        pending = PendingWrite(os.path.normpath(file_path), None)
+        with self._lock:
+            self._file(file_path).removed = True
+            if self.write:
+                pending.write()
+            else:
+                self.result.pending_writes[pending.path] = pending
+
+    def pending_content(self, file_path):
+        pending = self.result.pending_writes.get(os.path.normpath(file_path))
+        return pending.content if pending is not None else None
+
+
+@contextmanager
+def recording(write=True):
+    """
+    Record the changes made by the runs in the enclosed block, instead of only logging them.
+
+    Every model file and dictionary write, and every column change, made by the 'datadict' class or
+    'generate_model_yamls' in the block is recorded in the yielded result. With 'write' set to False, the files are
+    not written: the writes are kept in 'pending_writes', and later reads of the same files within the block see the
+    pending content, until the caller writes them with 'RunResult.write'.
+
+    Only one run can be recorded at a time.
+
+    Parameters:
+        write (bool, optional): Write files as the run goes. Defaults to True.
+
+    Yields:
+        RunResult: The result, which is complete when the block exits.
+
+    Raises:
+        RuntimeError: If a run is already being recorded.
+    """
+    if datadict_helpers._file_writer is not None:
+        raise RuntimeError("A run is already being recorded")
+    recorder = _recorder(write)
+    datadict_helpers._file_writer = recorder
+    datadict_report.add_listener(recorder.event)
+    started = time.perf_counter()
+    try:
+        yield recorder.result
+    finally:
+        datadict_report.remove_listener(recorder.event)
+        datadict_helpers._file_writer = None
+        recorder.result.seconds = time.perf_counter() - started
+
+
+def run_apply(instance, directory, files=None, index_path=DEFAULT_INDEX_PATH) -> None:
+    """
+    Apply a dictionary to a project and collate it, keeping the index of each file's columns up to date.
+
+    This is the work of 'datadict apply', shared by the CLI and 'apply'. A full run only keeps the index up to date
+    if it already exists, so that applying the dictionary doesn't add an index to projects that never use it; a run
+    on a list of files builds and saves it.
+
+    Parameters:
+        instance (datadict): The loaded dictionary.
+        directory (str): The directory containing the model YAML files.
+        files (list, optional): The files to apply the dictionary to, with the columns of every other file taken
+            from the index. Defaults to every file in the directory.
+        index_path (str, optional): The path to the persisted index, or None to build it in memory and not save
+            it. Defaults to '.datadict/index.json'.
+
+    Returns:
+        None
+    """
+    if files is None and (index_path is None or not os.path.exists(index_path)):
+        instance.apply_data_dictionary_to_path(directory)
+        instance.collate_output_dictionary()
+        return
+    if index_path is None:
+        ledger = datadict_index.empty_index(instance.layer_paths, directory)
+    else:
+        ledger = datadict_index.load_index(index_path, instance.layer_paths, directory)
+    if files is not None:
+        if not ledger["files"]:
+            datadict_index.update_index(ledger)
+        removed_files = instance.apply_data_dictionary_to_files(files)
+        datadict_index.record_fields(
+            ledger,
+            instance.applied_files + removed_files,
+            instance.existing_fields,
+        )
+        instance.existing_fields = datadict_index.ledger_fields(ledger)
+    else:
+        instance.apply_data_dictionary_to_path(directory)
+        datadict_index.record_fields(
+            ledger,
+            instance.applied_files,
+            instance.existing_fields,
+            replace=True,
+        )
+    instance.collate_output_dictionary()
+    if index_path is not None:
+        datadict_index.record_dictionary(
+            ledger, instance.dictionary_yml, instance.dictionary_path
+        )
+        datadict_index.save_index(ledger, index_path)
+
+
+def apply(
+    dictionary="datadictionary.yml",
+    directory="models/",
+    files=None,
+    output_layer=None,
+    index_path=DEFAULT_INDEX_PATH,
+    write=True,
+) -> RunResult:
+    """
+    Apply a dictionary to a project and collate it, as 'datadict apply' does, and return the changes made.
+
+    Parameters:
+        dictionary (str or list): The path to the dictionary file, or the paths of the dictionary layers. Defaults
+            to 'datadictionary.yml'.
+        directory (str, optional): The directory containing the model YAML files. Defaults to 'models/'.
+        files (list, optional): The files to apply the dictionary to. Defaults to every file in the directory.
+        output_layer (str, optional): The dictionary layer to collate into. Defaults to the last layer.
+        index_path (str, optional): The path to the persisted index. Defaults to '.datadict/index.json'.
+        write (bool, optional): Write the model files and dictionary. When False, the writes are returned in
+            'pending_writes', and the index isn't saved, as it would record files that haven't been written.
+            Defaults to True.
+
+    Returns:
+        RunResult: The changes made to each file, the pending writes and the timing of the run.
+    """
+    from datadict.datadict_class import datadict
+
+    if isinstance(dictionary, str):
+        dictionary = [dictionary]
+    with recording(write) as result:
+        instance = datadict(
+            list(dictionary),
+            detailed_logs=False,
+            output_layer=output_layer,
+            docs_directory=directory,
+        )
+        run_apply(instance, directory, files, index_path if write else None)
+    return result
+
+
+def generate(
+    directory, name="models.yml", unique_model_yaml=False, write=True, **options
+) -> RunResult:
+    """
+    Generate model YAML files, as 'datadict generate' does, and return the changes made.
+
+    Parameters:
+        directory (str): The directory containing the models.
+        name (str, optional): The name of the file to add models missing from existing files to. Defaults to
+            'models.yml'.
+        unique_model_yaml (bool, optional): Write each model to its own file. Defaults to False.
+        write (bool, optional): Write the model files. When False, the writes and removals are returned in
+            'pending_writes'. Defaults to True.
+        **options: The other options of 'datadict_yaml.generate_model_yamls', e.g. 'select' or 'columns_from'.
+
+    Returns:
+        RunResult: The changes made to each file, the pending writes and the timing of the run.
+    """
+    from datadict import datadict_yaml
+
+    with recording(write) as result:
+        datadict_yaml.generate_model_yamls(
+            directory, name, unique_model_yaml, **options
+        )
+    return result
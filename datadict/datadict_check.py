@@ -0,0 +1,296 @@
+import logging
+import os
+
+from datadict import (
+    datadict_cluster,
+    datadict_docs,
+    datadict_entry,
+    datadict_helpers,
+    datadict_scanner,
+)
+
+EXIT_OK = 0
+EXIT_FINDINGS = 1
+EXIT_ERROR = 2
+
+
+def read_model_fields(file_path) -> dict:
+    """
+    Read the fields of a model YAML file with the streaming, read-only scanner.
+
+    This function is run in worker processes by 'collect_fields', so it only takes and returns plain data.
+
+    Parameters:
+        file_path (str): The path to the YAML file.
+
+    Returns:
+        dict: A dictionary with the 'file' path, the list of 'fields' (see 'datadict_index.collect_file_fields'),
+            or None if the file doesn't contain models, and an 'error' message if the file couldn't be read. Files
+            without a top-level 'models' key aren't parsed, and are marked as 'skipped'.
+    """
+    try:
+        if not datadict_helpers.might_contain_models(file_path):
+            return {"file": file_path, "fields": None, "error": None, "skipped": True}
+        return {
+            "file": file_path,
+            "fields": datadict_scanner.read_file_fields(file_path, prefilter=False),
+            "error": None,
+        }
+    except Exception as error:
+        return {"file": file_path, "fields": None, "error": str(error)}
+
+
+def collect_fields(file_paths, jobs=None) -> list:
+    """
+    Read the fields of several model YAML files, in parallel across processes.
+
+    Parameters:
+        file_paths (list): The paths of the YAML files to read.
+        jobs (int, optional): The number of processes to use. Defaults to the number of CPUs. With 1 job, or a
+            single file, the files are read in the current process.
+
+    Returns:
+        list: The results of 'read_model_fields' for each file, in the same order as 'file_paths'.
+    """
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(file_paths) <= 1:
+        return [read_model_fields(file_path) for file_path in file_paths]
+    from concurrent.futures import ProcessPoolExecutor
+
+    chunksize = max(1, len(file_paths) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(read_model_fields, file_paths, chunksize=chunksize))
+
+
+def check_dictionary(
+    dictionary_entries,
+    file_fields,
+    normalize=None,
+    similarity=None,
+    resolve=None,
+    base_layers=(),
+) -> dict:
+    """
+    Compare the columns of the model files with the dictionary, without changing either.
+
+    The comparison mirrors what 'datadict apply' would do. The report lists:
+    - 'drifted_descriptions': columns whose description differs from the non-empty description of their
+      dictionary entry, and would be overwritten.
+    - 'missing_from_dictionary': column names that don't match any dictionary entry, alias or pattern alias.
+    - 'description_conflicts': column names that would be given new 'description_versions', because their
+      models disagree on the description and the dictionary doesn't define one.
+    - 'models_changed': dictionary entries whose 'models' would change, with the models added and removed.
+
+    Parameters:
+        dictionary_entries (list): The dictionary entries, each with a 'name', 'description', 'aliases' and,
+            optionally, 'models' and 'description_versions'.
+        file_fields (dict): A dictionary mapping each model file path to its list of fields.
+        normalize (function, optional): The function returned by 'datadict_entry.build_normalizer', to match and
+            group column names by their normalized name as 'apply' does. Defaults to none.
+        similarity (float, optional): The 'description_similarity' of the dictionary, to replace near-duplicate
+            descriptions with their canonical description as 'apply' does. Defaults to none.
+        resolve (function, optional): The function returned by 'datadict_docs.build_resolver', so that a docs
+            block reference and the description it resolves to aren't reported as conflicting descriptions. Defaults
+            to none.
+        base_layers (list, optional): The entries of the dictionary layers beneath 'dictionary_entries', from the
+            lowest precedence, in the same format. Columns are matched across every layer, but, as with 'apply',
+            the columns matched by these layers aren't collated into 'dictionary_entries'. Defaults to none.
+
+    Returns:
+        dict: The report, with a list for each of the categories above.
+    """
+    key = normalize or (lambda name: name)
+    entries_by_name = {}
+    for entry in dictionary_entries:
+        entries_by_name.setdefault(key(entry["name"]), entry)
+    # Columns are matched in the same way as 'apply', including pattern aliases and normalized names
+    layers = list(base_layers) + [dictionary_entries]
+    loaded_layers = [datadict_entry.load_entries(entries) for entries in layers]
+    items = {
+        id(entry): item
+        for entries, loaded_entries in zip(layers, loaded_layers)
+        for entry, item in zip(loaded_entries, entries)
+    }
+    own_entries = {id(entry) for entry in loaded_layers[-1]}
+    matcher = datadict_entry.compile_matcher(loaded_layers, normalize)
+
+    drifted = []
+    missing = {}
+    descriptions = {}
+    models = {}
+    for file_path, fields in sorted(file_fields.items()):
+        for field in fields:
+            name = field["name"]
+            field_key = key(name)
+            description = field.get("description", "")
+            matched = matcher.match(name)
+            entry = items[id(matched[0])] if matched else None
+            if entry is None:
+                missing.setdefault(field_key, set()).add(field["model"])
+            elif entry["description"] and entry["description"] != description:
+                # A literal description matching the entry's docs block is still drift, as 'apply' rewrites it
+                # to the reference
+                drifted.append(
+                    {
+                        "file": file_path,
+                        "model": field["model"],
+                        "column": name,
+                        "expected": entry["description"],
+                        "actual": description,
+                    }
+                )
+                description = entry["description"]
+            if matched and id(matched[0]) not in own_entries:
+                continue
+            if description:
+                versions = descriptions.setdefault(field_key, {})
+                versions[description] = versions.get(description, 0) + 1
+            models.setdefault(field_key, set()).add(field["model"])
+
+    if resolve is not None:
+        descriptions = {
+            name: datadict_docs.collapse_versions(versions, resolve)
+            if len(versions) > 1
+            else versions
+            for name, versions in descriptions.items()
+        }
+
+    if similarity is not None:
+        # Each column is clustered on its own, as 'collate_entries' does
+        for name, versions in descriptions.items():
+            if len(versions) > 1:
+                canonical = datadict_cluster.canonical_descriptions(
+                    versions, similarity
+                )
+                descriptions[name] = {
+                    canonical.get(version, version) for version in versions
+                }
+
+    conflicts = []
+    for name, versions in sorted(descriptions.items()):
+        entry = entries_by_name.get(name)
+        current = sorted(entry.get("description_versions") or []) if entry else []
+        if len(versions) > 1 and sorted(versions) != current:
+            conflicts.append(
+                {
+                    "name": entry["name"] if entry else name,
+                    "description_versions": sorted(versions),
+                }
+            )
+
+    models_changed = []
+    for name in sorted(set(entries_by_name) | set(models)):
+        entry = entries_by_name.get(name)
+        current = set(entry.get("models") or []) if entry else set()
+        expected = models.get(name, set())
+        if current != expected:
+            models_changed.append(
+                {
+                    "name": entry["name"] if entry else name,
+                    "added": sorted(expected - current),
+                    "removed": sorted(current - expected),
+                }
+            )
+
+    return {
+        "drifted_descriptions": drifted,
+        "missing_from_dictionary": [
+            {"name": name, "models": sorted(missing[name])} for name in sorted(missing)
+        ],
+        "description_conflicts": conflicts,
+        "models_changed": models_changed,
+    }
+
+
+def run_check(dictionary_path, directory, jobs=None) -> dict:
+    """
+    Check a project against its dictionary without writing to any file.
+
+    Parameters:
+        dictionary_path (str or list): The path to the dictionary file, or the paths of the dictionary layers, from
+            the lowest to the highest precedence. The last layer is the one collation is checked against.
+        directory (str): The directory containing the model YAML files.
+        jobs (int, optional): The number of processes used to read the model files. Defaults to the number of CPUs.
+
+    Returns:
+        dict: The report from 'check_dictionary', with the 'errors' encountered reading files, a 'summary' of
+            the number of findings in each category and the 'exit_code' the command should exit with.
+    """
+    if isinstance(dictionary_path, str):
+        dictionary_path = [dictionary_path]
+    layer_paths = list(dictionary_path)
+    errors = []
+    layers = []
+    # Column names are normalized as set by the last layer with a 'normalize' key, as 'apply' does
+    normalize = None
+    similarity = None
+    for path in layer_paths:
+        try:
+            dictionary_yml = (
+                datadict_helpers.load_yaml_file_fast(path)
+                if os.path.isfile(path)
+                else {}
+            ) or {}
+            entries = [
+                {
+                    **entry,
+                    "description": entry.get("description") or "",
+                    "aliases": list(entry.get("aliases") or []),
+                }
+                for entry in dictionary_yml.get("dictionary") or []
+            ]
+            if dictionary_yml.get("normalize") is not None:
+                normalize = datadict_entry.build_normalizer(dictionary_yml["normalize"])
+            if path == layer_paths[-1]:
+                similarity = datadict_cluster.similarity_threshold(
+                    dictionary_yml.get("description_similarity")
+                )
+        except Exception as error:
+            errors.append({"file": path, "error": str(error)})
+            entries = []
+        layers.append(entries)
+
+    file_paths = datadict_helpers.list_directory_files(directory, [".yml", ".yaml"])
+    if file_paths is None or not os.path.isdir(directory):
+        errors.append({"file": directory, "error": "Directory doesn't exist"})
+        file_paths = []
+    layer_files = {os.path.abspath(path) for path in layer_paths}
+    file_paths = [
+        file_path
+        for file_path in file_paths
+        if os.path.abspath(file_path) not in layer_files
+    ]
+
+    file_fields = {}
+    skipped = 0
+    for result in collect_fields(file_paths, jobs):
+        if result.get("skipped"):
+            skipped += 1
+        elif result["error"] is not None:
+            errors.append({"file": result["file"], "error": result["error"]})
+        elif result["fields"] is not None:
+            file_fields[result["file"]] = result["fields"]
+
+    report = check_dictionary(
+        layers[-1],
+        file_fields,
+        normalize,
+        similarity,
+        datadict_docs.build_resolver(directory) if os.path.isdir(directory) else None,
+        layers[:-1],
+    )
+    report["errors"] = errors
+    report["summary"] = {key: len(value) for key, value in report.items()}
+    report["summary"]["files_checked"] = len(file_fields)
+    report["summary"]["files_skipped"] = skipped
+    if errors:
+        report["exit_code"] = EXIT_ERROR
+    elif any(len(value) for key, value in report.items() if key != "summary"):
+        report["exit_code"] = EXIT_FINDINGS
+    else:
+        report["exit_code"] = EXIT_OK
+    logging.info(
+        f"Checked {len(file_fields)} model files: "
+        + ", ".join(f"{key} {value}" for key, value in report["summary"].items())
+    )
+    return report
@@ -1,37 +1,188 @@
+import io
 import logging
 import os
 
-import ruamel.yaml
-
-from datadict import datadict_helpers
+from datadict import (
+    datadict_cluster,
+    datadict_docs,
+    datadict_entry,
+    datadict_helpers,
+    datadict_progress,
+    datadict_report,
+)
+from datadict.datadict_profile import phase
 
 
 class datadict:
-    def __init__(self, dictionary_file_path, detailed_logs=True) -> None:
+    def __init__(
+        self,
+        dictionary_file_path,
+        detailed_logs=True,
+        output_layer=None,
+        docs_directory=None,
+        read_only=False,
+    ) -> None:
         """
         Initialize the object with the given dictionary file path and detailed logging settings.
 
         This constructor method is used to initialize an instance of the class. It sets the attributes
-        'detailed_logs', 'dictionary_path', 'dictionary_yml', 'dictionary_items', 'existing_fields',
-        and 'missing_fields' based on the provided inputs. The method also initializes logging and YAML
+        'detailed_logs', 'dictionary_path', 'dictionary_entries', 'dictionary_items', 'existing_fields',
+        'missing_fields' and 'applied_files' based on the provided inputs. The method also initializes logging and YAML
         configurations and loads the dictionary from the specified file.
 
+        The entries of the dictionary are held as 'DictionaryEntry' objects, and are only converted back to YAML
+        through the 'dictionary_yml' property when the dictionary is written.
+
+        Several dictionary files can be given as layers, from the lowest to the highest precedence, e.g. a
+        company-wide dictionary followed by a domain dictionary. The layers are merged into a single lookup (see
+        'datadict_entry.build_layered_matcher'), so an entry in a later layer overrides the entry with the same name
+        in an earlier one. Only the output layer, which defaults to the last, is collated and written to, and it is
+        the one held in 'dictionary_path', 'dictionary_entries' and 'dictionary_yml'. The other layers are read-only.
+
+        Descriptions that reference docs blocks, e.g. "{{ doc('customer_id') }}", are resolved against the docs
+        blocks in the '.md' files of 'docs_directory' when the dictionary is collated (see 'datadict_docs').
+
+        A read-only dictionary is loaded with the fast, non round-trip loader, isn't created if it doesn't exist and
+        is never written. It is used to apply the dictionary to model YAML streamed through
+        'apply_data_dictionary_to_stream'.
+
         Parameters:
-            dictionary_file_path (str): The file path to the YAML dictionary file.
+            dictionary_file_path (str or list): The file path to the YAML dictionary file, or a list of the file paths
+                                                of the dictionary layers.
             detailed_logs (bool, optional): Determines whether detailed log messages with 'info' level
                                             should be logged. Defaults to True.
+            output_layer (str, optional): The file path of the layer to collate the dictionary into. Defaults to
+                                          the last layer.
+            docs_directory (str, optional): The directory containing the docs blocks. Defaults to the directory
+                                            given to 'apply_data_dictionary_to_path'.
+            read_only (bool, optional): Never create or write the dictionary file. Defaults to False.
 
         Returns:
             None
+
+        Raises:
+            ValueError: If the output layer isn't one of the layers.
         """
         self.detailed_logs = detailed_logs
         self._init_logging()
         self._init_yaml()
-        self.dictionary_path = dictionary_file_path
-        self.dictionary_yml = self._format_dictionary(self._try_load_dictionary())
-        self.dictionary_items = self._parse_aliases(self.dictionary_yml)
+        if isinstance(dictionary_file_path, str):
+            dictionary_file_path = [dictionary_file_path]
+        self.layer_paths = list(dictionary_file_path)
+        if output_layer is None:
+            output_layer = self.layer_paths[-1]
+        if output_layer not in self.layer_paths:
+            raise ValueError(
+                f"The output layer '{output_layer}' isn't one of the dictionary layers"
+            )
+        self.dictionary_path = output_layer
+        self.docs_directory = docs_directory
+        self.read_only = read_only
+        self._load_layers()
+        self.dictionary_yml = self._try_load_dictionary()
         self.existing_fields = []
         self.missing_fields = []
+        self.applied_files = []
+
+    @property
+    def dictionary_yml(self) -> dict:
+        """
+        The dictionary YAML data, with the 'dictionary' list converted from the current entries.
+
+        Any other keys of the dictionary file, and its comments, are kept as they were loaded.
+        """
+        self._dictionary_document["dictionary"] = datadict_entry.entries_to_yaml(
+            self.dictionary_entries
+        )
+        return self._dictionary_document
+
+    @dictionary_yml.setter
+    def dictionary_yml(self, dictionary_yml) -> None:
+        if dictionary_yml is None:
+            dictionary_yml = {}
+        # Column names are normalized as set by the last layer with a 'normalize' key
+        normalizations = None
+        for path in self.layer_paths:
+            if path == self.dictionary_path:
+                layer_normalizations = dictionary_yml.get("normalize")
+            else:
+                layer_normalizations = self._layer_normalize.get(path)
+            if layer_normalizations is not None:
+                normalizations = layer_normalizations
+        self._normalize = datadict_entry.build_normalizer(normalizations or ())
+        # Near-duplicate descriptions are only clustered when the output layer sets 'description_similarity'
+        self._similarity = datadict_cluster.similarity_threshold(
+            dictionary_yml.get("description_similarity")
+        )
+        self._set_entries(datadict_entry.load_entries(dictionary_yml.get("dictionary")))
+        # The entries replace the loaded items, so they don't have to be kept in memory
+        dictionary_yml["dictionary"] = []
+        self._dictionary_document = dictionary_yml
+
+    def _set_entries(self, entries) -> None:
+        """
+        Replace the dictionary entries and rebuild the lookups derived from them.
+
+        Parameters:
+            entries (list): The new list of DictionaryEntry objects.
+
+        Returns:
+            None
+        """
+        self.dictionary_entries = entries
+        self.dictionary_items = [name for entry in entries for name in entry.names]
+        layers = [
+            entries if path == self.dictionary_path else self._layer_entries[path]
+            for path in self.layer_paths
+        ]
+        self._matches = datadict_entry.compile_matcher(layers, self._normalize)
+        self._own_entries = (
+            {id(entry) for entry in entries} if len(layers) > 1 else None
+        )
+
+    def _matched_by_other_layer(self, name) -> bool:
+        """
+        Check whether a column name is matched by the entries of a layer other than the output layer.
+
+        Parameters:
+            name (str): The column name.
+
+        Returns:
+            bool: True if the name is matched by another layer, and so isn't collated into the output layer.
+        """
+        if self._own_entries is None:
+            return False
+        matched = self._matches.match(name)
+        return bool(matched) and id(matched[0]) not in self._own_entries
+
+    def _load_layers(self) -> None:
+        """
+        Load the entries and the 'normalize' setting of every dictionary layer other than the output layer into
+        '_layer_entries' and '_layer_normalize'.
+
+        The layers are only read, so they are loaded with the fast, non round-trip loader.
+
+        Returns:
+            None
+
+        Raises:
+            FileNotFoundError: If a layer file doesn't exist.
+        """
+        self._layer_entries = {}
+        self._layer_normalize = {}
+        for path in self.layer_paths:
+            if path == self.dictionary_path:
+                continue
+            if not os.path.isfile(path):
+                self._log(f"Dictionary layer '{path}' not found.", level="error")
+                raise FileNotFoundError(path)
+            with phase("parse", path):
+                layer_yml = datadict_helpers.load_yaml_file_fast(path) or {}
+            self._layer_entries[path] = datadict_entry.load_entries(
+                layer_yml.get("dictionary")
+            )
+            self._layer_normalize[path] = layer_yml.get("normalize")
+            self._log(f"Dictionary layer '{path}' loaded successfully.")
 
     def _init_yaml(self) -> None:
         """
@@ -46,6 +197,8 @@ class datadict:
         Returns:
             None
         """
+        import ruamel.yaml
+
         self.yaml = ruamel.yaml.YAML()
         self._apply_yaml_config()
 
@@ -105,6 +258,25 @@ class datadict:
         elif self.detailed_logs:
             logging.info(message)
 
+    def _event(self, name, message, **fields) -> None:
+        """
+        Records an event with the reporter, only logging its 'info' and 'detail' messages if 'detailed_logs' is set.
+
+        Parameters:
+            name (str): The name of the event, one of 'datadict_report.EVENTS'.
+            message (str): A format string for the message, formatted with 'fields' only if it is logged.
+            **fields: The details of the event, e.g. the 'file' and 'column'.
+
+        Returns:
+            None
+        """
+        if not self.detailed_logs and datadict_report.EVENTS[name][0] in (
+            "info",
+            "detail",
+        ):
+            message = None
+        datadict_report.event(name, message, **fields)
+
     def _try_load_dictionary(self) -> dict:
         """
         Tries to load a dictionary from a given path, and if it doesn't exist, creates a new dictionary.
@@ -115,7 +287,15 @@ class datadict:
 
         Returns:
             dict: A dictionary loaded from the specified path if the file exists, otherwise, a newly created dictionary.
+                A read-only dictionary is loaded with the fast loader, and is empty if the file doesn't exist.
         """
+        if self.read_only:
+            if not os.path.isfile(self.dictionary_path):
+                self._log(
+                    f"Dictionary {self.dictionary_path} not found.", level="warning"
+                )
+                return {}
+            return datadict_helpers.load_yaml_file_fast(self.dictionary_path)
         if os.path.isfile(self.dictionary_path) and os.path.exists(
             self.dictionary_path
         ):
@@ -142,7 +322,9 @@ class datadict:
             Exception: If an error occurs while loading the dictionary from the YAML file.
         """
         try:
-            with open(self.dictionary_path, "r") as file:
+            with phase("parse", self.dictionary_path), open(
+                self.dictionary_path, "r"
+            ) as file:
                 self._log(
                     f"Dictionary file '{self.dictionary_path}' loaded successfully."
                 )
@@ -174,17 +356,12 @@ class datadict:
             SystemExit: If a critical error occurs during the creation process.
         """
         try:
-            with open(self.dictionary_path, "w") as file:
-                base_yaml = {"dictionary": []}
-                self.yaml.dump(base_yaml, file)
-                self._log(
-                    f"The file '{self.dictionary_path}' was successfully created."
-                )
-            with open(self.dictionary_path, "r") as file:
-                self._log(
-                    f"Dictionary file '{self.dictionary_path}' loaded successfully."
-                )
-                return self.yaml.load(file)
+            stream = io.StringIO()
+            self.yaml.dump({"dictionary": []}, stream)
+            datadict_helpers.write_file(self.dictionary_path, stream.getvalue())
+            self._log(f"The file '{self.dictionary_path}' was successfully created.")
+            self._log(f"Dictionary file '{self.dictionary_path}' loaded successfully.")
+            return self.yaml.load(stream.getvalue())
         except IOError:
             self._log(
                 f"An error occurred while creating the file '{self.dictionary_path}'. Check the directory exists.",
@@ -310,15 +487,69 @@ class datadict:
                 }
             )
 
+    def collect_existing_fields(self, model_yaml, file_path) -> None:
+        """
+        Collect the columns of a model YAML into the list of existing fields without applying the dictionary.
+
+        This method is the read-only counterpart of '_iterate_dictionary_update'. It records every model column
+        using '_update_existing_field', so that the fields can be collated or indexed without changing the file.
+
+        Parameters:
+            model_yaml (dict): The model YAML dictionary to collect columns from.
+            file_path (str): The file path of the YAML file containing the model.
+
+        Returns:
+            None
+        """
+        for model in model_yaml["models"] or []:
+            for model_column in model.get("columns") or []:
+                self._update_existing_field(model_column, model, file_path)
+
+    def build_lookup_index(self) -> dict:
+        """
+        Build an index of the dictionary entries by column name and alias.
+
+        Each name and alias in the dictionary maps to the position of its entry in 'dictionary_entries', so that a
+        column can be resolved to its entry without iterating through the dictionary. Where a name is shared by
+        several entries, the first entry takes precedence.
+
+        Parameters:
+            None
+
+        Returns:
+            dict: A dictionary mapping each column name and alias to the index of its dictionary entry.
+        """
+        index = {}
+        for dict_num, entry in enumerate(self.dictionary_entries):
+            for name in entry.names:
+                index.setdefault(name, dict_num)
+        return index
+
+    def match_entries(self, name) -> tuple:
+        """
+        Get the dictionary entries matching a column name, as the dictionary is applied.
+
+        The name is matched against the names and aliases of every layer, then against the pattern aliases, once
+        normalized as set by the 'normalize' key of the dictionary (see 'datadict_entry.AliasMatcher').
+
+        Parameters:
+            name (str): The column name.
+
+        Returns:
+            tuple: The matching entries, or an empty tuple.
+        """
+        return self._matches.match(name)
+
     def _iterate_dictionary_update(self, model_yaml, file_path) -> dict:
         """
         Iterate through the model YAML and update dictionary fields if needed.
 
         This private method iterates through the model YAML and updates dictionary fields if they are found
-        in the 'dictionary_yml'. For each model in the 'model_yaml', it checks if the model column name matches
-        any entry in the 'dictionary_yml' or its aliases. If a match is found and the model YAML contains a
-        'description' for that field, it updates the description from the 'dictionary_yml'. If the 'description'
-        is missing, it inserts the 'description' key with the appropriate value.
+        in the dictionary entries. Each model column name is looked up among the names and aliases of the entries,
+        and, if it has no exact match, among the pattern aliases (see 'datadict_entry.AliasMatcher').
+        If a match is found and the model YAML contains a 'description' for that field, it updates the description
+        from the entry. If the 'description' is missing, it inserts the 'description' key with the appropriate
+        value. The model is recorded in the 'models' of every matching entry.
 
         Parameters:
             model_yaml (dict): The model YAML dictionary to be updated.
@@ -330,73 +561,51 @@ class datadict:
         """
         updated = False
         try:
-            for model_number, model in enumerate(model_yaml["models"]):
+            for model in model_yaml["models"]:
                 if "columns" in model:
-                    for col_num, model_column in enumerate(model["columns"]):
-                        if self.dictionary_yml["dictionary"] is not None:
-                            for dict_num, dict_column in enumerate(
-                                self.dictionary_yml["dictionary"]
-                            ):
+                    columns = model["columns"]
+                    for col_num, model_column in enumerate(columns):
+                        for entry in self._matches.match(model_column["name"]):
+                            description = entry.description
+                            if "description" in columns[col_num]:
                                 if (
-                                    model_column["name"] == dict_column["name"]
-                                    or model_column["name"] in dict_column["aliases"]
+                                    columns[col_num]["description"] != description
+                                    and description != ""
                                 ):
-                                    if (
-                                        "description"
-                                        in model_yaml["models"][model_number][
-                                            "columns"
-                                        ][col_num]
-                                    ):
-                                        if (
-                                            model_yaml["models"][model_number][
-                                                "columns"
-                                            ][col_num]["description"]
-                                            != dict_column["description"]
-                                            and dict_column["description"] != ""
-                                        ):
-                                            model_yaml["models"][model_number][
-                                                "columns"
-                                            ][col_num]["description"] = dict_column[
-                                                "description"
-                                            ]
-                                            self._log(
-                                                f"Field '{model_column['name']}' in file '{file_path}' has been updated."
-                                            )
-                                            updated = True
-                                    elif dict_column["description"] != "":
-                                        model_yaml["models"][model_number]["columns"][
-                                            col_num
-                                        ] = self._insert_dict_item(
-                                            model_yaml["models"][model_number][
-                                                "columns"
-                                            ][col_num],
-                                            "description",
-                                            dict_column["description"],
-                                            1,
-                                        )
-                                        self._log(
-                                            f"Field '{model_column['name']}' in file '{file_path}' has been updated."
-                                        )
-                                        updated = True
-                                    if "models" in dict_column:
-                                        if (
-                                            model["name"]
-                                            not in self.dictionary_yml["dictionary"][
-                                                dict_num
-                                            ]["models"]
-                                        ):
-                                            self.dictionary_yml["dictionary"][dict_num][
-                                                "models"
-                                            ].append(model["name"])
-                                    else:
-                                        self.dictionary_yml["dictionary"][dict_num][
-                                            "models"
-                                        ] = [model["name"]]
+                                    old_description = columns[col_num]["description"]
+                                    columns[col_num]["description"] = description
+                                    self._event(
+                                        "column_updated",
+                                        "Field '{column}' in file '{file}' has been updated.",
+                                        column=model_column["name"],
+                                        model=model["name"],
+                                        file=file_path,
+                                        old=old_description,
+                                        new=description,
+                                    )
+                                    updated = True
+                            elif description != "":
+                                columns[col_num] = self._insert_dict_item(
+                                    columns[col_num], "description", description, 1
+                                )
+                                self._event(
+                                    "column_updated",
+                                    "Field '{column}' in file '{file}' has been updated.",
+                                    column=model_column["name"],
+                                    model=model["name"],
+                                    file=file_path,
+                                    old=None,
+                                    new=description,
+                                )
+                                updated = True
+                            entry.add_model(model["name"])
                         self._update_existing_field(model_column, model, file_path)
                 else:
-                    self._log(
-                        f"No columns found for model {model['name']} in '{file_path}'",
-                        level="warning",
+                    self._event(
+                        "model_without_columns",
+                        "No columns found for model {model} in '{file}'",
+                        model=model["name"],
+                        file=file_path,
                     )
             if updated:
                 return {"updated": True, "model_yaml": model_yaml}
@@ -412,7 +621,8 @@ class datadict:
 
         This function takes a list of dictionaries representing existing fields and organizes the metadata
         by grouping fields based on their names. For each unique field name, it collects unique models and
-        non-empty descriptions associated with the field.
+        non-empty descriptions associated with the field. The collation itself is done on dictionary entries by
+        'datadict_entry.collate_entries'.
 
         Parameters:
             existing_fields (list of dict): A list of dictionaries, where each dictionary contains information
@@ -422,63 +632,21 @@ class datadict:
             list: A list of dictionaries containing collated metadata for each field. Each dictionary contains
                 keys 'name', 'description', 'versions', and 'models'.
         """
-        metadata = {}
-        result = []
-
-        # extract metadata from existing field list
-        for field in existing_fields:
-            name = field["name"]
-            model = field["model"]
-            description = field.get("description", "")
-
-            if name not in metadata:
-                metadata[name] = {
-                    "description_versions": [description],
-                    "description": description,
-                    "models": [model],
-                }
-            else:
-                metadata[name]["description_versions"].append(description)
-                metadata[name]["models"].append(model)
-
-        # summarise metadata
-        for name, info in metadata.items():
-            versions = list(
-                set(
-                    [
-                        version
-                        for version in info["description_versions"]
-                        if version != ""
-                    ]
-                )
+        return datadict_entry.entries_to_yaml(
+            datadict_entry.collate_entries(
+                existing_fields,
+                normalize=self._normalize,
+                similarity=self._similarity,
             )
-            versions.sort()
-            models = list(set(info["models"]))
-            models.sort()
-            if len(versions) > 1:
-                result.append(
-                    {
-                        "name": name,
-                        "description": "",
-                        "description_versions": versions,
-                        "models": models,
-                    }
-                )
-            else:
-                result.append(
-                    {"name": name, "description": info["description"], "models": models}
-                )
-
-        # return field list sorted by name
-        return sorted(result, key=lambda d: d["name"])
+        )
 
     def _output_dictionary(self) -> None:
         """
         Output the updated dictionary YAML data to a file.
 
         This private method is used to write the updated dictionary YAML data to a file specified by 'dictionary_path'.
-        The function takes the 'dictionary_yml' data from the class instance and writes it to the file using the YAML
-        serializer.
+        The function converts the dictionary entries back to YAML through 'dictionary_yml' and writes it to the file
+        using the YAML serializer.
 
         Parameters:
             None
@@ -486,10 +654,19 @@ class datadict:
         Returns:
             None
         """
+        if self.read_only:
+            self._log(
+                f"Dictionary '{self.dictionary_path}' is read-only and hasn't been written"
+            )
+            return
         try:
-            with open(self.dictionary_path, "w") as file:
-                self.yaml.dump(self.dictionary_yml, file)
-                datadict_helpers.add_spaces_between_cols(self.dictionary_path)
+            with phase("serialize", self.dictionary_path):
+                stream = io.StringIO()
+                self.yaml.dump(self.dictionary_yml, stream)
+            datadict_helpers.write_file(
+                self.dictionary_path,
+                datadict_helpers.space_columns(stream.getvalue()),
+            )
             self._log(f"Dictionary '{self.dictionary_path}' has been updated")
         except Exception as error:
             self._log(
@@ -497,43 +674,183 @@ class datadict:
                 level="error",
             )
 
-    def apply_data_dictionary_to_file(self, file_path) -> None:
+    def apply_data_dictionary_to_file(self, file_path) -> dict:
         """
         Apply the data dictionary updates to the specified model YAML file.
 
         This method applies the data dictionary updates to the specified 'file_path' representing a model YAML file.
-        It checks if the file contains valid model data by using '_open_model_yml_file' function. If the file is
-        valid, it iterates through the model YAML data and updates the descriptions of fields based on the entries
-        in the 'dictionary_yml'. If any updates are made, it writes the updated YAML data back to the file using the
-        '_output_model_file' function. If no updates are made, it logs a message stating that no updates were found.
+        It checks if the file contains valid model data by using 'open_model_yml_file' function, which skips files
+        without a top-level 'models' key before parsing them. If the file is valid, it applies the dictionary to the loaded YAML data using 'apply_data_dictionary_to_yaml'.
 
         Parameters:
             file_path (str): The path to the model YAML file to which the data dictionary updates should be applied.
 
         Returns:
-            None
+            dict: The loaded (and possibly updated) model YAML data if the file is a valid model file, otherwise None.
         """
-        self._log(f"Checking file '{file_path}'...")
-        model_yaml = datadict_helpers.open_model_yml_file(self.yaml, file_path)
+        self._event("file_checked", "Checking file '{file}'...", file=file_path)
+        self.applied_files.append(file_path)
+        try:
+            model_yaml = datadict_helpers.open_model_yml_file(self.yaml, file_path)
+        except FileNotFoundError:
+            self._event("file_missing", "File '{file}' not found.", file=file_path)
+            return None
+        finally:
+            datadict_progress.advance("checked")
+        if not model_yaml["parsed"]:
+            datadict_progress.advance("skipped")
+            self._event(
+                "file_prefiltered",
+                "File '{file}' has no top-level models and has been skipped without parsing.",
+                file=file_path,
+            )
+            return None
+        datadict_progress.advance("parsed")
         if model_yaml["status"] == "valid":
-            try:
-                updates = self._iterate_dictionary_update(model_yaml["yaml"], file_path)
-                if updates["updated"]:
-                    datadict_helpers.output_model_file(
-                        self.yaml, file_path, updates["model_yaml"], False
-                    )
-                    self._log(f"File {file_path} has been updated")
-                else:
-                    self._log(f"No updates found for file '{file_path}'")
+            datadict_progress.advance(
+                "columns",
+                sum(
+                    len(model.get("columns") or [])
+                    for model in model_yaml["yaml"]["models"] or []
+                ),
+            )
+            self.apply_data_dictionary_to_yaml(model_yaml["yaml"], file_path)
+            return model_yaml["yaml"]
+        else:
+            self._event(
+                "file_skipped",
+                "File '{file}' contains no models and has been skipped.",
+                file=file_path,
+            )
+            return None
 
-            except FileNotFoundError:
-                self._log(f"File '{file_path}' not found.", level="error")
-            except Exception as e:
-                self._log(
-                    f"Error processing file '{file_path}'. Error: " + e, level="error"
+    def apply_data_dictionary_to_yaml(self, model_yaml, file_path) -> bool:
+        """
+        Apply the data dictionary updates to already loaded model YAML data and write it back to its file.
+
+        This method iterates through the model YAML data and updates the descriptions of fields based on the entries
+        in the dictionary. If any updates are made, it writes the updated YAML data back to 'file_path' using
+        the 'output_model_file' function. If no updates are made, it logs a message stating that no updates were found.
+
+        Parameters:
+            model_yaml (dict): The loaded model YAML data.
+            file_path (str): The path to the model YAML file the data was loaded from.
+
+        Returns:
+            bool: True if the file was updated, False otherwise.
+        """
+        try:
+            with phase("dictionary_match", file_path):
+                updates = self._iterate_dictionary_update(model_yaml, file_path)
+            if updates["updated"]:
+                datadict_helpers.output_model_file(
+                    self.yaml, file_path, updates["model_yaml"], False
                 )
-        else:
-            self._log(f"File '{file_path}' contains no models and has been skipped.")
+                self._event(
+                    "file_updated", "File {file} has been updated", file=file_path
+                )
+                return True
+            else:
+                self._event(
+                    "file_unchanged",
+                    "No updates found for file '{file}'",
+                    file=file_path,
+                )
+
+        except FileNotFoundError:
+            self._event("file_missing", "File '{file}' not found.", file=file_path)
+        except Exception as e:
+            self._event(
+                "file_error",
+                "Error processing file '{file}'. Error: {error}",
+                file=file_path,
+                error=e,
+            )
+        return False
+
+    def apply_data_dictionary_to_stream(
+        self, input_stream, output_stream, file_path="<stdin>"
+    ) -> bool:
+        """
+        Apply the data dictionary to a model YAML document read from a stream, and write the result to another.
+
+        This method is used as a filter, e.g. by an editor hook formatting a buffer before it is saved. Nothing is
+        written to disk: the updated document is written to 'output_stream', and the columns are only recorded in
+        'existing_fields'. If nothing is updated, or the document doesn't contain models, the input is written back
+        exactly as it was read.
+
+        Parameters:
+            input_stream (file): The text stream to read the model YAML from.
+            output_stream (file): The text stream to write the model YAML to.
+            file_path (str, optional): The path the document is reported under. Defaults to '<stdin>'.
+
+        Returns:
+            bool: True if the document was updated, False otherwise.
+
+        Raises:
+            Exception: If the document can't be parsed. Nothing is written to 'output_stream'.
+        """
+        text = input_stream.read()
+        self._event("file_checked", "Checking file '{file}'...", file=file_path)
+        model_yaml = None
+        if datadict_helpers.MODELS_KEY_PATTERN.search(text.encode("utf-8")):
+            with phase("parse", file_path):
+                model_yaml = self.yaml.load(text)
+        if not isinstance(
+            model_yaml, dict
+        ) or not datadict_helpers.check_valid_model_file(model_yaml):
+            self._event(
+                "file_skipped",
+                "File '{file}' contains no models and has been skipped.",
+                file=file_path,
+            )
+            output_stream.write(text)
+            return False
+        with phase("dictionary_match", file_path):
+            updates = self._iterate_dictionary_update(model_yaml, file_path)
+        if not updates["updated"]:
+            self._event(
+                "file_unchanged", "No updates found for file '{file}'", file=file_path
+            )
+            output_stream.write(text)
+            return False
+        with phase("serialize", file_path):
+            self.yaml.dump(updates["model_yaml"], output_stream)
+        self._event("file_updated", "File {file} has been updated", file=file_path)
+        return True
+
+    def forget_file(self, file_path) -> None:
+        """
+        Remove the fields collected from the specified file from the list of existing fields.
+
+        This method is used before a file is re-applied or after it has been deleted, so that the next collation
+        of the dictionary doesn't include stale fields from the file.
+
+        Parameters:
+            file_path (str): The path to the model YAML file to forget.
+
+        Returns:
+            None
+        """
+        self.existing_fields = [
+            field for field in self.existing_fields if field["file"] != file_path
+        ]
+
+    def reload_dictionary(self) -> None:
+        """
+        Reload the dictionary from the dictionary file.
+
+        This method is used when the dictionary file has been edited since the object was initialized, so that
+        the edited descriptions and aliases are used by subsequent updates. Every layer is reloaded.
+
+        Parameters:
+            None
+
+        Returns:
+            None
+        """
+        self._load_layers()
+        self.dictionary_yml = self._try_load_dictionary()
 
     def apply_data_dictionary_to_path(self, directory) -> None:
         """
@@ -550,23 +867,63 @@ class datadict:
             None
         """
         if os.path.exists(directory) and os.path.isdir(directory):
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if file.endswith(".yaml") or file.endswith(".yml"):
-                        file_path = os.path.join(root, file)
-                        self.apply_data_dictionary_to_file(file_path)
+            if self.docs_directory is None:
+                self.docs_directory = directory
+            file_paths = []
+            with phase("scan"):
+                for root, dirs, files in os.walk(directory):
+                    for file in files:
+                        if file.endswith(".yaml") or file.endswith(".yml"):
+                            file_paths.append(os.path.join(root, file))
+            datadict_progress.advance("scanned", len(file_paths))
+            datadict_progress.add_total("checked", len(file_paths))
+            for file_path in file_paths:
+                self.apply_data_dictionary_to_file(file_path)
         else:
             self._log(
                 f"Directory '{directory}' doesn't exist or can't be found",
                 level="error",
             )
 
+    def apply_data_dictionary_to_files(self, file_paths) -> list:
+        """
+        Apply the data dictionary updates to an explicit list of model YAML files.
+
+        This method is used to apply the dictionary to a subset of the project, e.g. the files staged in a commit.
+        Paths that aren't YAML files are ignored, and paths that no longer exist are returned so that their
+        fields can be retracted from the dictionary.
+
+        Parameters:
+            file_paths (list): The paths of the files to apply the dictionary to.
+
+        Returns:
+            list: The normalised paths of the YAML files that no longer exist.
+        """
+        removed_files = []
+        file_paths = [
+            os.path.normpath(file_path)
+            for file_path in file_paths
+            if file_path.endswith((".yaml", ".yml"))
+            and os.path.abspath(file_path)
+            not in {os.path.abspath(path) for path in self.layer_paths}
+        ]
+        datadict_progress.add_total(
+            "checked", sum(os.path.isfile(file_path) for file_path in file_paths)
+        )
+        for file_path in file_paths:
+            if os.path.isfile(file_path):
+                self.apply_data_dictionary_to_file(file_path)
+            else:
+                self._log(f"File '{file_path}' has been removed")
+                removed_files.append(file_path)
+        return removed_files
+
     def collate_output_dictionary(self):
         """
         Collate metadata and update the data dictionary before writing to the dictionary file.
 
         This method is responsible for collating metadata from the 'existing_fields' list and updating
-        the data dictionary ('dictionary_yml') with this information. The updated dictionary is then
+        the data dictionary ('dictionary_entries') with this information. The updated dictionary is then
         written back to the dictionary file specified during class initialization.
 
         Parameters:
@@ -576,17 +933,44 @@ class datadict:
             None
 
         Behavior:
-            1. The function first calls the '_collate_metadata(self.existing_fields)' method to collate
-            metadata from the existing fields. The metadata contains information about the fields,
-            including their names, descriptions, associated versions, and models.
-
-            2. The metadata obtained in the previous step is then assigned to the 'dictionary' key of
-            the class instance's 'dictionary_yml'. This key represents the dictionary data loaded
-            from the YAML file.
-
-            3. The function proceeds to write the updated 'dictionary_yml' to the dictionary file using
-            the '_output_dictionary()' method.
-        """
-        existing_field_descriptions = self._collate_metadata(self.existing_fields)
-        self.dictionary_yml["dictionary"] = existing_field_descriptions
+            1. The function first calls 'datadict_entry.collate_entries' to collate metadata from the
+            existing fields. The metadata contains information about the fields, including their names,
+            descriptions, associated versions, and models. The aliases of the current entries are kept.
+
+            2. The collated entries replace the class instance's 'dictionary_entries', which represent
+            the dictionary data loaded from the YAML file.
+
+            3. The function proceeds to write the entries, converted back to YAML through 'dictionary_yml',
+            to the dictionary file using the '_output_dictionary()' method.
+
+            When there are several layers, only the columns that aren't matched by another layer are collated into
+            the output layer, and its entries that are overridden by a later layer are kept as they are.
+        """
+        with phase("merge"):
+            existing_fields = self.existing_fields
+            overridden = []
+            if self._own_entries is not None:
+                existing_fields = [
+                    field
+                    for field in existing_fields
+                    if not self._matched_by_other_layer(field["name"])
+                ]
+                overridden = [
+                    entry
+                    for entry in self.dictionary_entries
+                    if self._matched_by_other_layer(entry.name)
+                ]
+            resolve = None
+            if self.docs_directory is not None:
+                resolve = datadict_docs.build_resolver(self.docs_directory)
+            entries = datadict_entry.collate_entries(
+                existing_fields,
+                self.dictionary_entries,
+                self._normalize,
+                self._similarity,
+                resolve,
+            )
+            if overridden:
+                entries = sorted(entries + overridden, key=lambda entry: entry.name)
+            self._set_entries(entries)
         self._output_dictionary()
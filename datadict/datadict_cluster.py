@@ -0,0 +1,220 @@
+import operator
+import re
+import zlib
+from array import array
+
+# The number of bins of each MinHash signature, and the number of bins in each LSH band. With 16 bands of 4 bins,
+# descriptions with a similarity of 0.8 become candidates with a probability above 0.999, and descriptions with a
+# similarity below 0.3 rarely do.
+SIGNATURE_BINS = 64
+BAND_BINS = 4
+SHINGLE_LENGTH = 4
+DEFAULT_THRESHOLD = 0.8
+# The number of groups each text is compared with in a bucket. Templated descriptions, e.g. 'Column 1 of the table',
+# share most bands, so their buckets hold most of the texts, and comparing each text with every group in them would
+# be quadratic.
+MAX_BUCKET_LEADERS = 4
+
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_text(description) -> str:
+    """
+    Normalize a description so that descriptions only differing in case, whitespace or punctuation are equal.
+
+    Parameters:
+        description (str): The description.
+
+    Returns:
+        str: The case folded description, with every run of whitespace and punctuation replaced by a single space.
+    """
+    return NON_WORD.sub(" ", str(description).casefold()).strip()
+
+
+def shingle_hashes(text) -> set:
+    """
+    Get the hashes of the overlapping shingles of SHINGLE_LENGTH bytes of a normalized description.
+
+    Parameters:
+        text (str): The normalized description.
+
+    Returns:
+        set: The 32 bit CRC of each shingle.
+    """
+    data = text.encode("utf-8")
+    if len(data) <= SHINGLE_LENGTH:
+        return {zlib.crc32(data)}
+    return {
+        zlib.crc32(data[start : start + SHINGLE_LENGTH])
+        for start in range(len(data) - SHINGLE_LENGTH + 1)
+    }
+
+
+def minhash_signature(hashes) -> array:
+    """
+    Build the MinHash signature of a set of shingle hashes, with one permutation hashing.
+
+    Rather than hashing every shingle once per bin, each shingle is hashed once, and the hash picks the bin and the
+    value. Each bin keeps the smallest value. Empty bins are filled from the next non-empty bin, so that short
+    descriptions still have a full signature.
+
+    Parameters:
+        hashes (set): The 32 bit hashes of the shingles of a description, from 'shingle_hashes'.
+
+    Returns:
+        array: The signature, with SIGNATURE_BINS values.
+    """
+    # The hashes are visited from the largest, so the smallest value of each bin is the one kept
+    bins = {
+        value % SIGNATURE_BINS: value // SIGNATURE_BINS
+        for value in sorted(hashes, reverse=True)
+    }
+    signature = [bins.get(position) for position in range(SIGNATURE_BINS)]
+    if len(bins) < SIGNATURE_BINS:
+        # Each empty bin is filled from the next non-empty bin, walking backwards around the signature. The distance
+        # to that bin is mixed in, so that filled bins only agree when the same bins are empty.
+        source = max(bins)
+        for position in range(source - 1, source - 1 - SIGNATURE_BINS, -1):
+            position %= SIGNATURE_BINS
+            if signature[position] is None:
+                distance = (source - position) % SIGNATURE_BINS
+                signature[position] = (
+                    signature[source] + distance * 0x9E3779B1
+                ) & 0xFFFFFFFF
+            else:
+                source = position
+    return array("L", signature)
+
+
+def similarity_threshold(value):
+    """
+    Validate the 'description_similarity' setting of a dictionary file.
+
+    Parameters:
+        value (float): The setting, or None if it isn't set.
+
+    Returns:
+        float: The threshold, or None if near-duplicate descriptions aren't clustered.
+
+    Raises:
+        ValueError: If the setting isn't a number above 0 and at most 1.
+    """
+    if value is None:
+        return None
+    if (
+        isinstance(value, bool)
+        or not isinstance(value, (int, float))
+        or not 0 < value <= 1
+    ):
+        raise ValueError(
+            f"The description similarity '{value}' must be a number above 0 and at most 1"
+        )
+    return float(value)
+
+
+def _similarity(first, second) -> float:
+    return sum(map(operator.eq, first, second)) / SIGNATURE_BINS
+
+
+def _find(parents, item) -> int:
+    while parents[item] != item:
+        parents[item] = parents[parents[item]]
+        item = parents[item]
+    return item
+
+
+def cluster_descriptions(descriptions, threshold=DEFAULT_THRESHOLD) -> list:
+    """
+    Group near-duplicate descriptions into clusters, without comparing every pair of descriptions.
+
+    Descriptions are first grouped exactly by their normalized text (see 'normalize_text'). A MinHash signature of
+    the character shingles of each distinct normalized text is then split into bands, and only the texts sharing a
+    band are compared, by the similarity estimated from their signatures. The texts with an estimated similarity of
+    at least 'threshold' are clustered together. Texts with the same signature are clustered without comparing them,
+    and, in each bucket, a text is compared with the first text of at most MAX_BUCKET_LEADERS of the groups found in
+    it, so the number of comparisons grows linearly with the number of texts.
+
+    Parameters:
+        descriptions (iterable): The descriptions to cluster.
+        threshold (float, optional): The minimum estimated Jaccard similarity of the shingles of two descriptions
+            for them to be clustered together. Defaults to 0.8.
+
+    Returns:
+        list: A list of the clusters of more than one distinct description, each a list of the descriptions in it.
+    """
+    texts = {}
+    for description in descriptions:
+        texts.setdefault(normalize_text(description), []).append(description)
+    keys = list(texts)
+    parents = list(range(len(keys)))
+
+    if threshold < 1:
+        # Only the first text with each signature is banded, the others are clustered with it
+        signatures = {}
+        for item, key in enumerate(keys):
+            # Tuples are faster to compare than arrays
+            signature = tuple(minhash_signature(shingle_hashes(key)))
+            first = signatures.setdefault(signature, item)
+            if first != item:
+                parents[item] = first
+        signatures = {item: signature for signature, item in signatures.items()}
+        for band in range(0, SIGNATURE_BINS, BAND_BINS):
+            buckets = {}
+            for item, signature in signatures.items():
+                buckets.setdefault(signature[band : band + BAND_BINS], []).append(item)
+            for items in buckets.values():
+                if len(items) < 2:
+                    continue
+                # Each text is compared with the first text of the first groups found in the bucket
+                leaders = []
+                for item in items:
+                    root = _find(parents, item)
+                    for leader in leaders:
+                        leader_root = _find(parents, leader)
+                        if leader_root == root:
+                            break
+                        if (
+                            _similarity(signatures[item], signatures[leader])
+                            >= threshold
+                        ):
+                            parents[root] = leader_root
+                            break
+                    else:
+                        if len(leaders) < MAX_BUCKET_LEADERS:
+                            leaders.append(item)
+
+    clusters = {}
+    for item, key in enumerate(keys):
+        clusters.setdefault(_find(parents, item), []).extend(texts[key])
+    return [cluster for cluster in clusters.values() if len(cluster) > 1]
+
+
+def canonical_descriptions(description_counts, threshold=DEFAULT_THRESHOLD) -> dict:
+    """
+    Suggest a canonical description for each cluster of near-duplicate descriptions.
+
+    The canonical description of a cluster is the one used by the most columns, then the longest, then the first in
+    sorted order.
+
+    Parameters:
+        description_counts (dict): A dictionary mapping each distinct description to the number of columns using it.
+        threshold (float, optional): The minimum similarity for descriptions to be clustered together, see
+            'cluster_descriptions'. Defaults to 0.8.
+
+    Returns:
+        dict: A dictionary mapping each description that has a near-duplicate to the canonical description of its
+            cluster, which maps to itself. Descriptions without near-duplicates are left out.
+    """
+    canonical = {}
+    for cluster in cluster_descriptions(description_counts, threshold):
+        chosen = min(
+            cluster,
+            key=lambda description: (
+                -description_counts[description],
+                -len(description),
+                description,
+            ),
+        )
+        for description in cluster:
+            canonical[description] = chosen
+    return canonical
@@ -1,8 +1,17 @@
+import json
 import logging
+import os
 import subprocess
 
 import ruamel.yaml
 
+from datadict import datadict_manifest
+from datadict.datadict_profile import phase
+
+PACKAGE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dbt_package")
+INFORMATION_SCHEMA_PLACEHOLDER = "__datadict_information_schema__"
+COLUMNS_MARKER = "datadict_columns: "
+
 
 def parse_bash_outputs(input_string) -> str:
     """
@@ -29,7 +38,7 @@ def parse_bash_outputs(input_string) -> str:
         logging.error("There was an issue parsing the codegen outputs: " + e)
 
 
-def validate_dbt() -> bool:
+def validate_dbt(require_codegen=True) -> bool:
     """
     Validates the dbt project to ensure its integrity and required dependencies.
 
@@ -41,6 +50,9 @@ def validate_dbt() -> bool:
     3. If both the above checks pass successfully, it logs a success message confirming the successful validation
        of the dbt project and returns True.
 
+    Parameters:
+        require_codegen (bool, optional): Whether `dbt-labs/codegen` must be installed. Defaults to True.
+
     Returns:
         bool: True if the dbt project is successfully validated; False otherwise.
     """
@@ -48,9 +60,10 @@ def validate_dbt() -> bool:
     try:
         # Check debug passes
         bash_command = ["dbt", "debug"]
-        result = subprocess.run(bash_command, capture_output=True).stdout.decode(
-            "UTF-8"
-        )
+        with phase("dbt_subprocess"):
+            result = subprocess.run(bash_command, capture_output=True).stdout.decode(
+                "UTF-8"
+            )
         if "All checks passed!" not in result:
             logging.error(
                 "Issues encountered when running `dbt debug`. Validate `dbt debug` passes before retrying."
@@ -59,10 +72,11 @@ def validate_dbt() -> bool:
 
         # Check codegen installed
         bash_command = ["dbt", "deps"]
-        result = subprocess.run(bash_command, capture_output=True).stdout.decode(
-            "UTF-8"
-        )
-        if "dbt-labs/codegen" not in result:
+        with phase("dbt_subprocess"):
+            result = subprocess.run(bash_command, capture_output=True).stdout.decode(
+                "UTF-8"
+            )
+        if require_codegen and "dbt-labs/codegen" not in result:
             logging.error("dbt-labs/codegen is required to perform this operation")
             return False
 
@@ -75,7 +89,31 @@ def validate_dbt() -> bool:
         return False
 
 
-def get_model_yaml(model_names) -> str:
+def parse_project() -> bool:
+    """
+    Parses the dbt project to write an up to date manifest to 'target/manifest.json'.
+
+    Returns:
+        bool: True if the project was parsed successfully; False otherwise.
+    """
+    logging.info("Parsing dbt project...")
+    try:
+        bash_command = ["dbt", "parse"]
+        with phase("dbt_subprocess"):
+            result = subprocess.run(bash_command, capture_output=True)
+        if result.returncode != 0:
+            logging.error(
+                "Issues encountered when running `dbt parse`: "
+                + result.stdout.decode("UTF-8")
+            )
+            return False
+        return True
+    except Exception as e:
+        logging.error(f"Issues encountered when attempting to parse dbt: {e}")
+        return False
+
+
+def get_model_yaml(model_names, target_path=None) -> str:
     """
     Generates the base model YAML for the specified model names.
 
@@ -91,6 +129,7 @@ def get_model_yaml(model_names) -> str:
 
     Parameters:
         model_names (list): A list of model names for which the base model YAML needs to be generated.
+        target_path (str, optional): The dbt target path to use, so that concurrent runs don't share one.
 
     Returns:
         str: The generated base model YAML as a string.
@@ -108,15 +147,311 @@ def get_model_yaml(model_names) -> str:
             "--args",
             str(args),
         ]
-        result = subprocess.run(bash_command, capture_output=True).stdout.decode(
-            "UTF-8"
-        )
+        if target_path is not None:
+            bash_command += ["--target-path", target_path]
+        with phase("dbt_subprocess"):
+            result = subprocess.run(bash_command, capture_output=True).stdout.decode(
+                "UTF-8"
+            )
         if "Compilation Error" in result:
             logging.error(
                 "Issues encountered when generating the model yaml: " + result
             )
         else:
             yaml = ruamel.yaml.YAML()
-            return yaml.load(parse_bash_outputs(result))
+            with phase("parse"):
+                return yaml.load(parse_bash_outputs(result))
     except Exception as e:
         logging.error(f"Issues encountered when generating the model yaml: {e}")
+
+
+def iter_model_yamls(lines, fast=False):
+    """
+    Yield the models in codegen output one at a time, without loading the whole output as one YAML document.
+
+    The output is scanned line by line from the 'version: 2' line onwards. Each item of the top level 'models'
+    list is loaded on its own as soon as the next item starts, so only one model's lines are held at a time.
+    Scanning stops at the first line that isn't part of the 'models' list, such as a trailing dbt log line.
+
+    Parameters:
+        lines (iterable): The lines of the codegen output, e.g. the stdout of the dbt process.
+        fast (bool, optional): Load each model with the fast, non round-trip loader, which returns plain
+            dictionaries and lists. Defaults to False.
+
+    Yields:
+        dict: Each model, with its 'name' and 'columns'.
+    """
+    yaml = ruamel.yaml.YAML(typ="safe") if fast else ruamel.yaml.YAML()
+    started = False
+    in_models = False
+    item_indent = None
+    item_lines = []
+
+    def load_item():
+        with phase("parse"):
+            return yaml.load("".join(item_lines))[0]
+
+    for line in lines:
+        if not started:
+            started = "version: 2" in line
+            continue
+        if not in_models:
+            in_models = line.strip() == "models:"
+            continue
+        stripped = line.lstrip(" ")
+        indent = len(line) - len(stripped)
+        if not stripped.strip():
+            if item_lines:
+                item_lines.append(line)
+        elif stripped.startswith("- ") and item_indent in (None, indent):
+            if item_lines:
+                yield load_item()
+            item_indent = indent
+            item_lines = [line]
+        elif item_indent is not None and indent > item_indent:
+            item_lines.append(line)
+        else:
+            break
+    if item_lines:
+        yield load_item()
+
+
+def stream_model_yaml(model_names, target_path=None, fast=False):
+    """
+    Generates the base model YAML for the specified model names, yielding each model as it is read.
+
+    This is the streaming equivalent of 'get_model_yaml'. The stdout of `dbt run-operation generate_model_yaml` is
+    read as it is produced and parsed with 'iter_model_yamls', so the models are never held in memory as one
+    document. If codegen fails, an error is logged and no further models are yielded.
+
+    Parameters:
+        model_names (list): A list of model names for which the base model YAML needs to be generated.
+        target_path (str, optional): The dbt target path to use, so that concurrent runs don't share one.
+        fast (bool, optional): Load each model with the fast, non round-trip loader. Defaults to False.
+
+    Yields:
+        dict: Each generated model, with its 'name' and 'columns'.
+    """
+    logging.info(f'Generating base model for models: {", ".join(model_names)}')
+    args = {"model_names": model_names}
+    bash_command = [
+        "dbt",
+        "run-operation",
+        "generate_model_yaml",
+        "--args",
+        str(args),
+    ]
+    if target_path is not None:
+        bash_command += ["--target-path", target_path]
+    preamble = []
+
+    def output_lines(stdout):
+        for line in stdout:
+            line = line.decode("UTF-8")
+            if not preamble or "version: 2" not in preamble[-1]:
+                preamble.append(line)
+            yield line
+
+    try:
+        with phase("dbt_subprocess"), subprocess.Popen(
+            bash_command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL
+        ) as process:
+            yield from iter_model_yamls(output_lines(process.stdout), fast)
+            process.stdout.read()
+        output = "".join(preamble)
+        if "Compilation Error" in output or process.returncode != 0:
+            logging.error(
+                "Issues encountered when generating the model yaml: " + output
+            )
+    except Exception as e:
+        logging.error(f"Issues encountered when generating the model yaml: {e}")
+
+
+def build_columns_queries(relations, batch_size=500) -> list:
+    """
+    Build the batched information_schema queries that fetch the columns of a set of relations.
+
+    The relations are grouped by database and schema, and one query is built for every 'batch_size' relations in a
+    group, so the columns of every model are fetched in a few queries rather than one query per model. Each query
+    returns the database, schema, table, column name and data type of every column, in column order. Names are
+    compared case insensitively.
+
+    The queries refer to the information_schema columns relation with INFORMATION_SCHEMA_PLACEHOLDER, as it is
+    written differently by each adapter. The 'datadict_get_columns' macro replaces it before running the queries.
+
+    Parameters:
+        relations (list): The relations, each with a 'database', 'schema' and 'identifier'.
+        batch_size (int, optional): The maximum number of relations in each query. Defaults to 500.
+
+    Returns:
+        list: A list of dictionaries with the 'database', 'schema' and 'sql' of each query.
+    """
+
+    def literal(value):
+        return "'" + str(value).lower().replace("'", "''") + "'"
+
+    groups = {}
+    for relation in relations:
+        groups.setdefault((relation["database"], relation["schema"]), []).append(
+            relation["identifier"]
+        )
+    queries = []
+    for (database, schema), identifiers in sorted(
+        groups.items(), key=lambda item: (str(item[0][0]), str(item[0][1]))
+    ):
+        identifiers = sorted({str(identifier).lower() for identifier in identifiers})
+        for start in range(0, len(identifiers), batch_size):
+            tables = ", ".join(
+                literal(identifier)
+                for identifier in identifiers[start : start + batch_size]
+            )
+            conditions = [
+                f"lower(table_schema) = {literal(schema)}",
+                f"lower(table_name) in ({tables})",
+            ]
+            if database is not None:
+                conditions.insert(0, f"lower(table_catalog) = {literal(database)}")
+            queries.append(
+                {
+                    "database": database,
+                    "schema": schema,
+                    "sql": "select table_catalog, table_schema, table_name, column_name, data_type"
+                    f" from {INFORMATION_SCHEMA_PLACEHOLDER}"
+                    f" where {' and '.join(conditions)}"
+                    " order by table_catalog, table_schema, table_name, ordinal_position",
+                }
+            )
+    return queries
+
+
+def render_columns_query(query, information_schema="information_schema.columns") -> str:
+    """
+    Render a query built by 'build_columns_queries' with the given information_schema columns relation.
+
+    Parameters:
+        query (dict): The query, with its 'sql'.
+        information_schema (str, optional): The information_schema columns relation. Defaults to
+            'information_schema.columns'.
+
+    Returns:
+        str: The SQL of the query, ready to run.
+    """
+    return query["sql"].replace(INFORMATION_SCHEMA_PLACEHOLDER, information_schema)
+
+
+def columns_to_models(relations, rows) -> dict:
+    """
+    Convert the rows returned by the information_schema queries to model YAML, in the same shape as codegen.
+
+    Column names and data types are lower cased, as codegen does by default. Relations that no rows were returned
+    for, e.g. because the model hasn't been built, are left out with a warning.
+
+    Parameters:
+        relations (list): The relations queried, each with a 'model', 'database', 'schema' and 'identifier'.
+        rows (list): The rows returned, each with the database, schema, table, column name and data type.
+
+    Returns:
+        dict: The model YAML data, with a 'models' list of each model's 'name' and 'columns'.
+    """
+
+    def key(*names):
+        return tuple(str(name).lower() if name is not None else None for name in names)
+
+    columns = {}
+    columns_by_schema = {}
+    for database, schema, table, column_name, data_type in rows:
+        column = {
+            "name": str(column_name).lower(),
+            "data_type": str(data_type).lower(),
+            "description": "",
+        }
+        columns.setdefault(key(database, schema, table), []).append(column)
+        columns_by_schema.setdefault(key(schema, table), []).append(column)
+    models = []
+    for relation in relations:
+        if relation["database"] is None:
+            relation_columns = columns_by_schema.get(
+                key(relation["schema"], relation["identifier"])
+            )
+        else:
+            relation_columns = columns.get(
+                key(relation["database"], relation["schema"], relation["identifier"])
+            )
+        if not relation_columns:
+            logging.warning(
+                f"No columns were found for model '{relation['model']}'. Ensure it has been built."
+            )
+            continue
+        models.append({"name": relation["model"], "columns": relation_columns})
+    return {"version": 2, "models": models}
+
+
+def get_model_columns(
+    model_names,
+    manifest_path=datadict_manifest.DEFAULT_MANIFEST_PATH,
+    target_path=None,
+    batch_size=500,
+) -> dict:
+    """
+    Generates the base model YAML for the specified model names from the information_schema, as an alternative to
+    codegen.
+
+    Rather than running one query per model, the columns of every model are fetched in a few batched queries, grouped
+    by database and schema, by running the 'datadict_get_columns' macro. The macro is shipped in a small dbt package
+    (see PACKAGE_PATH), which must be added to the project's 'packages.yml'. The relations of the models are read
+    from the manifest, which must be up to date.
+
+    Parameters:
+        model_names (list): A list of model names for which the base model YAML needs to be generated.
+        manifest_path (str, optional): The path to the manifest. Defaults to 'target/manifest.json'.
+        target_path (str, optional): The dbt target path to use, so that concurrent runs don't share one.
+        batch_size (int, optional): The maximum number of relations in each query. Defaults to 500.
+
+    Returns:
+        dict: The model YAML data in the same shape as codegen's, or None if the columns couldn't be fetched.
+    """
+    manifest = datadict_manifest.load_manifest(manifest_path)
+    if manifest is None:
+        return None
+    if not any(
+        unique_id.endswith(".datadict_get_columns")
+        for unique_id in manifest.get("macros", {})
+    ):
+        logging.error(
+            "The 'datadict_get_columns' macro wasn't found. Add the datadict dbt package to 'packages.yml' with "
+            f"'- local: {PACKAGE_PATH}' and run `dbt deps`."
+        )
+        return None
+    relations = datadict_manifest.model_relations(manifest, model_names)
+    if not relations:
+        return {"version": 2, "models": []}
+
+    logging.info(f'Fetching columns for models: {", ".join(model_names)}')
+    args = {"queries": build_columns_queries(relations, batch_size)}
+    bash_command = [
+        "dbt",
+        "run-operation",
+        "datadict_get_columns",
+        "--args",
+        json.dumps(args),
+    ]
+    if target_path is not None:
+        bash_command += ["--target-path", target_path]
+    try:
+        with phase("dbt_subprocess"):
+            result = subprocess.run(bash_command, capture_output=True).stdout.decode(
+                "UTF-8"
+            )
+        marker_index = result.find(COLUMNS_MARKER)
+        if marker_index == -1:
+            logging.error(
+                "Issues encountered when fetching the model columns: " + result
+            )
+            return None
+        line = result[marker_index + len(COLUMNS_MARKER) :].splitlines()[0]
+        with phase("parse"):
+            rows = json.loads(line)
+        return columns_to_models(relations, rows)
+    except Exception as e:
+        logging.error(f"Issues encountered when fetching the model columns: {e}")
+        return None
@@ -0,0 +1,175 @@
+import logging
+import os
+import re
+
+from datadict import datadict_helpers
+from datadict.datadict_profile import phase
+
+DOCS_EXTENSIONS = (".md",)
+
+# A docs block, e.g. '{% docs customer_id %}Unique identifier of the customer{% enddocs %}', with optional whitespace
+# control on either tag
+DOCS_BLOCK = re.compile(
+    r"{%-?\s*docs\s+(\w+)\s*-?%}(.*?){%-?\s*enddocs\s*-?%}", re.DOTALL
+)
+# A reference to a docs block, e.g. "{{ doc('customer_id') }}" or "{{ doc('package', 'customer_id') }}"
+DOC_REFERENCE = re.compile(
+    r"""{{-?\s*doc\(\s*(['"])(\w+)\1\s*(?:,\s*(['"])(\w+)\3\s*)?\)\s*-?}}"""
+)
+
+# The docs index of each directory, kept for the life of the process and refreshed from the stat of each file
+_indexes = {}
+
+
+def parse_docs_blocks(text) -> dict:
+    """
+    Parse the docs blocks of a Markdown file.
+
+    Parameters:
+        text (str): The content of the file.
+
+    Returns:
+        dict: A dictionary mapping the name of each docs block to its content, with surrounding whitespace removed.
+    """
+    return {name: content.strip() for name, content in DOCS_BLOCK.findall(text)}
+
+
+def _read_docs_file(file_path) -> dict:
+    try:
+        with open(file_path, "r", encoding="utf-8") as file:
+            text = file.read()
+    except (OSError, UnicodeDecodeError) as error:
+        logging.error(f"There was an issue reading docs file '{file_path}'. {error}")
+        return {}
+    # Most Markdown files don't contain docs blocks, so they aren't searched
+    return parse_docs_blocks(text) if "docs" in text else {}
+
+
+def docs_index(directory) -> dict:
+    """
+    Get the index of the docs blocks of every Markdown file in a directory.
+
+    The index is built with a single scan of the directory, and kept for the life of the process. Later calls scan
+    the directory again, but only re-read the files whose modification time or size changed.
+
+    Parameters:
+        directory (str): The directory containing the Markdown files.
+
+    Returns:
+        dict: The index, with the 'files', mapping the path of each Markdown file to its 'stat' and 'blocks', and
+            the 'blocks' of the whole directory, mapping each name to its content. A name defined in several files
+            is taken from the first in sorted order.
+    """
+    key = os.path.abspath(directory)
+    index = _indexes.setdefault(key, {"files": {}, "blocks": {}})
+    with phase("scan"):
+        file_paths = []
+        for root, dirs, files in os.walk(directory):
+            for file in files:
+                if file.endswith(DOCS_EXTENSIONS):
+                    file_paths.append(os.path.join(root, file))
+        changed = index["files"].keys() - set(file_paths)
+        for file_path in changed:
+            del index["files"][file_path]
+        for file_path in file_paths:
+            stat = datadict_helpers.file_stat(file_path)
+            known = index["files"].get(file_path)
+            if known is None or known["stat"] != stat:
+                index["files"][file_path] = {
+                    "stat": stat,
+                    "blocks": _read_docs_file(file_path),
+                }
+                changed.add(file_path)
+        if changed:
+            blocks = {}
+            for file_path in sorted(index["files"]):
+                for name, content in index["files"][file_path]["blocks"].items():
+                    if name in blocks:
+                        logging.warning(
+                            f"Docs block '{name}' in '{file_path}' is already defined, and is ignored"
+                        )
+                    else:
+                        blocks[name] = content
+            index["blocks"] = blocks
+    return index
+
+
+def resolve_description(description, blocks) -> str:
+    """
+    Replace the docs block references in a description with the content of the blocks.
+
+    Parameters:
+        description (str): The description.
+        blocks (dict): A dictionary mapping the name of each docs block to its content.
+
+    Returns:
+        str: The description with every reference to a known docs block replaced, and surrounding whitespace
+            removed. References to unknown blocks are left as they are.
+    """
+    if "doc(" not in description:
+        return description.strip()
+
+    def replace(match):
+        name = match.group(4) or match.group(2)
+        return blocks.get(name, match.group(0))
+
+    return DOC_REFERENCE.sub(replace, description).strip()
+
+
+def build_resolver(directory):
+    """
+    Build a function resolving the docs block references of descriptions, from the docs blocks in a directory.
+
+    Parameters:
+        directory (str): The directory containing the Markdown files.
+
+    Returns:
+        function: A function taking a description and returning it resolved by 'resolve_description', which
+            memoizes each description it has seen, or None if the directory doesn't define any docs blocks.
+    """
+    blocks = docs_index(directory)["blocks"]
+    if not blocks:
+        return None
+    resolved = {}
+
+    def resolve(description):
+        result = resolved.get(description)
+        if result is None:
+            result = resolved[description] = resolve_description(description, blocks)
+        return result
+
+    return resolve
+
+
+def collapse_versions(versions, resolve) -> dict:
+    """
+    Merge the descriptions of a column that are the same once their docs block references are resolved.
+
+    The reference form is kept, so a docs block reference and the literal description it resolves to are merged
+    into the reference.
+
+    Parameters:
+        versions (dict): A dictionary mapping each description of the column to the number of models using it.
+        resolve (function): The function returned by 'build_resolver'.
+
+    Returns:
+        dict: A dictionary mapping the description kept for each distinct resolved description to the number of
+            models using it.
+    """
+    groups = {}
+    for version, count in versions.items():
+        groups.setdefault(resolve(version) if version else version, []).append(
+            (version, count)
+        )
+    collapsed = {}
+    for group in groups.values():
+        kept = min(
+            group,
+            key=lambda item: (
+                DOC_REFERENCE.search(item[0]) is None,
+                -item[1],
+                item[0],
+            ),
+        )[0]
+        collapsed[kept] = sum(count for _, count in group)
+    return collapsed
@@ -0,0 +1,333 @@
+import json
+import logging
+import math
+import os
+import queue
+import threading
+
+from datadict import (
+    datadict_check,
+    datadict_dbt,
+    datadict_helpers,
+    datadict_manifest,
+    datadict_scanner,
+    datadict_yaml,
+)
+
+DEFAULT_CATALOG_PATH = os.path.join("target", "catalog.json")
+
+TABLE_HEADER = ("MODEL", "CHANGE", "COLUMN", "YAML", "ACTUAL", "FILE")
+
+
+def yaml_columns(file_paths) -> dict:
+    """
+    Read the columns defined for every model in a set of model YAML files, without loading the files.
+
+    Parameters:
+        file_paths (list): The paths of the YAML files to read.
+
+    Returns:
+        dict: A dictionary with the 'models', mapping each model name to the 'file' it is defined in and its
+            'columns', a dictionary of each column name to its data type or None, and the 'errors' encountered
+            reading files. A model defined in several files is taken from the first.
+    """
+    models = {}
+    errors = []
+    for file_path in file_paths:
+        try:
+            if not datadict_helpers.might_contain_models(file_path):
+                continue
+            file_models = {}
+            for model, column, _, data_type in datadict_scanner.iter_model_columns(
+                file_path
+            ):
+                columns = file_models.setdefault(model, {})
+                if column is not None:
+                    columns[column] = data_type
+        except Exception as error:
+            errors.append({"file": file_path, "error": str(error)})
+            continue
+        for model, columns in file_models.items():
+            models.setdefault(model, {"file": file_path, "columns": columns})
+    return {"models": models, "errors": errors}
+
+
+def catalog_columns(catalog_path, model_names) -> dict:
+    """
+    Read the columns of models from a dbt catalog, as written by 'dbt docs generate'.
+
+    Column names and data types are lower cased, as codegen does.
+
+    Parameters:
+        catalog_path (str): The path to the catalog.
+        model_names (list): The names of the models to read.
+
+    Returns:
+        dict: A dictionary mapping the name of each model found in the catalog to a dictionary of each column
+            name to its data type.
+    """
+    with open(catalog_path, "r") as file:
+        catalog = json.load(file)
+    wanted = set(model_names)
+    models = {}
+    for unique_id, node in (catalog.get("nodes") or {}).items():
+        parts = unique_id.split(".")
+        if parts[0] != "model" or len(parts) < 3 or parts[2] not in wanted:
+            continue
+        columns = sorted(
+            (node.get("columns") or {}).values(),
+            key=lambda column: column.get("index") or 0,
+        )
+        models[parts[2]] = {
+            column["name"].lower(): (column.get("type") or "").lower() or None
+            for column in columns
+        }
+    return models
+
+
+def generated_columns(model_names, columns_from="codegen", jobs=1, chunk_size=100):
+    """
+    Generate the columns of models with codegen, or batched information_schema queries, without writing files.
+
+    Parameters:
+        model_names (list): The names of the models to generate.
+        columns_from (str, optional): Either 'codegen' or 'information_schema'. Defaults to 'codegen'.
+        jobs (int, optional): The number of runs in flight at once. Defaults to 1.
+        chunk_size (int, optional): The number of models in each run. Defaults to 100.
+
+    Returns:
+        dict: A dictionary mapping the name of each generated model to a dictionary of each column name to its
+            data type or None.
+    """
+    models = {}
+    output_queue = queue.Queue(maxsize=jobs * 4)
+    thread = threading.Thread(
+        target=datadict_yaml.run_codegen,
+        args=(model_names, output_queue, jobs, chunk_size, True, columns_from),
+        daemon=True,
+    )
+    thread.start()
+    while True:
+        model = output_queue.get()
+        if model is None:
+            break
+        models[model["name"]] = {
+            column["name"]: column.get("data_type")
+            for column in model.get("columns") or []
+        }
+    thread.join()
+    return models
+
+
+def compare_columns(expected, actual) -> dict:
+    """
+    Compare the columns defined for a model in YAML with the columns it actually has.
+
+    Parameters:
+        expected (dict): The columns defined in YAML, mapping each name to its data type or None.
+        actual (dict): The columns the model has, mapping each name to its data type or None.
+
+    Returns:
+        dict: The sorted 'added' columns, which the model has but the YAML doesn't define, the sorted 'removed'
+            columns, which the YAML defines but the model doesn't have, and the 'type_changed' columns, with the
+            'column', the data type 'expected' by the YAML and the 'actual' data type. Data types are only compared
+            when both are known, ignoring case.
+    """
+    expected_names = expected.keys()
+    actual_names = actual.keys()
+    type_changed = []
+    for name in sorted(expected_names & actual_names):
+        expected_type = expected[name]
+        actual_type = actual[name]
+        if (
+            expected_type
+            and actual_type
+            and str(expected_type).lower() != str(actual_type).lower()
+        ):
+            type_changed.append(
+                {"column": name, "expected": expected_type, "actual": actual_type}
+            )
+    return {
+        "added": sorted(actual_names - expected_names),
+        "removed": sorted(expected_names - actual_names),
+        "type_changed": type_changed,
+    }
+
+
+def drift_report(documented, actual, model_names) -> dict:
+    """
+    Build the drift report for a set of models.
+
+    Parameters:
+        documented (dict): The models defined in YAML, as returned in the 'models' of 'yaml_columns'.
+        actual (dict): The columns each model actually has, mapping each model name to its columns.
+        model_names (iterable): The names of the models to report on.
+
+    Returns:
+        dict: The report, with the 'models' that have drifted, each with its 'model', 'file' and the changes from
+            'compare_columns', the 'undocumented_models' that aren't defined in any YAML file and the
+            'unavailable_models' whose columns couldn't be fetched.
+    """
+    drifted = []
+    undocumented = []
+    unavailable = []
+    for name in sorted(set(model_names)):
+        if name not in actual:
+            if name in documented:
+                unavailable.append(name)
+            continue
+        if name not in documented:
+            undocumented.append(name)
+            continue
+        changes = compare_columns(documented[name]["columns"], actual[name])
+        if changes["added"] or changes["removed"] or changes["type_changed"]:
+            drifted.append({"model": name, "file": documented[name]["file"], **changes})
+    return {
+        "models": drifted,
+        "undocumented_models": undocumented,
+        "unavailable_models": unavailable,
+    }
+
+
+def run_drift(
+    directory,
+    columns_from="codegen",
+    catalog_path=DEFAULT_CATALOG_PATH,
+    select=(),
+    exclude=(),
+    jobs=None,
+    chunk_size=None,
+) -> dict:
+    """
+    Compare the columns of every model with the columns defined in its YAML, without writing to any file.
+
+    Parameters:
+        directory (str): The directory containing the model SQL and YAML files.
+        columns_from (str, optional): Where to get the actual columns from: 'codegen', 'information_schema' or
+            'catalog'. Defaults to 'codegen'.
+        catalog_path (str, optional): The path to the dbt catalog, used with 'catalog'. Defaults to
+            'target/catalog.json'.
+        select (tuple, optional): dbt-style selectors for the models to compare. Defaults to every model.
+        exclude (tuple, optional): dbt-style selectors for the models to leave out. Defaults to none.
+        jobs (int, optional): The number of codegen runs in flight at once. Defaults to the number of CPUs.
+        chunk_size (int, optional): The number of models in each codegen run. Defaults to spreading the models over
+            four runs per job.
+
+    Returns:
+        dict: The report from 'drift_report', with the 'errors' encountered, a 'summary' of the number of models
+            and columns in each category and the 'exit_code' the command should exit with.
+    """
+    errors = []
+    model_names = [
+        os.path.basename(file).split(".")[0]
+        for file in datadict_helpers.list_directory_files(directory, [".sql"]) or []
+    ]
+    if columns_from != "catalog" and not datadict_dbt.validate_dbt(
+        require_codegen=columns_from == "codegen"
+    ):
+        errors.append({"file": None, "error": "dbt isn't configured correctly"})
+        model_names = []
+    if model_names and (select or exclude or columns_from == "information_schema"):
+        if not datadict_dbt.parse_project():
+            errors.append({"file": None, "error": "dbt parse failed"})
+            model_names = []
+        elif select or exclude:
+            selected = datadict_manifest.select_models(select=select, exclude=exclude)
+            if selected is None:
+                errors.append({"file": None, "error": "The selectors are invalid"})
+                selected = set()
+            model_names = [name for name in model_names if name in selected]
+
+    yaml_file_list = datadict_helpers.list_directory_files(directory, [".yml", ".yaml"])
+    documented = yaml_columns(yaml_file_list or [])
+    errors.extend(documented["errors"])
+
+    actual = {}
+    if model_names:
+        if columns_from == "catalog":
+            try:
+                actual = catalog_columns(catalog_path, model_names)
+            except (OSError, ValueError) as error:
+                errors.append({"file": catalog_path, "error": str(error)})
+        else:
+            jobs = jobs or os.cpu_count() or 1
+            if chunk_size is None:
+                chunk_size = max(1, math.ceil(len(model_names) / (jobs * 4)))
+            actual = generated_columns(model_names, columns_from, jobs, chunk_size)
+
+    report = drift_report(documented["models"], actual, model_names)
+    report["errors"] = errors
+    report["summary"] = {
+        "models_checked": sum(
+            1
+            for name in set(model_names)
+            if name in actual and name in documented["models"]
+        ),
+        "models_drifted": len(report["models"]),
+        "columns_added": sum(len(model["added"]) for model in report["models"]),
+        "columns_removed": sum(len(model["removed"]) for model in report["models"]),
+        "types_changed": sum(len(model["type_changed"]) for model in report["models"]),
+        "undocumented_models": len(report["undocumented_models"]),
+        "unavailable_models": len(report["unavailable_models"]),
+        "errors": len(errors),
+    }
+    if errors:
+        report["exit_code"] = datadict_check.EXIT_ERROR
+    elif (
+        report["models"]
+        or report["undocumented_models"]
+        or report["unavailable_models"]
+    ):
+        report["exit_code"] = datadict_check.EXIT_FINDINGS
+    else:
+        report["exit_code"] = datadict_check.EXIT_OK
+    logging.info(
+        "Compared columns: "
+        + ", ".join(f"{key} {value}" for key, value in report["summary"].items())
+    )
+    return report
+
+
+def format_table(report) -> str:
+    """
+    Format a drift report as a table with a row for each changed column, followed by the undocumented and
+    unavailable models, errors and the summary.
+
+    Parameters:
+        report (dict): The report returned by 'run_drift'.
+
+    Returns:
+        str: The table.
+    """
+    rows = [TABLE_HEADER]
+    for model in report["models"]:
+        for column in model["added"]:
+            rows.append((model["model"], "added", column, "", "", model["file"]))
+        for column in model["removed"]:
+            rows.append((model["model"], "removed", column, "", "", model["file"]))
+        for change in model["type_changed"]:
+            rows.append(
+                (
+                    model["model"],
+                    "type_changed",
+                    change["column"],
+                    str(change["expected"]),
+                    str(change["actual"]),
+                    model["file"],
+                )
+            )
+    for name in report["undocumented_models"]:
+        rows.append((name, "undocumented", "", "", "", ""))
+    for name in report["unavailable_models"]:
+        rows.append((name, "unavailable", "", "", "", ""))
+    widths = [max(len(row[index]) for row in rows) for index in range(len(rows[0]))]
+    lines = [
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in rows
+    ]
+    for error in report["errors"]:
+        lines.append(f"error: {error['file']}: {error['error']}")
+    lines.append(
+        ", ".join(f"{key}: {value}" for key, value in report["summary"].items())
+    )
+    return "\n".join(lines)
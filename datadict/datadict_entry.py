@@ -0,0 +1,642 @@
+import fnmatch
+import re
+import sys
+
+from datadict import datadict_cluster, datadict_docs
+
+# The characters that make an alias a glob pattern, e.g. '*_customer_id'. Aliases starting with '^' or ending with '$'
+# are regular expressions, e.g. '^src_.*_at$'.
+GLOB_CHARACTERS = frozenset("*?[")
+REGEX_CHARACTERS = frozenset("\\.^$*+?{}[]|()")
+
+# The normalizations that can be applied to column names before they are matched and collated, in the order they
+# are applied
+NORMALIZATIONS = ("strip_quotes", "snake_case", "casefold")
+QUOTES = "\"'`"
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])|(?<=[A-Z])(?=[A-Z][a-z])")
+SEPARATORS = re.compile(r"[\s\-]+")
+
+
+def _intern(value):
+    # Quoted scalars are loaded as subclasses of str, which can't be interned. They are written back quoted if needed.
+    return sys.intern(str(value)) if isinstance(value, str) else value
+
+
+class DictionaryEntry:
+    __slots__ = (
+        "name",
+        "description",
+        "aliases",
+        "description_versions",
+        "models",
+        "extra",
+    )
+
+    def __init__(
+        self,
+        name,
+        description="",
+        aliases=(),
+        description_versions=None,
+        models=None,
+        extra=None,
+    ) -> None:
+        """
+        Initialize a dictionary entry.
+
+        Entries are the in-memory form of the items of the dictionary file. They are built once when the
+        dictionary is loaded, matched against and collated without touching the YAML tree, and converted back to
+        YAML with 'to_yaml' only when the dictionary is written. Names and aliases are interned, as the same few
+        thousand names are compared against every column of every model file.
+
+        Parameters:
+            name (str): The column name of the entry.
+            description (str, optional): The description of the column. Defaults to ''.
+            aliases (iterable, optional): The other names the column is known by. Defaults to none.
+            description_versions (list, optional): The conflicting descriptions found in the model files.
+            models (list, optional): The names of the models using the column.
+            extra (dict, optional): Any other keys of the entry, kept so that they are written back unchanged.
+
+        Returns:
+            None
+        """
+        self.name = _intern(name)
+        self.description = description or ""
+        self.aliases = tuple(_intern(alias) for alias in aliases or ())
+        self.description_versions = description_versions
+        self.models = models
+        self.extra = extra
+
+    @classmethod
+    def from_yaml(cls, item) -> "DictionaryEntry":
+        """
+        Build an entry from an item of the dictionary file.
+
+        Parameters:
+            item (dict): The loaded item, with a 'name' and, optionally, a 'description', 'aliases',
+                'description_versions' and 'models'.
+
+        Returns:
+            DictionaryEntry: The entry.
+        """
+        extra = {
+            key: value
+            for key, value in item.items()
+            if key not in DictionaryEntry.__slots__
+        }
+        description_versions = item.get("description_versions")
+        models = item.get("models")
+        return cls(
+            item["name"],
+            item.get("description"),
+            item.get("aliases"),
+            list(description_versions) if description_versions is not None else None,
+            list(models) if models is not None else None,
+            extra or None,
+        )
+
+    @property
+    def names(self) -> tuple:
+        """
+        The name of the entry followed by its aliases.
+        """
+        return (self.name,) + self.aliases
+
+    @property
+    def exact_names(self) -> tuple:
+        """
+        The name of the entry followed by its aliases that aren't patterns.
+        """
+        return (self.name,) + tuple(
+            alias for alias in self.aliases if pattern_kind(alias) is None
+        )
+
+    def add_model(self, model) -> None:
+        """
+        Record that a model uses the column, if it isn't recorded already.
+
+        Parameters:
+            model (str): The name of the model.
+
+        Returns:
+            None
+        """
+        if self.models is None:
+            self.models = [model]
+        elif model not in self.models:
+            self.models.append(model)
+
+    def to_yaml(self) -> dict:
+        """
+        Convert the entry back to an item of the dictionary file.
+
+        Returns:
+            dict: The item, with the 'name' and 'description', followed by the 'aliases', 'description_versions'
+                and 'models' if they are set, and any other keys the entry was loaded with.
+        """
+        item = {"name": self.name, "description": self.description}
+        if self.aliases:
+            item["aliases"] = list(self.aliases)
+        if self.description_versions is not None:
+            item["description_versions"] = list(self.description_versions)
+        if self.models is not None:
+            item["models"] = list(self.models)
+        if self.extra:
+            item.update(self.extra)
+        return item
+
+    def __repr__(self) -> str:
+        return f"DictionaryEntry({self.to_yaml()!r})"
+
+
+def load_entries(items) -> list:
+    """
+    Build the entries of a dictionary from the items of the dictionary file.
+
+    Parameters:
+        items (list): The 'dictionary' list of the dictionary file, or None if it is empty.
+
+    Returns:
+        list: A DictionaryEntry for each item, in the same order.
+    """
+    return [DictionaryEntry.from_yaml(item) for item in items or []]
+
+
+def entries_to_yaml(entries) -> list:
+    """
+    Convert entries back to the items of the dictionary file.
+
+    Parameters:
+        entries (list): The entries to convert.
+
+    Returns:
+        list: The items returned by 'DictionaryEntry.to_yaml', in the same order.
+    """
+    return [entry.to_yaml() for entry in entries]
+
+
+def _unchanged(name):
+    return name
+
+
+def build_normalizer(normalizations):
+    """
+    Build a function normalizing column names, so that names differing in case or quoting match the same entry.
+
+    The normalizations are:
+    - 'strip_quotes': Strips the quotes and brackets warehouses put around identifiers, e.g. '"CustomerID"'.
+    - 'snake_case': Converts camel case to lower snake case, e.g. 'CustomerID' to 'customer_id', also replacing
+      spaces and hyphens with underscores.
+    - 'casefold': Folds the case of the name, e.g. 'CUSTOMER_ID' to 'customer_id'.
+
+    Each name is only normalized once. The normalized key is memoized, as the same column names appear in many
+    models.
+
+    Parameters:
+        normalizations (list): The names of the normalizations to apply, from NORMALIZATIONS. They are always
+            applied in the order of NORMALIZATIONS.
+
+    Returns:
+        function: A function returning the normalized key of a name, or None if there are no normalizations.
+
+    Raises:
+        ValueError: If a normalization is unknown.
+    """
+    if isinstance(normalizations, str):
+        normalizations = [normalizations]
+    unknown = set(normalizations) - set(NORMALIZATIONS)
+    if unknown:
+        raise ValueError(
+            f"Unknown normalizations: {', '.join(sorted(map(str, unknown)))}. "
+            f"Use any of: {', '.join(NORMALIZATIONS)}"
+        )
+    if not normalizations:
+        return None
+    strip_quotes = "strip_quotes" in normalizations
+    snake_case = "snake_case" in normalizations
+    casefold = "casefold" in normalizations
+    keys = {}
+
+    def normalize(name):
+        key = keys.get(name)
+        if key is not None:
+            return key
+        if not isinstance(name, str):
+            return name
+        key = name
+        if strip_quotes:
+            key = key.strip(QUOTES)
+            if key.startswith("[") and key.endswith("]"):
+                key = key[1:-1]
+        if snake_case:
+            key = SEPARATORS.sub("_", CAMEL_BOUNDARY.sub("_", key.strip())).lower()
+        if casefold:
+            key = key.casefold()
+        key = sys.intern(key)
+        keys[name] = key
+        return key
+
+    return normalize
+
+
+def pattern_kind(alias) -> str:
+    """
+    Get the kind of pattern an alias is.
+
+    Parameters:
+        alias (str): The alias.
+
+    Returns:
+        str: 'regex' if the alias starts with '^' or ends with '$', 'glob' if it contains any of '*', '?' and '[', or
+            None if it is an exact name.
+    """
+    if not isinstance(alias, str):
+        return None
+    if alias.startswith("^") or alias.endswith("$"):
+        return "regex"
+    if not GLOB_CHARACTERS.isdisjoint(alias):
+        return "glob"
+    return None
+
+
+def _literal_prefix(alias, kind) -> str:
+    """
+    Get the literal text every name matching a pattern alias must start with, or '' if there isn't any.
+    """
+    if kind == "glob":
+        for index, character in enumerate(alias):
+            if character in GLOB_CHARACTERS:
+                return alias[:index]
+        return alias
+    body = alias[1:] if alias.startswith("^") else alias
+    if "|" in body:
+        return ""
+    for index, character in enumerate(body):
+        if character in REGEX_CHARACTERS:
+            # A literal followed by an optional quantifier may be absent
+            return body[: max(index - 1, 0)] if character in "*?{" else body[:index]
+    return body
+
+
+# The wildcards and character classes of a glob, which are kept as they are when the glob is normalized
+GLOB_TOKENS = re.compile(r"(\[[^\]]*\]|[*?])")
+
+
+def _normalize_glob(alias, normalize) -> str:
+    """
+    Normalize the literal text of a glob alias, so that it matches normalized names.
+    """
+    parts = GLOB_TOKENS.split(alias)
+    return "".join(
+        part if index % 2 else normalize(part) for index, part in enumerate(parts)
+    )
+
+
+def _folds_case(normalize) -> bool:
+    return normalize is not None and normalize("A") != "A"
+
+
+def _insert(trie, key, position) -> None:
+    node = trie
+    for character in key:
+        node = node.setdefault(character, {})
+    node.setdefault(None, []).append(position)
+
+
+def _walk(trie, key) -> list:
+    """
+    Get the positions stored in a trie under every prefix of the key, including the empty and the whole key.
+    """
+    node = trie
+    positions = list(node.get(None, ()))
+    for character in key:
+        node = node.get(character)
+        if node is None:
+            break
+        positions.extend(node.get(None, ()))
+    return positions
+
+
+class AliasMatcher:
+    __slots__ = (
+        "exact",
+        "_entries",
+        "_prefixes",
+        "_suffixes",
+        "_literals",
+        "_compiled",
+        "_regex",
+        "_groups",
+        "_separate",
+        "_cache",
+        "_normalize",
+    )
+
+    def __init__(self, exact, patterns=(), normalize=None) -> None:
+        """
+        Initialize a matcher of column names against the names and aliases of the dictionary.
+
+        A column name is first looked up in 'exact'. Only if it has no exact match is it matched against the pattern
+        aliases, which are compiled once into a single matcher: globs of the form 'prefix*' into a prefix trie,
+        globs of the form '*suffix' into a suffix trie, other patterns starting with literal text into a trie of
+        those literal prefixes, so that only the patterns sharing a prefix with the name are tried, and the
+        remaining patterns into one alternation. Regular expressions with capturing groups or global inline flags
+        can't be combined without changing their meaning, e.g. the group numbers of backreferences, so they are
+        tried on their own. Where several patterns match, the first in 'patterns' is used. The result of each
+        pattern lookup is cached, as the same column names appear in many models.
+
+        With a 'normalize' function, names are normalized before they are looked up, and patterns are matched
+        against the normalized name. The literal text of glob aliases is normalized the same way, and if the
+        normalization folds case, regular expression aliases are matched ignoring case.
+
+        Parameters:
+            exact (dict): A dictionary mapping each exact name and alias to a tuple of the entries matching it, as
+                returned by 'build_matcher'.
+            patterns (list, optional): A list of '(alias, entry)' tuples of the pattern aliases, in precedence order.
+                Defaults to none.
+            normalize (function, optional): The function returned by 'build_normalizer', which the keys of 'exact'
+                have been normalized with. Defaults to none.
+
+        Returns:
+            None
+
+        Raises:
+            ValueError: If a regular expression alias is invalid.
+        """
+        self.exact = exact
+        self._normalize = normalize
+        self._entries = []
+        self._prefixes = {}
+        self._suffixes = {}
+        self._literals = {}
+        self._compiled = {}
+        self._cache = {}
+        self._separate = []
+        flags = re.IGNORECASE if _folds_case(normalize) else 0
+        default_flags = re.compile("", flags).flags
+        alternatives = []
+        for position, (alias, entry) in enumerate(patterns):
+            self._entries.append(entry)
+            kind = pattern_kind(alias)
+            if kind == "glob" and normalize is not None:
+                alias = _normalize_glob(alias, normalize)
+            if kind == "glob":
+                if alias.endswith("*") and GLOB_CHARACTERS.isdisjoint(alias[:-1]):
+                    _insert(self._prefixes, alias[:-1], position)
+                    continue
+                if alias.startswith("*") and GLOB_CHARACTERS.isdisjoint(alias[1:]):
+                    _insert(self._suffixes, alias[:0:-1], position)
+                    continue
+                expression = fnmatch.translate(alias)
+            else:
+                expression = alias
+            try:
+                compiled = re.compile(expression, flags)
+            except re.error as error:
+                raise ValueError(
+                    f"Invalid pattern alias '{alias}' of '{entry.name}': {error}"
+                )
+            literal = _literal_prefix(alias, kind)
+            if literal:
+                if flags and kind == "regex":
+                    literal = literal.casefold()
+                _insert(self._literals, literal, position)
+                self._compiled[position] = compiled
+            elif compiled.groups or compiled.flags != default_flags:
+                self._separate.append((position, compiled))
+            else:
+                alternatives.append(f"(?P<_p{position}>{expression})")
+        self._regex = None
+        self._groups = {}
+        if alternatives:
+            self._regex = re.compile("|".join(alternatives), flags)
+            # The wrapping group of each alternative is its only group, so it is the 'lastindex' of a match
+            self._groups = {
+                index: int(name[2:])
+                for name, index in self._regex.groupindex.items()
+                if name.startswith("_p") and name[2:].isdigit()
+            }
+
+    def match(self, name) -> tuple:
+        """
+        Get the entries matching a column name.
+
+        Parameters:
+            name (str): The column name.
+
+        Returns:
+            tuple: The entries matching the name exactly, in dictionary order, or else the entry of the first pattern
+                alias matching it, or an empty tuple.
+        """
+        if self._normalize is not None:
+            name = self._normalize(name)
+        matched = self.exact.get(name)
+        if matched is not None:
+            return matched
+        if not self._entries:
+            return ()
+        matched = self._cache.get(name)
+        if matched is not None:
+            return matched
+        positions = _walk(self._prefixes, name) + _walk(self._suffixes, name[::-1])
+        for position in sorted(_walk(self._literals, name)):
+            if self._compiled[position].fullmatch(name) is not None:
+                positions.append(position)
+                break
+        if self._regex is not None:
+            found = self._regex.fullmatch(name)
+            if found is not None:
+                positions.append(self._groups[found.lastindex])
+        for position, compiled in self._separate:
+            if compiled.fullmatch(name) is not None:
+                positions.append(position)
+                break
+        matched = (self._entries[min(positions)],) if positions else ()
+        self._cache[name] = matched
+        return matched
+
+
+def build_matcher(entries, normalize=None) -> dict:
+    """
+    Build a lookup from every column name and alias to the entries it matches. Pattern aliases are left out, as they
+    are matched by 'AliasMatcher'.
+
+    Parameters:
+        entries (list): The dictionary entries.
+        normalize (function, optional): The function returned by 'build_normalizer' to normalize the names and
+            aliases with. Defaults to none.
+
+    Returns:
+        dict: A dictionary mapping each name and alias to a tuple of the entries matching it, in dictionary order.
+    """
+    normalize = normalize or _unchanged
+    matches = {}
+    for entry in entries:
+        for name in dict.fromkeys(map(normalize, entry.exact_names)):
+            matches.setdefault(name, []).append(entry)
+    return {name: tuple(matched) for name, matched in matches.items()}
+
+
+def build_layered_matcher(layers, normalize=None) -> dict:
+    """
+    Build a single lookup from every column name and alias to the entries it matches, across ordered layers.
+
+    Layers are given from the lowest to the highest precedence. An entry replaces the entries with the same name in
+    the layers before it, aliases included. Where a name or alias still matches entries in several layers, only the
+    entries of the last of them are kept. The result has the same shape as 'build_matcher', so a column is matched
+    with a single lookup however many layers there are.
+
+    Parameters:
+        layers (list): A list of the entries of each layer.
+        normalize (function, optional): The function returned by 'build_normalizer' to normalize the names and
+            aliases with. Names that are the same once normalized replace each other. Defaults to none.
+
+    Returns:
+        dict: A dictionary mapping each name and alias to a tuple of the entries matching it, in dictionary order.
+    """
+    key = normalize or _unchanged
+    matches = {}
+    redefined = set()
+    layer_matches = []
+    for entries in reversed(layers):
+        layer_matches.append(
+            build_matcher(
+                (entry for entry in entries if key(entry.name) not in redefined),
+                normalize,
+            )
+        )
+        redefined.update(key(entry.name) for entry in entries)
+    for matcher in reversed(layer_matches):
+        matches.update(matcher)
+    return matches
+
+
+def compile_matcher(layers, normalize=None) -> AliasMatcher:
+    """
+    Compile the matcher of column names against the names and aliases of ordered dictionary layers.
+
+    Exact names and aliases are merged as in 'build_layered_matcher'. Pattern aliases take precedence from the last
+    layer to the first, and in dictionary order within a layer. The pattern aliases of entries replaced by a later
+    layer are left out.
+
+    Parameters:
+        layers (list): A list of the entries of each layer, from the lowest to the highest precedence. A single
+            dictionary is a single layer.
+        normalize (function, optional): The function returned by 'build_normalizer' to normalize column names
+            with. Defaults to none.
+
+    Returns:
+        AliasMatcher: The matcher.
+    """
+    key = normalize or _unchanged
+    patterns = []
+    redefined = set()
+    for entries in reversed(layers):
+        for entry in entries:
+            if key(entry.name) in redefined:
+                continue
+            for alias in entry.aliases:
+                if pattern_kind(alias) is not None:
+                    patterns.append((alias, entry))
+        redefined.update(key(entry.name) for entry in entries)
+    return AliasMatcher(build_layered_matcher(layers, normalize), patterns, normalize)
+
+
+def collate_entries(
+    existing_fields, entries=(), normalize=None, similarity=None, resolve=None
+) -> list:
+    """
+    Collate the columns found in the model files into dictionary entries.
+
+    The fields are grouped by column name. Each entry lists the models using the column and, if they disagree,
+    the sorted 'description_versions' with an empty description. The aliases of the current entry with the same
+    name are carried over, so that they keep matching columns the next time the dictionary is applied, and so are
+    its other keys, e.g. 'tags' or 'meta'.
+
+    With a 'normalize' function, fields are grouped by their normalized name instead, so that e.g. 'CustomerID' and
+    'customer_id' are collated into one entry. The entry keeps the name of the current entry with the same
+    normalized name, or else is named with the normalized name.
+
+    With a 'similarity' threshold, the conflicting descriptions of each column are clustered into near-duplicates
+    (see 'datadict_cluster.canonical_descriptions'), and each is replaced by the canonical description of its
+    cluster. Columns are clustered separately, so a column is only ever given one of its own descriptions. A column
+    whose descriptions are all near-duplicates of each other is given the canonical description rather than
+    'description_versions'.
+
+    With a 'resolve' function, descriptions that are the same once their '{{ doc() }}' references are resolved
+    aren't conflicting, and are collated into the reference form (see 'datadict_docs.collapse_versions').
+
+    Parameters:
+        existing_fields (list): The fields found in the model files, each with a 'name', 'model' and,
+            optionally, 'description'.
+        entries (list, optional): The current dictionary entries. Defaults to none.
+        normalize (function, optional): The function returned by 'build_normalizer'. Defaults to none.
+        similarity (float, optional): The minimum similarity for descriptions to be near-duplicates. Defaults to
+            none, which only treats identical descriptions as the same.
+        resolve (function, optional): The function returned by 'datadict_docs.build_resolver'. Defaults to none.
+
+    Returns:
+        list: The collated entries, sorted by name.
+    """
+    key = normalize or _unchanged
+    names = {}
+    aliases = {}
+    extras = {}
+    for entry in entries:
+        entry_key = key(entry.name)
+        names.setdefault(entry_key, entry.name)
+        if entry.aliases:
+            aliases.setdefault(entry_key, entry.aliases)
+        if entry.extra:
+            extras.setdefault(entry_key, entry.extra)
+
+    metadata = {}
+    for field in existing_fields:
+        description = field.get("description", "")
+        field_key = key(field["name"])
+        info = metadata.get(field_key)
+        if info is None:
+            metadata[field_key] = {
+                "description": description,
+                "versions": {description: 1},
+                "models": {field["model"]},
+            }
+        else:
+            versions = info["versions"]
+            versions[description] = versions.get(description, 0) + 1
+            info["models"].add(field["model"])
+
+    for info in metadata.values():
+        info["described"] = len(info["versions"].keys() - {""})
+        if resolve is not None and info["described"] > 1:
+            info["versions"] = datadict_docs.collapse_versions(
+                info["versions"], resolve
+            )
+
+    collated = []
+    for field_key, info in metadata.items():
+        versions = {version for version in info["versions"] if version}
+        if similarity is not None and len(versions) > 1:
+            # Only the descriptions of conflicting columns are clustered, weighted by the number of models using them
+            counts = {version: info["versions"][version] for version in versions}
+            canonical = datadict_cluster.canonical_descriptions(counts, similarity)
+            versions = {canonical.get(version, version) for version in versions}
+        versions = sorted(versions)
+        conflicting = len(versions) > 1
+        if conflicting:
+            description = ""
+        elif len(versions) == 1 and info["described"] > 1:
+            description = versions[0]
+        else:
+            description = info["description"]
+        collated.append(
+            DictionaryEntry(
+                names.get(field_key, field_key),
+                description,
+                aliases.get(field_key),
+                versions if conflicting else None,
+                sorted(info["models"]),
+                extras.get(field_key),
+            )
+        )
+    return sorted(collated, key=lambda entry: entry.name)
@@ -1,5 +1,25 @@
+import io
 import logging
 import os
+import re
+
+from datadict import datadict_progress, datadict_report
+from datadict.datadict_profile import phase
+
+_fast_yaml = None
+
+# The recorder that model files and the dictionary are written through while a run is recorded (see
+# 'datadict_api.recording'), or None to write them directly
+_file_writer = None
+
+# A 'models' key at the start of a line, optionally quoted, or a document in flow style. Indented keys, e.g. the
+# 'models' of a selector or an exposure's 'depends_on', don't match.
+MODELS_KEY_PATTERN = re.compile(
+    rb"^(?:\xef\xbb\xbf)?(?:[\"']?models[\"']?[ \t]*:|\{)", re.MULTILINE
+)
+
+# Files at least this large are memory-mapped by 'might_contain_models' rather than read
+MMAP_THRESHOLD = 1024 * 1024
 
 
 def add_spaces_between_cols(file):
@@ -15,37 +35,187 @@ def add_spaces_between_cols(file):
     Returns:
         None
     """
-    with open(file, "rt") as f:
-        yaml = f.read()
-    replaced = yaml.replace("dictionary:\n\n", "dictionary:\n").replace(
+    with phase("write", file):
+        with open(file, "rt") as f:
+            yaml = f.read()
+        with open(file, "w") as f:
+            f.write(space_columns(yaml))
+
+
+def space_columns(text) -> str:
+    """
+    Insert a blank line before each column starting with '- name:' of a serialized dictionary.
+
+    Parameters:
+        text (str): The serialized dictionary.
+
+    Returns:
+        str: The dictionary with a blank line between its entries.
+    """
+    return text.replace("dictionary:\n\n", "dictionary:\n").replace(
         "  - name:", "\n  - name:"
     )
-    with open(file, "w") as f:
-        f.write(replaced)
+
+
+def write_file(file_path, content) -> None:
+    """
+    Write the content of a model file or the dictionary.
+
+    While a run is recorded, the write is handed to the recorder instead, which may defer it (see
+    'datadict_api.recording').
+
+    Parameters:
+        file_path (str): The path of the file to write.
+        content (str): The content to write.
+
+    Returns:
+        None
+    """
+    if _file_writer is not None:
+        _file_writer.write_file(file_path, content)
+        return
+    with phase("write", file_path), open(file_path, "w") as file:
+        file.write(content)
+
+
+def append_file(file_path, content) -> None:
+    """
+    Append content to a model file, creating it if it doesn't exist.
+
+    While a run is recorded, the append is handed to the recorder instead, which may defer it.
+
+    Parameters:
+        file_path (str): The path of the file to append to.
+        content (str): The content to append.
+
+    Returns:
+        None
+    """
+    if _file_writer is not None:
+        _file_writer.append_file(file_path, content)
+        return
+    with phase("write", file_path), open(file_path, "a") as file:
+        file.write(content)
+
+
+def remove_file(file_path) -> None:
+    """
+    Remove a model file, e.g. after its models have been split into their own files.
+
+    While a run is recorded, the removal is handed to the recorder instead, which may defer it.
+
+    Parameters:
+        file_path (str): The path of the file to remove.
+
+    Returns:
+        None
+    """
+    if _file_writer is not None:
+        _file_writer.remove_file(file_path)
+        return
+    os.remove(file_path)
+
+
+def file_stat(file_path) -> list:
+    """
+    Get the modification time and size of a file, used to detect whether it has changed.
+
+    Parameters:
+        file_path (str): The path of the file.
+
+    Returns:
+        list: The modification time in nanoseconds and the size in bytes, or None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(file_path)
+        return [stat.st_mtime_ns, stat.st_size]
+    except OSError:
+        return None
+
+
+def might_contain_models(file_path) -> bool:
+    """
+    Check the raw bytes of a YAML file for a top-level 'models' key, without parsing it.
+
+    dbt projects contain many YAML files that aren't model files, e.g. sources, exposures, semantic models,
+    selectors and package configs. This check lets them be skipped before they reach the YAML parser. It may
+    return True for a file without models, e.g. one in flow style, which is then rejected after parsing as
+    before, but never returns False for a file with a top-level 'models' key. Large files are memory-mapped,
+    so that they aren't read into memory to be searched.
+
+    Parameters:
+        file_path (str): The path to the YAML file.
+
+    Returns:
+        bool: False if the file certainly has no top-level 'models' key, True otherwise.
+    """
+    with phase("prefilter", file_path), open(file_path, "rb") as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            return False
+        if size < MMAP_THRESHOLD:
+            return MODELS_KEY_PATTERN.search(file.read()) is not None
+        import mmap
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return MODELS_KEY_PATTERN.search(mapped) is not None
 
 
 def open_model_yml_file(yaml_obj, file_path) -> dict:
     """
     Open and load a model YAML file for processing.
 
-    This private method is used to open and load a YAML file from the provided file path. The function
-    attempts to read and parse the file using the YAML parser. If the YAML data represents a valid model,
-    it returns a dictionary with the status as "valid" and the loaded YAML data. Otherwise, it logs a
-    message indicating that the file was skipped and returns a dictionary with the status as "invalid".
+    This private method is used to open and load a YAML file from the provided file path. Files without a
+    top-level 'models' key are recognised from their raw bytes by 'might_contain_models', and are skipped
+    without being parsed. Otherwise, the function attempts to read and parse the file using the YAML parser.
+    If the YAML data represents a valid model, it returns a dictionary with the status as "valid" and the loaded
+    YAML data. Otherwise, it returns a dictionary with the status as "invalid".
 
     Parameters:
         file_path (str): The path to the YAML file to be opened and loaded.
 
     Returns:
-        dict: A dictionary with the keys "status" and "yaml". The "status" key will be either "valid" or "invalid".
-            The "yaml" key will contain the loaded YAML data if valid, otherwise, it will contain None.
+        dict: A dictionary with the keys "status", "yaml" and "parsed". The "status" key will be either "valid" or
+            "invalid". The "yaml" key will contain the loaded YAML data if valid, otherwise, it will contain None.
+            The "parsed" key will be False if the file was skipped without being parsed.
     """
-    with open(file_path, "r+") as file:
-        yaml = yaml_obj.load(file)
-        if check_valid_model_file(yaml):
-            return {"status": "valid", "yaml": yaml}
-        else:
-            return {"status": "invalid", "yaml": None}
+    # A file whose write has been deferred is read as it will be written
+    pending = _file_writer.pending_content(file_path) if _file_writer else None
+    if pending is not None:
+        with phase("parse", file_path):
+            yaml = yaml_obj.load(pending)
+    elif not might_contain_models(file_path):
+        return {"status": "invalid", "yaml": None, "parsed": False}
+    else:
+        with phase("parse", file_path), open(file_path, "r+") as file:
+            yaml = yaml_obj.load(file)
+    if check_valid_model_file(yaml):
+        return {"status": "valid", "yaml": yaml, "parsed": True}
+    else:
+        return {"status": "invalid", "yaml": None, "parsed": True}
+
+
+def load_yaml_file_fast(file_path):
+    """
+    Load a YAML file with the fastest available parser, for read-only passes.
+
+    This function uses the 'safe' loader of 'ruamel.yaml', which is backed by the libyaml C extension when
+    'ruamel.yaml.clib' is installed, and is several times faster than the round-trip loader. The loaded data
+    doesn't preserve comments or formatting, so it must not be written back to the file.
+
+    Parameters:
+        file_path (str): The path to the YAML file to load.
+
+    Returns:
+        object: The loaded YAML data.
+    """
+    global _fast_yaml
+    if _fast_yaml is None:
+        import ruamel.yaml
+
+        _fast_yaml = ruamel.yaml.YAML(typ="safe")
+    with phase("parse", file_path), open(file_path, "r") as file:
+        return _fast_yaml.load(file)
 
 
 def check_valid_model_file(model_yaml) -> bool:
@@ -84,12 +254,17 @@ def output_model_file(yaml_obj, file_path, model_yaml, sort) -> None:
     """
     if sort:
         output_yaml = sort_model_file(model_yaml)
-        logging.info(f"File '{file_path}' has been sorted")
+        datadict_report.event(
+            "file_sorted", "File '{file}' has been sorted", file=file_path
+        )
     else:
         output_yaml = model_yaml
-    with open(file_path, "w") as file:
-        yaml_obj.dump(output_yaml, file)
-        logging.info(f"Updated model file '{file_path}'")
+    with phase("serialize", file_path):
+        stream = io.StringIO()
+        yaml_obj.dump(output_yaml, stream)
+    write_file(file_path, stream.getvalue())
+    datadict_progress.advance("written")
+    datadict_report.event("file_written", "Updated model file '{file}'", file=file_path)
 
 
 def list_directory_files(directory, extensions) -> dict:
@@ -109,10 +284,11 @@ def list_directory_files(directory, extensions) -> dict:
     try:
         files_list = []
         if os.path.exists(directory) and os.path.isdir(directory):
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    if file.endswith(tuple(extensions)):
-                        files_list.append(os.path.join(root, file))
+            with phase("scan"):
+                for root, dirs, files in os.walk(directory):
+                    for file in files:
+                        if file.endswith(tuple(extensions)):
+                            files_list.append(os.path.join(root, file))
             logging.info(
                 f"Found {len(files_list)} files in the directory '{directory}' with extensions: {', '.join(extensions)}"
             )
@@ -0,0 +1,413 @@
+import json
+import logging
+import os
+
+from datadict import datadict_entry, datadict_helpers, datadict_scanner
+
+INDEX_VERSION = 3
+YAML_EXTENSIONS = (".yml", ".yaml")
+
+
+def _layer_paths(dictionary_path) -> list:
+    if isinstance(dictionary_path, str):
+        return [dictionary_path]
+    return list(dictionary_path)
+
+
+def empty_index(dictionary_path, directory) -> dict:
+    """
+    Create an empty index for the given dictionary and directory.
+
+    Parameters:
+        dictionary_path (str or list): The path to the dictionary file, or the paths of the dictionary layers, from
+            the lowest to the highest precedence.
+        directory (str): The directory containing the model YAML files.
+
+    Returns:
+        dict: An index with no dictionary entries and no files.
+    """
+    layer_paths = _layer_paths(dictionary_path)
+    return {
+        "version": INDEX_VERSION,
+        "dictionary_paths": layer_paths,
+        "directory": directory,
+        "dictionary": [
+            {"stat": None, "normalize": None, "entries": []} for _ in layer_paths
+        ],
+        "files": {},
+    }
+
+
+def load_index(index_path, dictionary_path, directory) -> dict:
+    """
+    Load a persisted index, or create an empty one if it doesn't exist or was built for another project.
+
+    Parameters:
+        index_path (str): The path to the persisted index.
+        dictionary_path (str or list): The path to the dictionary file, or the paths of the dictionary layers.
+        directory (str): The directory containing the model YAML files.
+
+    Returns:
+        dict: The loaded index.
+    """
+    try:
+        with open(index_path, "r") as file:
+            index = json.load(file)
+        if (
+            index.get("version") == INDEX_VERSION
+            and index.get("dictionary_paths") == _layer_paths(dictionary_path)
+            and index.get("directory") == directory
+        ):
+            return index
+        logging.info(f"Index '{index_path}' is out of date and will be rebuilt")
+    except FileNotFoundError:
+        logging.info(f"Index '{index_path}' not found and will be built")
+    except ValueError:
+        logging.warning(f"Index '{index_path}' is corrupt and will be rebuilt")
+    return empty_index(dictionary_path, directory)
+
+
+def save_index(index, index_path) -> None:
+    """
+    Persist an index as JSON, creating its directory if needed.
+
+    Parameters:
+        index (dict): The index to persist.
+        index_path (str): The path to write the index to.
+
+    Returns:
+        None
+    """
+    index_directory = os.path.dirname(index_path)
+    if index_directory:
+        os.makedirs(index_directory, exist_ok=True)
+    temporary_path = f"{index_path}.tmp"
+    with open(temporary_path, "w") as file:
+        json.dump(index, file)
+    os.replace(temporary_path, index_path)
+
+
+def collect_file_fields(model_yaml) -> list:
+    """
+    Collect the columns of every model in a model YAML.
+
+    Parameters:
+        model_yaml (dict): The loaded model YAML data.
+
+    Returns:
+        list: A list of dictionaries with the 'name', 'model' and, if present, 'description' of each column.
+    """
+    fields = []
+    for model in model_yaml["models"] or []:
+        for column in model.get("columns") or []:
+            field = {"name": column["name"], "model": model["name"]}
+            if "description" in column:
+                field["description"] = column["description"]
+            fields.append(field)
+    return fields
+
+
+def update_index(index, yaml_obj=None) -> dict:
+    """
+    Bring an index up to date with the dictionary and model files on disk.
+
+    The modification time and size of each dictionary layer and every YAML file in the directory are compared
+    with those recorded in the index, and only new or changed files are parsed. Files that no longer exist are
+    removed from the index.
+
+    Parameters:
+        index (dict): The index to update in place.
+        yaml_obj (ruamel.yaml.YAML, optional): The YAML object to parse the dictionary with. Model files are
+            streamed with 'datadict_scanner'.
+
+    Returns:
+        dict: A dictionary with the number of 'parsed_files' and 'removed_files', and whether any dictionary
+            layer was reloaded ('dictionary_reloaded').
+    """
+    if yaml_obj is None:
+        import ruamel.yaml
+
+        yaml_obj = ruamel.yaml.YAML(typ="safe")
+    result = {"parsed_files": 0, "removed_files": 0, "dictionary_reloaded": False}
+
+    for position, dictionary_path in enumerate(index["dictionary_paths"]):
+        dictionary_stat = datadict_helpers.file_stat(dictionary_path)
+        if dictionary_stat != index["dictionary"][position]["stat"]:
+            index["dictionary"][position] = {
+                "stat": dictionary_stat,
+                **load_dictionary(yaml_obj, dictionary_path),
+            }
+            result["dictionary_reloaded"] = True
+
+    seen = set()
+    if os.path.isdir(index["directory"]):
+        for root, dirs, files in os.walk(index["directory"]):
+            for file in files:
+                if not file.endswith(YAML_EXTENSIONS):
+                    continue
+                file_path = os.path.normpath(os.path.join(root, file))
+                seen.add(file_path)
+                stat = datadict_helpers.file_stat(file_path)
+                indexed = index["files"].get(file_path)
+                if indexed is not None and indexed["stat"] == stat:
+                    continue
+                index["files"][file_path] = {
+                    "stat": stat,
+                    "fields": load_file_fields(file_path),
+                }
+                result["parsed_files"] += 1
+    else:
+        logging.error(f"Directory '{index['directory']}' doesn't exist.")
+
+    for file_path in set(index["files"]) - seen:
+        del index["files"][file_path]
+        result["removed_files"] += 1
+    return result
+
+
+def _index_dictionary(dictionary_yml) -> dict:
+    return {
+        "normalize": dictionary_yml.get("normalize"),
+        "entries": [
+            {
+                "name": entry["name"],
+                "description": entry.get("description") or "",
+                "aliases": list(entry.get("aliases") or []),
+            }
+            for entry in dictionary_yml.get("dictionary") or []
+        ],
+    }
+
+
+def load_dictionary(yaml_obj, dictionary_path) -> dict:
+    """
+    Load the name normalizations and the names, descriptions and aliases of every entry in a dictionary file.
+
+    Parameters:
+        yaml_obj (ruamel.yaml.YAML): The YAML object to parse the dictionary with.
+        dictionary_path (str): The path to the dictionary file.
+
+    Returns:
+        dict: The 'normalize' list of the dictionary, or None, and the 'entries', a list of dictionaries with the
+            'name', 'description' and 'aliases' of each entry.
+    """
+    try:
+        with open(dictionary_path, "r") as file:
+            dictionary_yml = yaml_obj.load(file) or {}
+    except FileNotFoundError:
+        logging.warning(f"Dictionary '{dictionary_path}' not found")
+        dictionary_yml = {}
+    return _index_dictionary(dictionary_yml)
+
+
+def load_file_fields(file_path) -> list:
+    """
+    Load the fields of a model YAML file, ignoring files that don't contain models.
+
+    The file is streamed with 'datadict_scanner.read_file_fields', as the index only needs the names and
+    descriptions of the columns.
+
+    Parameters:
+        file_path (str): The path to the YAML file.
+
+    Returns:
+        list: The fields in the format of 'collect_file_fields', or an empty list for other YAML files.
+    """
+    try:
+        return datadict_scanner.read_file_fields(file_path) or []
+    except Exception as error:
+        logging.error(f"There was an issue indexing file '{file_path}'. {error}")
+    return []
+
+
+def get_index(dictionary_path, directory, index_path) -> dict:
+    """
+    Load the persisted index, update it if the dictionary or model files have changed, and persist any changes.
+
+    Parameters:
+        dictionary_path (str or list): The path to the dictionary file, or the paths of the dictionary layers, from
+            the lowest to the highest precedence.
+        directory (str): The directory containing the model YAML files.
+        index_path (str): The path to the persisted index.
+
+    Returns:
+        dict: The up to date index.
+    """
+    index = load_index(index_path, dictionary_path, directory)
+    result = update_index(index)
+    if (
+        result["parsed_files"]
+        or result["removed_files"]
+        or result["dictionary_reloaded"]
+    ):
+        logging.info(
+            f"Index updated: {result['parsed_files']} files parsed, {result['removed_files']} files removed"
+        )
+        save_index(index, index_path)
+    return index
+
+
+def record_fields(index, file_paths, fields, replace=False) -> None:
+    """
+    Record the fields contributed by a set of files in the index, which acts as a ledger of contributions.
+
+    The recorded fields of each file replace any fields previously recorded for it, so that a file that has
+    changed or been removed retracts its old contributions. Files that no longer exist are removed.
+
+    Parameters:
+        index (dict): The index to update in place.
+        file_paths (list): The paths of the files that were processed.
+        fields (list): The fields collected from the files, each with a 'name', 'model', 'file' and,
+            optionally, 'description'.
+        replace (bool, optional): Replace every recorded file, e.g. after the whole directory has been
+            processed. Defaults to False.
+
+    Returns:
+        None
+    """
+    fields_by_file = {}
+    for field in fields:
+        recorded = {key: value for key, value in field.items() if key != "file"}
+        fields_by_file.setdefault(os.path.normpath(field["file"]), []).append(recorded)
+    if replace:
+        index["files"] = {}
+    for file_path in file_paths:
+        file_path = os.path.normpath(file_path)
+        stat = datadict_helpers.file_stat(file_path)
+        if stat is None:
+            index["files"].pop(file_path, None)
+        else:
+            index["files"][file_path] = {
+                "stat": stat,
+                "fields": fields_by_file.get(file_path, []),
+            }
+
+
+def ledger_fields(index) -> list:
+    """
+    List the fields contributed by every file recorded in the index.
+
+    Parameters:
+        index (dict): The index to read.
+
+    Returns:
+        list: The fields in the format of 'datadict.existing_fields', ready to be collated.
+    """
+    return [
+        {**field, "file": file_path}
+        for file_path, indexed in sorted(index["files"].items())
+        for field in indexed["fields"]
+    ]
+
+
+def record_dictionary(index, dictionary_yml, dictionary_path=None) -> None:
+    """
+    Record the dictionary in the index after it has been written, so that it isn't re-parsed on the next query.
+
+    Parameters:
+        index (dict): The index to update in place.
+        dictionary_yml (dict): The dictionary YAML data that was written to the dictionary file.
+        dictionary_path (str, optional): The dictionary layer that was written. Defaults to the last layer.
+
+    Returns:
+        None
+    """
+    layer_paths = index["dictionary_paths"]
+    position = (
+        len(layer_paths) - 1
+        if dictionary_path is None
+        else layer_paths.index(dictionary_path)
+    )
+    index["dictionary"][position] = {
+        "stat": datadict_helpers.file_stat(layer_paths[position]),
+        **_index_dictionary(dictionary_yml),
+    }
+
+
+def _matcher(index) -> tuple:
+    """
+    Compile the matcher of the indexed dictionary layers, as 'check' and 'apply' match columns.
+
+    Column names are normalized as set by the last layer with a 'normalize' key.
+
+    Parameters:
+        index (dict): The index.
+
+    Returns:
+        tuple: The 'datadict_entry.AliasMatcher' of the entries, and a dictionary mapping the id of each entry to
+            its indexed dictionary.
+    """
+    layers = []
+    items = {}
+    normalizations = None
+    for layer in index["dictionary"]:
+        entries = datadict_entry.load_entries(layer["entries"])
+        layers.append(entries)
+        items.update(
+            (id(entry), item) for entry, item in zip(entries, layer["entries"])
+        )
+        if layer.get("normalize") is not None:
+            normalizations = layer["normalize"]
+    normalize = datadict_entry.build_normalizer(normalizations or ())
+    return datadict_entry.compile_matcher(layers, normalize), items
+
+
+def lookup_column(index, name) -> dict:
+    """
+    Resolve a column name to its dictionary entry, matching it against the names, aliases and pattern aliases of the
+    entries of every layer, once normalized as set by the dictionary's 'normalize' key.
+
+    Parameters:
+        index (dict): The index to search.
+        name (str): The column name to look up.
+
+    Returns:
+        dict: The 'name', 'description' and 'aliases' of the first matching dictionary entry, or None.
+    """
+    matcher, items = _matcher(index)
+    matched = matcher.match(name)
+    return items[id(matched[0])] if matched else None
+
+
+def column_usage(index, name) -> dict:
+    """
+    List the models that use a column, including the models whose columns match the same dictionary entry, through
+    one of its aliases or pattern aliases or once normalized.
+
+    Parameters:
+        index (dict): The index to search.
+        name (str): The column name to look up.
+
+    Returns:
+        dict: The 'name' of the column and a sorted list of the 'models' using it, each with the 'model', the
+            'column' name it is used under, its 'description' and the 'file' it is defined in.
+    """
+    matcher, _ = _matcher(index)
+    matched = matcher.match(name)
+    if matched:
+        entry = matched[0]
+
+        def uses(column_name):
+            return entry in matcher.match(column_name)
+
+    else:
+
+        def uses(column_name):
+            return column_name == name
+
+    usages = []
+    for file_path, indexed in index["files"].items():
+        for field in indexed["fields"]:
+            if uses(field["name"]):
+                usages.append(
+                    {
+                        "model": field["model"],
+                        "column": field["name"],
+                        "description": field.get("description", ""),
+                        "file": file_path,
+                    }
+                )
+    return {
+        "name": name,
+        "models": sorted(usages, key=lambda usage: (usage["model"], usage["column"])),
+    }
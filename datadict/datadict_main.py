@@ -1,6 +1,18 @@
+import json
+import sys
+
 import click
 
 import datadict
+from datadict import (
+    datadict_api,
+    datadict_check,
+    datadict_index,
+    datadict_manifest,
+    datadict_profile,
+    datadict_progress,
+    datadict_report,
+)
 
 
 @click.group()
@@ -8,13 +20,30 @@ def cli():
     pass
 
 
+def verbosity(quiet, verbose) -> int:
+    if quiet and verbose:
+        raise click.UsageError("--quiet and --verbose can't be used together")
+    if quiet:
+        return datadict_report.QUIET
+    return datadict_report.VERBOSE if verbose else datadict_report.NORMAL
+
+
 @cli.command()
+@click.argument("files", nargs=-1, type=str)
 @click.option(
     "-d",
     "--dictionary",
     type=str,
-    help="Location of the dictionary file",
-    default="datadictionary.yml",
+    multiple=True,
+    help="Location of the dictionary file. Give it more than once to layer dictionaries, each overriding the ones before it",
+    default=["datadictionary.yml"],
+)
+@click.option(
+    "--output-layer",
+    "output_layer",
+    type=str,
+    help="Location of the dictionary layer to collate the columns into (defaults to the last --dictionary)",
+    default=None,
 )
 @click.option(
     "-D",
@@ -23,15 +52,205 @@ def cli():
     help="Directory to apply dictionary",
     default="models/",
 )
-def apply(dictionary, directory):
+@click.option(
+    "--index",
+    type=str,
+    help="Location of the persisted column index, used as the ledger of each file's columns",
+    default=".datadict/index.json",
+)
+@click.option(
+    "-s",
+    "--select",
+    type=str,
+    multiple=True,
+    help="Only include the models matching these dbt-style selectors, e.g. 'tag:finance' or '+path:models/marts'",
+)
+@click.option(
+    "--exclude",
+    type=str,
+    multiple=True,
+    help="Leave out the models matching these dbt-style selectors",
+)
+@click.option(
+    "--manifest",
+    type=str,
+    help="Location of the dbt manifest used to resolve --select and --exclude",
+    default="target/manifest.json",
+)
+@click.option(
+    "--state",
+    type=str,
+    help="Location of a baseline manifest, used by the 'state:' selector method",
+    default=None,
+)
+@click.option(
+    "-q",
+    "--quiet",
+    is_flag=True,
+    help="Only log warnings and errors",
+    default=False,
+)
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Log every column and model checked, as well as the end of run summary",
+    default=False,
+)
+@click.option(
+    "--progress/--no-progress",
+    help="Show progress with throughput and ETA: a bar on a terminal, or a periodic log line otherwise. On unless --quiet is given",
+    default=None,
+)
+@click.option(
+    "--events",
+    type=str,
+    help="Location to write a JSON-lines stream of every event to, or '-' for stdout",
+    default=None,
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Record wall time, CPU time and peak memory for each phase of the run",
+    default=False,
+)
+@click.option(
+    "--profile-output",
+    "profile_output",
+    type=str,
+    help="Location to write the JSON profile report to",
+    default="datadict_profile.json",
+)
+@click.option(
+    "--profile-top",
+    "profile_top",
+    type=int,
+    help="Number of slowest files to include in the profile report",
+    default=10,
+)
+@click.option(
+    "--stdin",
+    is_flag=True,
+    help="Read a model YAML document from stdin and write it to stdout with the dictionary applied, without writing any file",
+    default=False,
+)
+@click.option(
+    "--stdin-path",
+    "stdin_path",
+    type=str,
+    help="Path of the document read with --stdin, used in log messages and events",
+    default="<stdin>",
+)
+def apply(
+    files,
+    dictionary,
+    output_layer,
+    directory,
+    index,
+    select,
+    exclude,
+    manifest,
+    state,
+    quiet,
+    verbose,
+    progress,
+    events,
+    profile,
+    profile_output,
+    profile_top,
+    stdin,
+    stdin_path,
+):
     """
     This command reviews all existing model files in the given directory for existing columns and collates them into a
     dictionary file. Additionally, this command will review the dictionary file and apply updates back to the columns in
     the model files where possible.
+
+    When FILES are given, e.g. by a pre-commit hook, the dictionary is only applied to those files. The columns of every
+    other file are taken from the index recorded by the previous run, so the dictionary is still collated for the whole
+    project without parsing it.
+
+    With --select or --exclude, the dictionary is only applied to the YAML files documenting the selected models, as
+    recorded in the dbt manifest, which should be up to date (e.g. after 'dbt parse').
+
+    When --dictionary is given more than once, the dictionaries are layered: an entry in a later dictionary overrides
+    the entry with the same name in the ones before it. Only the output layer is collated and written to.
+
+    With --stdin, the command works as a filter: a single model YAML document is read from stdin, and written to stdout
+    with the dictionary applied. No directory is scanned, and neither the model files nor the dictionary are written.
     """
-    dictionary = datadict.datadict(dictionary, detailed_logs=True)
-    dictionary.apply_data_dictionary_to_path(directory)
-    dictionary.collate_output_dictionary()
+    if stdin:
+        if files or select or exclude:
+            raise click.UsageError(
+                "--stdin can't be used with FILES, --select or --exclude"
+            )
+        if events == "-":
+            raise click.UsageError("--events can't be written to stdout with --stdin")
+        if output_layer is not None and output_layer not in dictionary:
+            raise click.UsageError("--output-layer must be one of the --dictionary files")
+        apply_stream(dictionary, output_layer, verbose, events, stdin_path)
+        return
+    datadict_report.start_reporting("apply", verbosity(quiet, verbose), events)
+    if progress or (progress is None and not quiet):
+        datadict_progress.start_progress("apply")
+    if profile:
+        datadict_profile.start_profiling("apply")
+    try:
+        if select or exclude:
+            selected_models = datadict_manifest.select_models(
+                manifest, select, exclude, state
+            )
+            if selected_models is None:
+                return
+            files = list(files) + datadict_manifest.model_yaml_files(
+                manifest, selected_models
+            )
+        if output_layer is not None and output_layer not in dictionary:
+            raise click.UsageError("--output-layer must be one of the --dictionary files")
+        dictionary = datadict.datadict(
+            list(dictionary),
+            detailed_logs=True,
+            output_layer=output_layer,
+            docs_directory=directory,
+        )
+        datadict_api.run_apply(
+            dictionary,
+            directory,
+            list(files) if files or select or exclude else None,
+            index,
+        )
+    finally:
+        if profile:
+            datadict_profile.stop_profiling(profile_output, profile_top)
+        datadict_progress.stop_progress()
+        datadict_report.stop_reporting()
+
+
+def apply_stream(dictionary, output_layer, verbose, events, stdin_path):
+    # Filter mode only logs warnings and errors, on stderr, unless --verbose is given
+    datadict_report.start_reporting(
+        "apply",
+        datadict_report.VERBOSE if verbose else datadict_report.QUIET,
+        events,
+    )
+    try:
+        dictionary = datadict.datadict(
+            list(dictionary),
+            detailed_logs=verbose,
+            output_layer=output_layer,
+            read_only=True,
+        )
+        dictionary.apply_data_dictionary_to_stream(sys.stdin, sys.stdout, stdin_path)
+    except Exception as error:
+        datadict_report.event(
+            "file_error",
+            "Error processing file '{file}'. Error: {error}",
+            file=stdin_path,
+            error=error,
+        )
+        sys.exit(1)
+    finally:
+        datadict_report.stop_reporting()
 
 
 @cli.command()
@@ -60,11 +279,507 @@ def apply(dictionary, directory):
     help="Triggers the generated YAML files to be sorted alphabetically",
     default=True,
 )
-
-def generate(directory, file, unique_model_yaml, sort):
+@click.option(
+    "--state",
+    type=str,
+    help="Only generate models that are new or modified compared with the manifest at this path, and their dependents",
+    default=None,
+)
+@click.option(
+    "--changed-since",
+    "changed_since",
+    type=str,
+    help="Only generate models changed since this git reference, and their dependents",
+    default=None,
+)
+@click.option(
+    "-s",
+    "--select",
+    type=str,
+    multiple=True,
+    help="Only include the models matching these dbt-style selectors, e.g. 'tag:finance' or '+path:models/marts'",
+)
+@click.option(
+    "--exclude",
+    type=str,
+    multiple=True,
+    help="Leave out the models matching these dbt-style selectors",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    help="Number of codegen runs in flight at once (defaults to the number of CPUs)",
+    default=None,
+)
+@click.option(
+    "--chunk-size",
+    "chunk_size",
+    type=int,
+    help="Number of models in each codegen run",
+    default=None,
+)
+@click.option(
+    "--columns-from",
+    "columns_from",
+    type=click.Choice(["codegen", "information_schema"]),
+    help="Get the columns from codegen, or from batched information_schema queries",
+    default="codegen",
+)
+@click.option(
+    "--fast-yaml",
+    "fast_yaml",
+    is_flag=True,
+    help="Load the codegen output with the fast, non round-trip YAML loader",
+    default=False,
+)
+@click.option(
+    "-q",
+    "--quiet",
+    is_flag=True,
+    help="Only log warnings and errors",
+    default=False,
+)
+@click.option(
+    "-v",
+    "--verbose",
+    is_flag=True,
+    help="Log every column and model checked, as well as the end of run summary",
+    default=False,
+)
+@click.option(
+    "--progress/--no-progress",
+    help="Show progress with throughput and ETA: a bar on a terminal, or a periodic log line otherwise. On unless --quiet is given",
+    default=None,
+)
+@click.option(
+    "--events",
+    type=str,
+    help="Location to write a JSON-lines stream of every event to, or '-' for stdout",
+    default=None,
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Record wall time, CPU time and peak memory for each phase of the run",
+    default=False,
+)
+@click.option(
+    "--profile-output",
+    "profile_output",
+    type=str,
+    help="Location to write the JSON profile report to",
+    default="datadict_profile.json",
+)
+@click.option(
+    "--profile-top",
+    "profile_top",
+    type=int,
+    help="Number of slowest files to include in the profile report",
+    default=10,
+)
+def generate(
+    directory,
+    file,
+    unique_model_yaml,
+    sort,
+    state,
+    changed_since,
+    select,
+    exclude,
+    jobs,
+    chunk_size,
+    columns_from,
+    fast_yaml,
+    quiet,
+    verbose,
+    progress,
+    events,
+    profile,
+    profile_output,
+    profile_top,
+):
     """
     This command generates model YAML files in a specified directory. Existing model YAML files are evaluated,
     and the model metadata is combined and written back to the existing files. For models missing from existing files,
     a new file is created in the directory with the given name and the metadata for the missing models is written to it.
+
+    With --select or --exclude, only the selected models are generated. When --state is also given, it is used as the
+    baseline for the 'state:' selector method rather than selecting the modified models on its own.
+    """
+    datadict_report.start_reporting("generate", verbosity(quiet, verbose), events)
+    if progress or (progress is None and not quiet):
+        datadict_progress.start_progress("generate")
+    if profile:
+        datadict_profile.start_profiling("generate")
+    try:
+        datadict.generate_model_yamls(
+            directory,
+            file,
+            unique_model_yaml,
+            sort,
+            state,
+            changed_since,
+            select,
+            exclude,
+            jobs,
+            chunk_size,
+            fast_yaml,
+            columns_from,
+        )
+    finally:
+        if profile:
+            datadict_profile.stop_profiling(profile_output, profile_top)
+        datadict_progress.stop_progress()
+        datadict_report.stop_reporting()
+
+@cli.command()
+@click.option(
+    "-d",
+    "--dictionary",
+    type=str,
+    multiple=True,
+    help="Location of the dictionary file. Give it more than once to layer dictionaries, each overriding the ones before it",
+    default=["datadictionary.yml"],
+)
+@click.option(
+    "-D",
+    "--directory",
+    type=str,
+    help="Directory to apply dictionary",
+    default="models/",
+)
+@click.option(
+    "--polling",
+    is_flag=True,
+    help="Poll for changes instead of using inotify",
+    default=False,
+)
+@click.option(
+    "--interval",
+    type=float,
+    help="Number of seconds between polls for changes",
+    default=1.0,
+)
+def watch(dictionary, directory, polling, interval):
+    """
+    This command runs `apply` once and then keeps the dictionary and model files in memory, watching them for changes.
+    When a model file changes, the dictionary is re-applied to that file only. When the dictionary file changes, its
+    descriptions are re-applied to all model files. The dictionary file is re-collated after every change.
+
+    When --dictionary is given more than once, the dictionaries are layered as in `apply`, and a change to any layer
+    re-applies them all.
+    """
+    from datadict import datadict_watch
+
+    watcher = datadict_watch.watcher(list(dictionary), directory, polling, interval)
+    watcher.run()
+
+
+@cli.command()
+@click.option(
+    "-d",
+    "--dictionary",
+    type=str,
+    multiple=True,
+    help="Location of the dictionary file. Give it more than once to layer dictionaries, each overriding the ones before it",
+    default=["datadictionary.yml"],
+)
+@click.option(
+    "-D",
+    "--directory",
+    type=str,
+    help="Directory containing the model files",
+    default="models/",
+)
+@click.option(
+    "--lsp",
+    is_flag=True,
+    help="Serve the Language Server Protocol over stdio instead of JSON-RPC over a socket",
+    default=False,
+)
+@click.option(
+    "--host",
+    type=str,
+    help="Host to serve JSON-RPC requests on",
+    default="127.0.0.1",
+)
+@click.option(
+    "--port",
+    type=int,
+    help="Port to serve JSON-RPC requests on",
+    default=7650,
+)
+@click.option(
+    "--polling",
+    is_flag=True,
+    help="Poll for changes instead of using inotify",
+    default=False,
+)
+@click.option(
+    "--interval",
+    type=float,
+    help="Number of seconds between polls for changes",
+    default=1.0,
+)
+def serve(dictionary, directory, lsp, host, port, polling, interval):
+    """
+    This command starts a local server that keeps the dictionary and model columns in memory and answers lookup,
+    completion and usage queries. The server never writes to the dictionary or model files, and reloads them as they
+    change. Use `--lsp` to serve editors over stdio, otherwise newline-delimited JSON-RPC is served over a socket.
+    """
+    from datadict import datadict_server
+
+    server = datadict_server.server(list(dictionary), directory, polling, interval)
+    server.load()
+    server.watch()
+    if lsp:
+        server.serve_lsp()
+    else:
+        server.serve_socket(host, port)
+
+
+@cli.command()
+@click.argument("name")
+@click.option(
+    "-d",
+    "--dictionary",
+    type=str,
+    multiple=True,
+    help="Location of the dictionary file. Give it more than once to layer dictionaries, each overriding the ones before it",
+    default=["datadictionary.yml"],
+)
+@click.option(
+    "-D",
+    "--directory",
+    type=str,
+    help="Directory containing the model files",
+    default="models/",
+)
+@click.option(
+    "--index",
+    type=str,
+    help="Location of the persisted column index",
+    default=".datadict/index.json",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    help="Output the result as JSON",
+    default=False,
+)
+def lookup(name, dictionary, directory, index, as_json):
+    """
+    This command shows the dictionary entry a column name resolves to, directly or through an alias. It is answered from
+    a persisted index, which is only rebuilt for the files that have changed since it was last used.
+
+    When --dictionary is given more than once, the column is matched across the layered dictionaries as in `apply`.
+    """
+    column_index = datadict_index.get_index(list(dictionary), directory, index)
+    entry = datadict_index.lookup_column(column_index, name)
+    if as_json:
+        click.echo(json.dumps(entry))
+    elif entry is None:
+        click.echo(f"Column '{name}' isn't in the dictionary")
+    else:
+        click.echo(f"{entry['name']}: {entry['description']}")
+        if entry["aliases"]:
+            click.echo(f"Aliases: {', '.join(entry['aliases'])}")
+    if entry is None:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.argument("name")
+@click.option(
+    "-d",
+    "--dictionary",
+    type=str,
+    multiple=True,
+    help="Location of the dictionary file. Give it more than once to layer dictionaries, each overriding the ones before it",
+    default=["datadictionary.yml"],
+)
+@click.option(
+    "-D",
+    "--directory",
+    type=str,
+    help="Directory containing the model files",
+    default="models/",
+)
+@click.option(
+    "--index",
+    type=str,
+    help="Location of the persisted column index",
+    default=".datadict/index.json",
+)
+@click.option(
+    "--json",
+    "as_json",
+    is_flag=True,
+    help="Output the result as JSON",
+    default=False,
+)
+def usage(name, dictionary, directory, index, as_json):
+    """
+    This command lists the models that use a column, including the models that use any of its aliases. It is answered
+    from a persisted index, which is only rebuilt for the files that have changed since it was last used.
+
+    When --dictionary is given more than once, columns are matched across the layered dictionaries as in `apply`.
     """
-    datadict.generate_model_yamls(directory, file, unique_model_yaml, sort)
\ No newline at end of file
+    column_index = datadict_index.get_index(list(dictionary), directory, index)
+    result = datadict_index.column_usage(column_index, name)
+    if as_json:
+        click.echo(json.dumps(result))
+    else:
+        for usage in result["models"]:
+            click.echo(f"{usage['model']}.{usage['column']}\t{usage['file']}")
+    if not result["models"]:
+        raise SystemExit(1)
+
+
+@cli.command()
+@click.option(
+    "-d",
+    "--dictionary",
+    type=str,
+    multiple=True,
+    help="Location of the dictionary file. Give it more than once to layer dictionaries, each overriding the ones before it",
+    default=["datadictionary.yml"],
+)
+@click.option(
+    "-D",
+    "--directory",
+    type=str,
+    help="Directory containing the model files",
+    default="models/",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    help="Number of processes to use. Defaults to the number of CPUs",
+    default=None,
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "text"]),
+    help="Format of the report",
+    default="json",
+)
+def check(dictionary, directory, jobs, output_format):
+    """
+    This command compares the model files in the given directory with the dictionary without writing to any file. It
+    exits with status 1 if `apply` would change any description, if any column is missing from the dictionary, or if
+    the dictionary would gain new description versions or model lists, and with status 2 if any file can't be read.
+
+    When --dictionary is given more than once, the dictionaries are layered as in `apply`, and only the last is
+    checked for the columns collated into it.
+    """
+    report = datadict_check.run_check(list(dictionary), directory, jobs)
+    if output_format == "json":
+        click.echo(json.dumps(report, separators=(",", ":")))
+    else:
+        for drift in report["drifted_descriptions"]:
+            click.echo(
+                f"drifted: {drift['file']}: {drift['model']}.{drift['column']}"
+            )
+        for missing in report["missing_from_dictionary"]:
+            click.echo(f"missing: {missing['name']} ({', '.join(missing['models'])})")
+        for conflict in report["description_conflicts"]:
+            click.echo(
+                f"conflict: {conflict['name']} has {len(conflict['description_versions'])} descriptions"
+            )
+        for change in report["models_changed"]:
+            click.echo(
+                f"models: {change['name']} +{len(change['added'])} -{len(change['removed'])}"
+            )
+        for error in report["errors"]:
+            click.echo(f"error: {error['file']}: {error['error']}")
+        click.echo(
+            ", ".join(f"{key}: {value}" for key, value in report["summary"].items())
+        )
+    raise SystemExit(report["exit_code"])
+
+
+@cli.command()
+@click.option(
+    "-D",
+    "--directory",
+    type=str,
+    help="Directory containing the model files",
+    default="models/",
+)
+@click.option(
+    "--columns-from",
+    "columns_from",
+    type=click.Choice(["codegen", "information_schema", "catalog"]),
+    help="Get the actual columns from codegen, batched information_schema queries, or the dbt catalog",
+    default="codegen",
+)
+@click.option(
+    "--catalog",
+    type=str,
+    help="Location of the dbt catalog, used with '--columns-from catalog'",
+    default="target/catalog.json",
+)
+@click.option(
+    "-s",
+    "--select",
+    type=str,
+    multiple=True,
+    help="Only include the models matching these dbt-style selectors, e.g. 'tag:finance' or '+path:models/marts'",
+)
+@click.option(
+    "--exclude",
+    type=str,
+    multiple=True,
+    help="Leave out the models matching these dbt-style selectors",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=int,
+    help="Number of codegen runs in flight at once (defaults to the number of CPUs)",
+    default=None,
+)
+@click.option(
+    "--chunk-size",
+    "chunk_size",
+    type=int,
+    help="Number of models in each codegen run",
+    default=None,
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["json", "table"]),
+    help="Format of the report",
+    default="json",
+)
+def drift(
+    directory, columns_from, catalog, select, exclude, jobs, chunk_size, output_format
+):
+    """
+    This command compares the columns each model actually has, from codegen, the information_schema or the dbt
+    catalog, with the columns defined in the model YAML files, without writing to any file. It reports the columns
+    added, removed and with a changed data type for each model, and exits with status 1 if any model has drifted,
+    isn't documented or its columns can't be fetched, and with status 2 if any file can't be read.
+    """
+    from datadict import datadict_drift
+
+    report = datadict_drift.run_drift(
+        directory,
+        columns_from=columns_from,
+        catalog_path=catalog,
+        select=select,
+        exclude=exclude,
+        jobs=jobs,
+        chunk_size=chunk_size,
+    )
+    if output_format == "json":
+        click.echo(json.dumps(report, separators=(",", ":")))
+    else:
+        click.echo(datadict_drift.format_table(report))
+    raise SystemExit(report["exit_code"])
@@ -0,0 +1,535 @@
+import fnmatch
+import json
+import logging
+import os
+import re
+
+from datadict.datadict_profile import phase
+
+DEFAULT_MANIFEST_PATH = os.path.join("target", "manifest.json")
+
+SELECTOR_PATTERN = re.compile(
+    r"^(?P<at>@)?(?:(?P<parents_depth>\d*)(?P<parents>\+))?(?P<body>.+?)"
+    r"(?:(?P<children>\+)(?P<children_depth>\d*))?$"
+)
+
+
+def load_manifest(path) -> dict:
+    """
+    Load a dbt manifest.
+
+    Parameters:
+        path (str): The path to 'manifest.json', or to a directory containing it (such as a dbt '--state' directory).
+
+    Returns:
+        dict: The loaded manifest, or None if it can't be found or read.
+    """
+    if os.path.isdir(path):
+        path = os.path.join(path, "manifest.json")
+    try:
+        with phase("parse", path), open(path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        logging.error(f"Manifest '{path}' not found")
+    except ValueError as error:
+        logging.error(f"Manifest '{path}' couldn't be read. Error: {error}")
+    return None
+
+
+def model_nodes(manifest) -> dict:
+    """
+    Get the model nodes of a manifest.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+
+    Returns:
+        dict: A dictionary mapping the unique ID of each model to its node.
+    """
+    return {
+        unique_id: node
+        for unique_id, node in manifest.get("nodes", {}).items()
+        if node.get("resource_type") == "model"
+    }
+
+
+def node_checksum(node) -> str:
+    """
+    Get the checksum of a node's SQL, which changes whenever the model's code changes.
+
+    Parameters:
+        node (dict): The manifest node.
+
+    Returns:
+        str: The checksum of the node, or None if the node has no checksum.
+    """
+    return (node.get("checksum") or {}).get("checksum")
+
+
+def modified_models(manifest, baseline_manifest) -> set:
+    """
+    Compare a manifest with a baseline manifest to find the new and modified models.
+
+    Parameters:
+        manifest (dict): The manifest of the current project.
+        baseline_manifest (dict): The manifest to compare against, e.g. from the last production run.
+
+    Returns:
+        set: The unique IDs of the models that are new, or whose checksum differs from the baseline.
+    """
+    baseline_nodes = model_nodes(baseline_manifest)
+    return {
+        unique_id
+        for unique_id, node in model_nodes(manifest).items()
+        if unique_id not in baseline_nodes
+        or node_checksum(node) != node_checksum(baseline_nodes[unique_id])
+    }
+
+
+def changed_files_since(ref) -> list:
+    """
+    List the files that have changed since a git reference, including uncommitted and untracked files.
+
+    Parameters:
+        ref (str): The git reference to compare against, e.g. 'origin/main'.
+
+    Returns:
+        list: The paths of the changed files relative to the root of the repository, or None if git failed.
+    """
+    import subprocess
+
+    try:
+        root = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"],
+            capture_output=True,
+            check=True,
+        ).stdout.decode("UTF-8")
+        changed = subprocess.run(
+            ["git", "diff", "--name-only", ref],
+            capture_output=True,
+            check=True,
+        ).stdout.decode("UTF-8")
+        untracked = subprocess.run(
+            ["git", "ls-files", "--others", "--exclude-standard", "--full-name"],
+            capture_output=True,
+            check=True,
+        ).stdout.decode("UTF-8")
+    except (OSError, subprocess.CalledProcessError) as error:
+        logging.error(f"Unable to list the files changed since '{ref}'. Error: {error}")
+        return None
+    root = root.strip()
+    return [
+        os.path.relpath(os.path.join(root, path))
+        for path in (changed + untracked).splitlines()
+        if path
+    ]
+
+
+def models_for_files(manifest, file_paths) -> set:
+    """
+    Find the models defined by a set of files.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        file_paths (list): The paths of the files, relative to the dbt project.
+
+    Returns:
+        set: The unique IDs of the models whose SQL file is one of the given files.
+    """
+    file_paths = {os.path.normpath(file_path) for file_path in file_paths}
+    return {
+        unique_id
+        for unique_id, node in model_nodes(manifest).items()
+        if os.path.normpath(node.get("original_file_path", "")) in file_paths
+    }
+
+
+def child_map(manifest) -> dict:
+    """
+    Get the children of every node in a manifest, building them from each node's dependencies if needed.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+
+    Returns:
+        dict: A dictionary mapping the unique ID of each node to the unique IDs of its children.
+    """
+    if manifest.get("child_map"):
+        return manifest["child_map"]
+    children = {}
+    for unique_id, node in manifest.get("nodes", {}).items():
+        for parent in node.get("depends_on", {}).get("nodes", []):
+            children.setdefault(parent, []).append(unique_id)
+    return children
+
+
+def parent_map(manifest) -> dict:
+    """
+    Get the parents of every node in a manifest, building them from each node's dependencies if needed.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+
+    Returns:
+        dict: A dictionary mapping the unique ID of each node to the unique IDs of its parents.
+    """
+    if manifest.get("parent_map"):
+        return manifest["parent_map"]
+    return {
+        unique_id: node.get("depends_on", {}).get("nodes", [])
+        for unique_id, node in manifest.get("nodes", {}).items()
+    }
+
+
+def traverse(edges, unique_ids, depth=None) -> set:
+    """
+    Find the nodes reachable from a set of nodes, following the given edges.
+
+    Parameters:
+        edges (dict): A dictionary mapping each unique ID to the unique IDs it leads to.
+        unique_ids (set): The unique IDs of the nodes to start from.
+        depth (int, optional): The maximum number of edges to follow. Defaults to no limit.
+
+    Returns:
+        set: The unique IDs of the reachable nodes, including the given nodes themselves.
+    """
+    found = set(unique_ids)
+    frontier = set(unique_ids)
+    steps = 0
+    while frontier and (depth is None or steps < depth):
+        frontier = {
+            reached
+            for unique_id in frontier
+            for reached in edges.get(unique_id, [])
+            if reached not in found
+        }
+        found |= frontier
+        steps += 1
+    return found
+
+
+def downstream_models(manifest, unique_ids) -> set:
+    """
+    Find the models that depend, directly or indirectly, on a set of nodes.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        unique_ids (set): The unique IDs of the nodes to start from.
+
+    Returns:
+        set: The unique IDs of the downstream models, including the given models themselves.
+    """
+    models = model_nodes(manifest)
+    found = traverse(child_map(manifest), unique_ids)
+    return {unique_id for unique_id in found if unique_id in models}
+
+
+def model_names(manifest, unique_ids) -> set:
+    """
+    Get the names of a set of models.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        unique_ids (set): The unique IDs of the models.
+
+    Returns:
+        set: The names of the models.
+    """
+    nodes = model_nodes(manifest)
+    return {nodes[unique_id]["name"] for unique_id in unique_ids if unique_id in nodes}
+
+
+def select_changed_models(
+    manifest_path=DEFAULT_MANIFEST_PATH, state=None, changed_since=None
+) -> set:
+    """
+    Select the models that are new or modified, and the models downstream of them.
+
+    Models can be compared with the manifest of a baseline ('state'), or selected from the SQL files changed
+    since a git reference ('changed_since'). When both are given, the models selected by either are returned.
+
+    Parameters:
+        manifest_path (str, optional): The path to the manifest of the current project. Defaults to
+            'target/manifest.json'.
+        state (str, optional): The path to the baseline manifest, or a directory containing it.
+        changed_since (str, optional): The git reference to compare against.
+
+    Returns:
+        set: The names of the selected models, or None if the selection couldn't be made.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        return None
+
+    changed = set()
+    if state is not None:
+        baseline_manifest = load_manifest(state)
+        if baseline_manifest is None:
+            return None
+        changed |= modified_models(manifest, baseline_manifest)
+    if changed_since is not None:
+        changed_files = changed_files_since(changed_since)
+        if changed_files is None:
+            return None
+        changed |= models_for_files(manifest, changed_files)
+
+    selected = downstream_models(manifest, changed)
+    logging.info(
+        f"{len(changed)} models have changed, {len(selected)} models selected including downstream models"
+    )
+    return model_names(manifest, selected)
+
+
+def match_selector_method(manifest, method, value, state_manifest=None) -> set:
+    """
+    Find the models matching a single selector method, such as 'tag:finance' or 'path:models/staging'.
+
+    The supported methods are 'path', 'tag', 'fqn', 'package' and 'state' ('state:new' or 'state:modified',
+    which need a baseline manifest). A selector without a method matches models by name or fully qualified
+    name, or by path if it looks like a path. Names, paths and fully qualified names may contain wildcards.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        method (str): The selector method, or None for a selector without a method.
+        value (str): The value to match.
+        state_manifest (dict, optional): The baseline manifest for the 'state' method.
+
+    Returns:
+        set: The unique IDs of the matching models.
+
+    Raises:
+        ValueError: If the method isn't supported, or 'state' is used without a baseline manifest.
+    """
+    models = model_nodes(manifest)
+    if method is None:
+        if "/" in value or value.endswith(".sql"):
+            method = "path"
+        else:
+            method = "fqn"
+
+    if method == "path":
+        pattern = os.path.normpath(value)
+        return {
+            unique_id
+            for unique_id, node in models.items()
+            if fnmatch.fnmatch(
+                os.path.normpath(node.get("original_file_path", "")), pattern
+            )
+            or os.path.normpath(node.get("original_file_path", "")).startswith(
+                pattern.rstrip(os.sep) + os.sep
+            )
+        }
+    elif method == "tag":
+        return {
+            unique_id
+            for unique_id, node in models.items()
+            if any(
+                fnmatch.fnmatch(tag, value)
+                for tag in set(node.get("tags") or [])
+                | set((node.get("config") or {}).get("tags") or [])
+            )
+        }
+    elif method == "fqn":
+        parts = value.split(".")
+        matched = set()
+        for unique_id, node in models.items():
+            fqn = node.get("fqn") or [node["name"]]
+            if fnmatch.fnmatch(node["name"], value) or any(
+                len(fqn) - start >= len(parts)
+                and all(
+                    fnmatch.fnmatch(fqn[start + number], part)
+                    for number, part in enumerate(parts)
+                )
+                for start in (0, 1)
+            ):
+                matched.add(unique_id)
+        return matched
+    elif method == "package":
+        return {
+            unique_id
+            for unique_id, node in models.items()
+            if fnmatch.fnmatch(node.get("package_name") or "", value)
+        }
+    elif method == "state":
+        if state_manifest is None:
+            raise ValueError("The 'state' selector method requires --state")
+        if value == "new":
+            baseline_nodes = model_nodes(state_manifest)
+            return {
+                unique_id for unique_id in models if unique_id not in baseline_nodes
+            }
+        elif value == "modified":
+            return modified_models(manifest, state_manifest)
+        raise ValueError(f"Unsupported state selector 'state:{value}'")
+    raise ValueError(f"Unsupported selector method '{method}'")
+
+
+def match_selector(manifest, selector, state_manifest=None) -> set:
+    """
+    Find the models matching a single selector, including its graph operators.
+
+    Graph operators follow dbt: '+model' adds the ancestors of the matched models, 'model+' adds their
+    descendants, and either can be limited to a number of generations ('2+model', 'model+1'). '@model' adds
+    the descendants and all of the ancestors of those descendants.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        selector (str): The selector, e.g. '+tag:finance' or 'path:models/staging+'.
+        state_manifest (dict, optional): The baseline manifest for the 'state' method.
+
+    Returns:
+        set: The unique IDs of the matching models.
+
+    Raises:
+        ValueError: If the selector is invalid.
+    """
+    match = SELECTOR_PATTERN.match(selector)
+    if match is None:
+        raise ValueError(f"Invalid selector '{selector}'")
+    body = match.group("body")
+    method, value = None, body
+    if ":" in body:
+        method, value = body.split(":", 1)
+    matched = match_selector_method(manifest, method, value, state_manifest)
+
+    selected = set(matched)
+    if match.group("at"):
+        descendants = traverse(child_map(manifest), matched)
+        selected |= traverse(parent_map(manifest), descendants)
+    else:
+        if match.group("parents"):
+            depth = match.group("parents_depth")
+            selected |= traverse(
+                parent_map(manifest), matched, int(depth) if depth else None
+            )
+        if match.group("children"):
+            depth = match.group("children_depth")
+            selected |= traverse(
+                child_map(manifest), matched, int(depth) if depth else None
+            )
+    models = model_nodes(manifest)
+    return {unique_id for unique_id in selected if unique_id in models}
+
+
+def match_selectors(manifest, selectors, state_manifest=None) -> set:
+    """
+    Find the models matching a list of selectors, combined in the same way as dbt.
+
+    Each item may contain several space separated selectors, which are combined as a union, and each of those
+    may contain comma separated selectors, which are combined as an intersection.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        selectors (list): The selectors, e.g. the values given to '--select'.
+        state_manifest (dict, optional): The baseline manifest for the 'state' method.
+
+    Returns:
+        set: The unique IDs of the matching models.
+    """
+    selected = set()
+    for item in selectors:
+        for union_part in item.split():
+            intersection = None
+            for selector in union_part.split(","):
+                matched = match_selector(manifest, selector, state_manifest)
+                intersection = (
+                    matched if intersection is None else intersection & matched
+                )
+            selected |= intersection or set()
+    return selected
+
+
+def select_models(
+    manifest_path=DEFAULT_MANIFEST_PATH, select=(), exclude=(), state=None
+) -> set:
+    """
+    Select models with dbt-style '--select' and '--exclude' selectors.
+
+    Parameters:
+        manifest_path (str, optional): The path to the manifest of the current project. Defaults to
+            'target/manifest.json'.
+        select (list, optional): The selectors to include. Defaults to every model.
+        exclude (list, optional): The selectors to exclude. Defaults to none.
+        state (str, optional): The path to a baseline manifest, used by the 'state' selector method.
+
+    Returns:
+        set: The names of the selected models, or None if the selection couldn't be made.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        return None
+    state_manifest = None
+    if state is not None:
+        state_manifest = load_manifest(state)
+        if state_manifest is None:
+            return None
+    try:
+        selected = (
+            match_selectors(manifest, select, state_manifest)
+            if select
+            else set(model_nodes(manifest))
+        )
+        selected -= match_selectors(manifest, exclude, state_manifest)
+    except ValueError as error:
+        logging.error(f"Unable to select models. {error}")
+        return None
+    logging.info(f"{len(selected)} models selected")
+    return model_names(manifest, selected)
+
+
+def model_yaml_files(manifest_path, names) -> list:
+    """
+    Find the YAML files that document a set of models.
+
+    Parameters:
+        manifest_path (str): The path to the manifest of the current project.
+        names (set): The names of the models.
+
+    Returns:
+        list: The sorted paths of the YAML files, relative to the dbt project, or None if the manifest can't
+            be loaded.
+    """
+    manifest = load_manifest(manifest_path)
+    if manifest is None:
+        return None
+    files = set()
+    for node in model_nodes(manifest).values():
+        patch_path = node.get("patch_path")
+        if node["name"] in names and patch_path:
+            files.add(os.path.normpath(patch_path.split("://", 1)[-1]))
+    return sorted(files)
+
+
+def model_relations(manifest, names) -> list:
+    """
+    Find the database relations that a set of models are built as.
+
+    Ephemeral models, which aren't built as relations, are left out.
+
+    Parameters:
+        manifest (dict): The loaded manifest.
+        names (list): The names of the models.
+
+    Returns:
+        list: A list of dictionaries with the 'model' name, and the 'database', 'schema' and 'identifier' of its
+            relation.
+    """
+    names = set(names)
+    relations = []
+    for node in model_nodes(manifest).values():
+        if node["name"] not in names:
+            continue
+        if (node.get("config") or {}).get("materialized") == "ephemeral":
+            logging.warning(
+                f"Model '{node['name']}' is ephemeral and has no columns to fetch"
+            )
+            continue
+        relations.append(
+            {
+                "model": node["name"],
+                "database": node.get("database"),
+                "schema": node.get("schema"),
+                "identifier": node.get("alias") or node["name"],
+            }
+        )
+    return relations
@@ -0,0 +1,289 @@
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+PHASES = [
+    "scan",
+    "prefilter",
+    "parse",
+    "dictionary_match",
+    "merge",
+    "serialize",
+    "write",
+    "dbt_subprocess",
+]
+
+_active_profiler = None
+# tracemalloc, imported when profiling starts so that it isn't loaded by every command
+_tracemalloc = None
+
+
+class profiler:
+    def __init__(self, command) -> None:
+        """
+        Initialize a profiler for a single command run.
+
+        The profiler records wall time, CPU time and peak traced memory for each named phase, as well as the
+        wall time spent on each file. Phases can be nested; a nested phase counts towards its own totals and
+        the peak memory of the enclosing phase, but its time is also included in the enclosing phase. Phases
+        recorded on other threads, such as codegen workers, only measure wall time and the CPU time of the thread.
+
+        Parameters:
+            command (str): The name of the command being profiled, e.g. 'apply' or 'generate'.
+
+        Returns:
+            None
+        """
+        self.command = command
+        self.phases = {}
+        self.files = {}
+        self._stack = []
+        self._lock = threading.Lock()
+        self._started_at = None
+        self._wall_start = None
+        self._cpu_start = None
+
+    def start(self) -> None:
+        """
+        Start the wall clock, CPU clock and memory tracing for the run.
+
+        Returns:
+            None
+        """
+        self._started_at = datetime.now(timezone.utc).isoformat()
+        _tracemalloc.start()
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    def stop(self) -> dict:
+        """
+        Stop memory tracing and build the profile report.
+
+        Returns:
+            dict: The profile report, containing the run totals, the per phase totals and the per file timings.
+        """
+        wall = time.perf_counter() - self._wall_start
+        cpu = time.process_time() - self._cpu_start
+        _, peak = _tracemalloc.get_traced_memory()
+        peak = max(
+            [peak] + [phase["peak_memory_bytes"] for phase in self.phases.values()]
+        )
+        _tracemalloc.stop()
+        return {
+            "command": self.command,
+            "started_at": self._started_at,
+            "total": {
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                "peak_memory_bytes": peak,
+            },
+            "phases": {
+                name: {
+                    "calls": phase["calls"],
+                    "wall_seconds": round(phase["wall_seconds"], 6),
+                    "cpu_seconds": round(phase["cpu_seconds"], 6),
+                    "peak_memory_bytes": phase["peak_memory_bytes"],
+                }
+                for name, phase in sorted(
+                    self.phases.items(),
+                    key=lambda item: PHASES.index(item[0])
+                    if item[0] in PHASES
+                    else len(PHASES),
+                )
+            },
+            "files": {
+                file_path: {
+                    "wall_seconds": round(file["wall_seconds"], 6),
+                    "phases": {
+                        name: round(seconds, 6)
+                        for name, seconds in file["phases"].items()
+                    },
+                }
+                for file_path, file in self.files.items()
+            },
+        }
+
+    @contextmanager
+    def phase(self, name, file_path=None):
+        """
+        Record the wall time, CPU time and peak memory of the enclosed block against the given phase.
+
+        Peak memory is measured with tracemalloc. The traced peak is reset when a phase starts so that it
+        reflects the allocations made within the phase, and any nested phase peaks are carried up to the
+        enclosing phase when they finish.
+
+        Parameters:
+            name (str): The name of the phase, ideally one of PHASES.
+            file_path (str, optional): The file being processed, used to report the slowest files.
+
+        Yields:
+            None
+        """
+        if threading.current_thread() is not threading.main_thread():
+            wall_start = time.perf_counter()
+            cpu_start = time.thread_time()
+            try:
+                yield
+            finally:
+                self._record(
+                    name,
+                    file_path,
+                    time.perf_counter() - wall_start,
+                    time.thread_time() - cpu_start,
+                    0,
+                )
+            return
+
+        _, outer_peak = _tracemalloc.get_traced_memory()
+        if self._stack:
+            self._stack[-1] = max(self._stack[-1], outer_peak)
+        self._stack.append(0)
+        _tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+            _, peak = _tracemalloc.get_traced_memory()
+            peak = max(peak, self._stack.pop())
+            if self._stack:
+                self._stack[-1] = max(self._stack[-1], peak)
+            self._record(name, file_path, wall, cpu, peak)
+
+    def _record(self, name, file_path, wall, cpu, peak) -> None:
+        with self._lock:
+            phase = self.phases.setdefault(
+                name,
+                {
+                    "calls": 0,
+                    "wall_seconds": 0.0,
+                    "cpu_seconds": 0.0,
+                    "peak_memory_bytes": 0,
+                },
+            )
+            phase["calls"] += 1
+            phase["wall_seconds"] += wall
+            phase["cpu_seconds"] += cpu
+            phase["peak_memory_bytes"] = max(phase["peak_memory_bytes"], peak)
+
+            if file_path is not None:
+                file = self.files.setdefault(
+                    file_path, {"wall_seconds": 0.0, "phases": {}}
+                )
+                file["wall_seconds"] += wall
+                file["phases"][name] = file["phases"].get(name, 0.0) + wall
+
+
+def start_profiling(command) -> None:
+    """
+    Start profiling the current command run.
+
+    While profiling is active, every block wrapped with 'phase()' is recorded against the active profiler.
+
+    Parameters:
+        command (str): The name of the command being profiled.
+
+    Returns:
+        None
+    """
+    global _active_profiler, _tracemalloc
+    if _tracemalloc is None:
+        import tracemalloc
+
+        _tracemalloc = tracemalloc
+    _active_profiler = profiler(command)
+    _active_profiler.start()
+
+
+def stop_profiling(output_path=None, top=10) -> dict:
+    """
+    Stop profiling, log a timing summary and optionally write the machine-readable report.
+
+    The JSON report contains the run totals, the totals for each phase and the 'top' slowest files, so it can
+    be stored and compared across runs.
+
+    Parameters:
+        output_path (str, optional): The path to write the JSON report to. Nothing is written if None.
+        top (int, optional): The number of slowest files to report. Defaults to 10.
+
+    Returns:
+        dict: The profile report, or None if profiling wasn't active.
+    """
+    global _active_profiler
+    if _active_profiler is None:
+        return None
+    report = _active_profiler.stop()
+    _active_profiler = None
+
+    slowest = sorted(
+        report.pop("files").items(),
+        key=lambda item: item[1]["wall_seconds"],
+        reverse=True,
+    )[:top]
+    report["slowest_files"] = [
+        {"file": file_path, **timings} for file_path, timings in slowest
+    ]
+
+    log_report(report)
+    if output_path is not None:
+        try:
+            with open(output_path, "w") as file:
+                json.dump(report, file, indent=2)
+            logging.info(f"Profile report written to '{output_path}'")
+        except IOError as error:
+            logging.error(
+                f"There was a problem writing the profile report to '{output_path}'. {error}"
+            )
+    return report
+
+
+def log_report(report) -> None:
+    """
+    Log a human readable summary of a profile report.
+
+    Parameters:
+        report (dict): The report returned by 'stop_profiling'.
+
+    Returns:
+        None
+    """
+    total = report["total"]
+    logging.info(
+        f"Profile for '{report['command']}': {total['wall_seconds']:.3f}s wall, "
+        f"{total['cpu_seconds']:.3f}s CPU, {total['peak_memory_bytes'] / 1024 ** 2:.1f} MiB peak"
+    )
+    for name, phase in report["phases"].items():
+        logging.info(
+            f"  {name:<18} {phase['calls']:>6} calls {phase['wall_seconds']:>10.3f}s wall "
+            f"{phase['cpu_seconds']:>10.3f}s CPU {phase['peak_memory_bytes'] / 1024 ** 2:>8.1f} MiB peak"
+        )
+    if report["slowest_files"]:
+        logging.info(f"Slowest {len(report['slowest_files'])} files:")
+        for file in report["slowest_files"]:
+            logging.info(f"  {file['wall_seconds']:>10.3f}s  {file['file']}")
+
+
+@contextmanager
+def phase(name, file_path=None):
+    """
+    Record the enclosed block against the given phase of the active profiler.
+
+    When profiling isn't active this is a no-op, so phases can be marked throughout the code at no cost.
+
+    Parameters:
+        name (str): The name of the phase, ideally one of PHASES.
+        file_path (str, optional): The file being processed, used to report the slowest files.
+
+    Yields:
+        None
+    """
+    if _active_profiler is None:
+        yield
+    else:
+        with _active_profiler.phase(name, file_path):
+            yield
@@ -0,0 +1,258 @@
+import logging
+import sys
+import threading
+import time
+
+# The counters tracked during a run, with the label each is shown with
+COUNTERS = {
+    "scanned": "scanned",
+    "checked": "checked",
+    "parsed": "parsed",
+    "skipped": "skipped without parsing",
+    "written": "written",
+    "models_sent": "models sent to codegen",
+    "models_generated": "generated",
+    "columns": "columns",
+}
+
+_active_progress = None
+
+
+class progress:
+    def __init__(self, command, stream=None, interval=None) -> None:
+        """
+        Initialize the progress of a single command run.
+
+        On a terminal, progress is shown as a bar on the last line, redrawn at most ten times a second. Otherwise, a
+        progress line is logged every 'interval' seconds, so that CI logs show how a long run is going.
+
+        The counts of files scanned, checked, parsed, skipped without parsing and written, models sent to codegen and
+        generated, and columns processed are tracked. The unit of work used for the bar and ETA is the counter given
+        a total with 'add_total', e.g. the files to check for 'apply', or the models to generate for 'generate'.
+
+        Parameters:
+            command (str): The name of the command being run, e.g. 'apply' or 'generate'.
+            stream (file, optional): The stream to draw the bar on. Defaults to sys.stderr.
+            interval (float, optional): The number of seconds between progress lines when the stream isn't a
+                terminal. Defaults to 10 seconds.
+
+        Returns:
+            None
+        """
+        self.command = command
+        self.stream = stream or sys.stderr
+        self.tty = self.stream.isatty()
+        self.interval = (
+            interval if interval is not None else (0.1 if self.tty else 10.0)
+        )
+        self.counts = {name: 0 for name in COUNTERS}
+        self.totals = {}
+        self.unit = None
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._last_emitted = self._started
+        self._drawn = False
+
+    def add_total(self, name, total) -> None:
+        """
+        Add to the total expected for a counter, and use that counter as the unit of work.
+
+        Parameters:
+            name (str): The name of the counter, one of COUNTERS.
+            total (int): The number to add to the total.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.totals[name] = self.totals.get(name, 0) + total
+            self.unit = name
+
+    def advance(self, name, count=1) -> None:
+        """
+        Advance a counter, and show the progress if it hasn't been shown for an interval.
+
+        Parameters:
+            name (str): The name of the counter, one of COUNTERS.
+            count (int, optional): The number to advance the counter by. Defaults to 1.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.counts[name] += count
+            now = time.perf_counter()
+            if now - self._last_emitted >= self.interval:
+                self._last_emitted = now
+                self._emit(now)
+
+    def status(self, now=None) -> dict:
+        """
+        Get the current progress.
+
+        Parameters:
+            now (float, optional): The time from 'time.perf_counter' to measure the progress at. Defaults to now.
+
+        Returns:
+            dict: The 'counts', the 'elapsed' seconds, the 'done' and 'total' units of work, the throughput in
+                'files_per_second' and 'columns_per_second', and the 'eta' in seconds, or None if it is unknown.
+        """
+        elapsed = max((now or time.perf_counter()) - self._started, 1e-9)
+        done = self.counts[self.unit] if self.unit else 0
+        total = self.totals.get(self.unit, 0)
+        rate = done / elapsed
+        return {
+            "counts": dict(self.counts),
+            "elapsed": elapsed,
+            "done": done,
+            "total": total,
+            "files_per_second": self.counts["parsed"] / elapsed,
+            "columns_per_second": self.counts["columns"] / elapsed,
+            "eta": (total - done) / rate if rate > 0 and total >= done else None,
+        }
+
+    def render(self, now=None) -> str:
+        """
+        Render the current progress as a single line.
+
+        Parameters:
+            now (float, optional): The time from 'time.perf_counter' to measure the progress at. Defaults to now.
+
+        Returns:
+            str: The progress line, e.g. '[#####-----]  50% 500/1000 checked | scanned 1000, parsed 420,
+                skipped without parsing 80, written 12 | 70.1 files/s, 2403 columns/s | ETA 0:06'.
+        """
+        status = self.status(now)
+        parts = []
+        if status["total"]:
+            fraction = min(status["done"] / status["total"], 1.0)
+            filled = int(fraction * 20)
+            parts.append(
+                f"[{'#' * filled}{'-' * (20 - filled)}] {fraction:>4.0%} "
+                f"{status['done']}/{status['total']} {COUNTERS[self.unit]}"
+            )
+        counts = ", ".join(
+            f"{COUNTERS[name]} {count}"
+            for name, count in status["counts"].items()
+            if count and name != self.unit and name != "columns"
+        )
+        if counts:
+            parts.append(counts)
+        parts.append(
+            f"{status['files_per_second']:.1f} files/s, {status['columns_per_second']:.0f} columns/s"
+        )
+        if status["eta"] is not None:
+            minutes, seconds = divmod(int(status["eta"]), 60)
+            parts.append(f"ETA {minutes}:{seconds:02d}")
+        return " | ".join(parts)
+
+    def clear(self) -> None:
+        """
+        Clear the bar from the terminal, so that a log message can be written in its place.
+
+        Returns:
+            None
+        """
+        if self.tty and self._drawn:
+            self.stream.write("\r\x1b[K")
+            self._drawn = False
+
+    def _emit(self, now) -> None:
+        if self.tty:
+            self.stream.write("\r\x1b[K" + self.render(now))
+            self.stream.flush()
+            self._drawn = True
+        else:
+            logging.info(f"Progress of '{self.command}': {self.render(now)}")
+
+    def finish(self) -> None:
+        """
+        Show the final progress, leaving the bar on its own line.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self.tty:
+                self._emit(time.perf_counter())
+                self.stream.write("\n")
+                self.stream.flush()
+                self._drawn = False
+
+
+class _clear_progress_filter(logging.Filter):
+    def filter(self, record) -> bool:
+        if _active_progress is not None:
+            _active_progress.clear()
+        return True
+
+
+_filter = _clear_progress_filter()
+
+
+def start_progress(command, stream=None, interval=None) -> None:
+    """
+    Start showing the progress of the current command run.
+
+    While progress is active, the bar is cleared before each log message is written, and redrawn on the next update.
+
+    Parameters:
+        command (str): The name of the command being run.
+        stream (file, optional): The stream to draw the bar on. Defaults to sys.stderr.
+        interval (float, optional): The number of seconds between progress lines when the stream isn't a terminal.
+
+    Returns:
+        None
+    """
+    global _active_progress
+    _active_progress = progress(command, stream, interval)
+    for handler in logging.getLogger().handlers:
+        handler.addFilter(_filter)
+
+
+def stop_progress() -> dict:
+    """
+    Stop showing progress.
+
+    Returns:
+        dict: The final progress from 'progress.status', or None if progress wasn't active.
+    """
+    global _active_progress
+    if _active_progress is None:
+        return None
+    active_progress = _active_progress
+    active_progress.finish()
+    _active_progress = None
+    for handler in logging.getLogger().handlers:
+        handler.removeFilter(_filter)
+    return active_progress.status()
+
+
+def add_total(name, total) -> None:
+    """
+    Add to the total expected for a counter of the active progress. This is a no-op when progress isn't active.
+
+    Parameters:
+        name (str): The name of the counter, one of COUNTERS.
+        total (int): The number to add to the total.
+
+    Returns:
+        None
+    """
+    if _active_progress is not None:
+        _active_progress.add_total(name, total)
+
+
+def advance(name, count=1) -> None:
+    """
+    Advance a counter of the active progress. This is a no-op when progress isn't active.
+
+    Parameters:
+        name (str): The name of the counter, one of COUNTERS.
+        count (int, optional): The number to advance the counter by. Defaults to 1.
+
+    Returns:
+        None
+    """
+    if _active_progress is not None:
+        _active_progress.advance(name, count)
@@ -0,0 +1,247 @@
+import json
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+QUIET = 0
+NORMAL = 1
+VERBOSE = 2
+
+# The level of each event, and the label it is counted under in the end of run summary. 'detail' events are only
+# logged with --verbose, 'info' events are logged unless --quiet is given, and warnings and errors are always logged.
+EVENTS = {
+    "file_checked": ("detail", "files checked"),
+    "file_skipped": ("detail", "files skipped"),
+    "file_prefiltered": ("detail", "files skipped without parsing"),
+    "file_unchanged": ("detail", "files unchanged"),
+    "file_updated": ("info", "files updated"),
+    "file_sorted": ("detail", "files sorted"),
+    "file_written": ("info", "files written"),
+    "file_missing": ("error", "files not found"),
+    "file_error": ("error", "files with errors"),
+    "model_checked": ("detail", "models checked"),
+    "model_correct": ("detail", "models correct"),
+    "model_split": ("info", "models split into their own file"),
+    "model_without_columns": ("warning", "models without columns"),
+    "column_updated": ("detail", "columns updated"),
+    "column_added": ("warning", "columns added"),
+    "column_removed": ("warning", "columns removed"),
+    "data_type_added": ("detail", "data types added"),
+}
+
+LEVELS = {
+    "detail": (VERBOSE, logging.INFO),
+    "info": (NORMAL, logging.INFO),
+    "warning": (QUIET, logging.WARNING),
+    "error": (QUIET, logging.ERROR),
+}
+
+_active_reporter = None
+# Functions called with the name and fields of every event, e.g. by 'datadict_api.recording'
+_listeners = []
+
+
+class reporter:
+    def __init__(self, command, verbosity=NORMAL, events_stream=None) -> None:
+        """
+        Initialize a reporter for a single command run.
+
+        The reporter counts every event, only formats and logs the events enabled at its verbosity, and writes
+        every event to the optional JSON-lines stream. At the end of the run, the counts are logged as a summary.
+
+        Parameters:
+            command (str): The name of the command being reported on, e.g. 'apply' or 'generate'.
+            verbosity (int, optional): One of QUIET, NORMAL and VERBOSE. Defaults to NORMAL.
+            events_stream (file, optional): A text stream to write each event to as a JSON line.
+
+        Returns:
+            None
+        """
+        self.command = command
+        self.verbosity = verbosity
+        self.events_stream = events_stream
+        self.counts = {}
+        self.previous_level = logging.INFO
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+
+    def enabled(self, level) -> bool:
+        """
+        Check whether events of the given level are logged at the reporter's verbosity.
+
+        Parameters:
+            level (str): One of 'detail', 'info', 'warning' and 'error'.
+
+        Returns:
+            bool: True if events of the level are logged.
+        """
+        return self.verbosity >= LEVELS[level][0]
+
+    def event(self, name, message=None, **fields) -> None:
+        """
+        Record an event, logging its message if its level is enabled.
+
+        Parameters:
+            name (str): The name of the event, one of EVENTS.
+            message (str, optional): A format string for the message, formatted with 'fields' only if it is logged.
+            **fields: The details of the event, e.g. the 'file' and 'model'.
+
+        Returns:
+            None
+        """
+        level = EVENTS[name][0]
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            if self.events_stream is not None:
+                self.events_stream.write(
+                    json.dumps(
+                        {
+                            "time": datetime.now(timezone.utc).isoformat(),
+                            "event": name,
+                            "level": level,
+                            **fields,
+                        },
+                        default=str,
+                    )
+                    + "\n"
+                )
+        if message is not None and self.enabled(level):
+            logging.log(LEVELS[level][1], message.format(**fields))
+
+    def summary(self) -> dict:
+        """
+        Build the summary of the run.
+
+        Returns:
+            dict: The 'command', its duration in 'seconds' and the 'counts' of each event.
+        """
+        return {
+            "command": self.command,
+            "seconds": round(time.perf_counter() - self._started, 3),
+            "counts": {
+                name: self.counts[name] for name in EVENTS if self.counts.get(name)
+            },
+        }
+
+
+def start_reporting(command, verbosity=NORMAL, events_path=None) -> None:
+    """
+    Start reporting on the current command run, configuring logging for the given verbosity.
+
+    Parameters:
+        command (str): The name of the command being reported on.
+        verbosity (int, optional): One of QUIET, NORMAL and VERBOSE. Defaults to NORMAL.
+        events_path (str, optional): The path to write the JSON-lines event stream to, or '-' for stdout.
+
+    Returns:
+        None
+    """
+    global _active_reporter
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+    previous_level = logging.getLogger().level
+    logging.getLogger().setLevel(
+        logging.WARNING if verbosity == QUIET else logging.INFO
+    )
+    events_stream = None
+    if events_path == "-":
+        events_stream = sys.stdout
+    elif events_path is not None:
+        events_stream = open(events_path, "w")
+    _active_reporter = reporter(command, verbosity, events_stream)
+    _active_reporter.previous_level = previous_level
+
+
+def stop_reporting() -> dict:
+    """
+    Stop reporting, log the end of run summary and close the event stream.
+
+    Returns:
+        dict: The summary of the run, or None if reporting wasn't active.
+    """
+    global _active_reporter
+    if _active_reporter is None:
+        return None
+    active_reporter = _active_reporter
+    _active_reporter = None
+    summary = active_reporter.summary()
+    if active_reporter.verbosity >= NORMAL:
+        log_summary(summary)
+    logging.getLogger().setLevel(active_reporter.previous_level)
+    stream = active_reporter.events_stream
+    if stream is not None:
+        stream.write(json.dumps({"event": "summary", **summary}) + "\n")
+        if stream is sys.stdout:
+            stream.flush()
+        else:
+            stream.close()
+    return summary
+
+
+def log_summary(summary) -> None:
+    """
+    Log a concise summary of a run.
+
+    Parameters:
+        summary (dict): The summary returned by 'stop_reporting'.
+
+    Returns:
+        None
+    """
+    counts = ", ".join(
+        f"{count} {EVENTS[name][1]}" for name, count in summary["counts"].items()
+    )
+    logging.info(
+        f"Summary of '{summary['command']}' in {summary['seconds']:.1f}s: {counts or 'nothing to report'}"
+    )
+
+
+def event(name, message=None, **fields) -> None:
+    """
+    Record an event against the active reporter.
+
+    When reporting isn't active, the message is logged at the event's level, as it was before reporting was
+    introduced, so library users see the same output.
+
+    Parameters:
+        name (str): The name of the event, one of EVENTS.
+        message (str, optional): A format string for the message, formatted with 'fields' only if it is logged.
+        **fields: The details of the event, e.g. the 'file' and 'model'.
+
+    Returns:
+        None
+    """
+    if _active_reporter is not None:
+        _active_reporter.event(name, message, **fields)
+    elif message is not None:
+        logging.log(LEVELS[EVENTS[name][0]][1], message.format(**fields))
+    for listener in _listeners:
+        listener(name, fields)
+
+
+def add_listener(listener) -> None:
+    """
+    Call a function with every event recorded until it is removed, whether or not reporting is active.
+
+    Parameters:
+        listener (function): A function taking the name of the event, one of EVENTS, and a dictionary of its
+            fields.
+
+    Returns:
+        None
+    """
+    _listeners.append(listener)
+
+
+def remove_listener(listener) -> None:
+    """
+    Stop calling a function added with 'add_listener'.
+
+    Parameters:
+        listener (function): The function to remove.
+
+    Returns:
+        None
+    """
+    _listeners.remove(listener)
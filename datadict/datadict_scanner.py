@@ -0,0 +1,268 @@
+from datadict import datadict_helpers
+from datadict.datadict_profile import phase
+
+_scanner_yaml = None
+_resolvers = None
+
+# The keys of a model and a column that are read, all other keys are skipped without being built
+MODEL_KEYS = ("name", "columns")
+COLUMN_KEYS = ("name", "description", "data_type")
+
+STR_TAG = "tag:yaml.org,2002:str"
+NULL_TAG = "tag:yaml.org,2002:null"
+
+
+class _fallback(Exception):
+    """
+    Raised when a model can't be read from the parsing events alone, e.g. because it uses an alias, a merge key or
+    a scalar that doesn't load as a string.
+    """
+
+
+def _events(file):
+    global _scanner_yaml
+    if _scanner_yaml is None:
+        import ruamel.yaml
+
+        _scanner_yaml = ruamel.yaml.YAML(typ="safe")
+    return _scanner_yaml.parse(file)
+
+
+def _kind(event) -> str:
+    # The class names of the events, e.g. 'MappingStartEvent', are shared by the C and pure Python parsers
+    return type(event).__name__
+
+
+def _skip(events, event) -> None:
+    """
+    Skip the node starting with the given event, without building it.
+    """
+    kind = _kind(event)
+    if kind == "AliasEvent":
+        return
+    if kind in ("MappingStartEvent", "SequenceStartEvent"):
+        depth = 1
+        while depth:
+            kind = _kind(next(events))
+            if kind in ("MappingStartEvent", "SequenceStartEvent"):
+                depth += 1
+            elif kind in ("MappingEndEvent", "SequenceEndEvent"):
+                depth -= 1
+
+
+def _resolve(value) -> str:
+    """
+    Resolve the tag of a plain scalar in the same way as the safe loader, from the implicit resolvers of the
+    first character of the value.
+    """
+    global _resolvers
+    if _resolvers is None:
+        from ruamel.yaml.resolver import VersionedResolver
+
+        _resolvers = VersionedResolver().versioned_resolver
+    for resolvers in (_resolvers.get(value[:1], ()), _resolvers.get(None, ())):
+        for tag, regexp in resolvers:
+            if regexp.match(value):
+                return tag
+    return STR_TAG
+
+
+def _scalar(event):
+    """
+    Get the value of a scalar event, as the safe loader would load it.
+
+    Quoted scalars are strings, and plain scalars are resolved like the loader does, so that e.g. '~' is None. A
+    plain scalar that would load as another type, e.g. a number, raises '_fallback'.
+    """
+    if _kind(event) != "ScalarEvent":
+        raise _fallback()
+    if event.tag is not None and event.tag not in ("!", STR_TAG):
+        raise _fallback()
+    if not event.implicit[0]:
+        return event.value
+    tag = _resolve(event.value)
+    if tag == NULL_TAG:
+        return None
+    if tag != STR_TAG:
+        raise _fallback()
+    return event.value
+
+
+def _key(event):
+    """
+    Get a mapping key, or None if it isn't a scalar. A key that isn't a scalar is skipped with its value.
+    """
+    return event.value if _kind(event) == "ScalarEvent" else None
+
+
+def _read_mapping(events, keys, read_value) -> dict:
+    """
+    Read the given keys of the mapping whose start event has just been consumed, skipping every other key.
+    """
+    values = {}
+    while True:
+        event = next(events)
+        if _kind(event) == "MappingEndEvent":
+            return values
+        key = _key(event)
+        if key == "<<":
+            raise _fallback()
+        value = next(events)
+        if key in keys:
+            values[key] = read_value(events, key, value)
+        else:
+            _skip(events, value)
+
+
+def _read_column(events, key, event):
+    if _kind(event) in ("MappingStartEvent", "SequenceStartEvent", "AliasEvent"):
+        raise _fallback()
+    return _scalar(event)
+
+
+def _read_model(events, key, event):
+    if key == "name":
+        return _read_column(events, key, event)
+    if _kind(event) == "AliasEvent":
+        raise _fallback()
+    if _kind(event) != "SequenceStartEvent":
+        _skip(events, event)
+        return []
+    columns = []
+    while True:
+        event = next(events)
+        kind = _kind(event)
+        if kind == "SequenceEndEvent":
+            return columns
+        if kind == "AliasEvent":
+            raise _fallback()
+        if kind == "MappingStartEvent":
+            columns.append(_read_mapping(events, COLUMN_KEYS, _read_column))
+        else:
+            _skip(events, event)
+
+
+def _model_records(model) -> list:
+    name = model["name"]
+    records = [(name, None, None, None)]
+    for column in model.get("columns") or []:
+        if isinstance(column, dict):
+            records.append(
+                (
+                    name,
+                    column["name"],
+                    column.get("description"),
+                    column.get("data_type"),
+                )
+            )
+    return records
+
+
+def _scan_models(file):
+    """
+    Yield each model of the top-level 'models' list of the first document, as a dictionary with its 'name' and
+    'columns'.
+    """
+    events = iter(_events(file))
+    for event in events:
+        kind = _kind(event)
+        if kind in ("StreamStartEvent", "DocumentStartEvent"):
+            continue
+        if kind != "MappingStartEvent":
+            return
+        break
+    else:
+        return
+    while True:
+        event = next(events)
+        if _kind(event) == "MappingEndEvent":
+            return
+        key = _key(event)
+        if key == "<<":
+            raise _fallback()
+        value = next(events)
+        if key != "models":
+            _skip(events, value)
+            continue
+        if _kind(value) == "AliasEvent":
+            raise _fallback()
+        if _kind(value) != "SequenceStartEvent":
+            _skip(events, value)
+            continue
+        while True:
+            event = next(events)
+            kind = _kind(event)
+            if kind == "SequenceEndEvent":
+                break
+            if kind == "AliasEvent":
+                raise _fallback()
+            if kind == "MappingStartEvent":
+                yield _read_mapping(events, MODEL_KEYS, _read_model)
+            else:
+                _skip(events, event)
+
+
+def iter_model_columns(file_path):
+    """
+    Stream the models and columns of a model YAML file, without building the YAML document.
+
+    The file is read as a stream of parsing events, and only the names of the models and the names,
+    descriptions and data types of their columns are kept, so memory is bounded by the largest single model
+    rather than the file. Models that can't be read from the events alone, e.g. because they use aliases or
+    merge keys, are read from the file loaded with 'datadict_helpers.load_yaml_file_fast' instead.
+
+    Parameters:
+        file_path (str): The path to the YAML file.
+
+    Yields:
+        tuple: A '(model, None, None, None)' record for each model, followed by a
+            '(model, column, description, data_type)' record for each of its columns. The 'description' and
+            'data_type' are None if the column doesn't have them. Files without a top-level 'models' key yield
+            no records.
+    """
+    scanned = 0
+    try:
+        with open(file_path, "rb") as file:
+            for model in _scan_models(file):
+                yield from _model_records(model)
+                scanned += 1
+        return
+    except _fallback:
+        pass
+    model_yaml = datadict_helpers.load_yaml_file_fast(file_path)
+    if not isinstance(model_yaml, dict):
+        return
+    for model in (model_yaml.get("models") or [])[scanned:]:
+        if isinstance(model, dict):
+            yield from _model_records(model)
+
+
+def read_file_fields(file_path, prefilter=True) -> list:
+    """
+    Read the fields of a model YAML file without building the YAML document.
+
+    Files without a top-level 'models' key are skipped without being parsed (see
+    'datadict_helpers.might_contain_models').
+
+    Parameters:
+        file_path (str): The path to the YAML file.
+        prefilter (bool, optional): Check the raw bytes of the file for a 'models' key first. Defaults to True.
+
+    Returns:
+        list: The fields in the format of 'datadict_index.collect_file_fields', a dictionary with the 'name',
+            'model' and, if present, 'description' of each column, or None if the file doesn't contain models.
+    """
+    if prefilter and not datadict_helpers.might_contain_models(file_path):
+        return None
+    fields = []
+    found_models = False
+    with phase("parse", file_path):
+        for model, column, description, data_type in iter_model_columns(file_path):
+            found_models = True
+            if column is None:
+                continue
+            field = {"name": column, "model": model}
+            if description is not None:
+                field["description"] = description
+            fields.append(field)
+    return fields if found_models else None
@@ -0,0 +1,414 @@
+import bisect
+import json
+import logging
+import re
+import socketserver
+import sys
+import threading
+
+from datadict import datadict_entry
+from datadict.datadict_watch import watcher
+
+WORD_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+
+# LSP error codes, from the JSON-RPC and LSP specifications
+PARSE_ERROR = -32700
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class _method_not_found(Exception):
+    """
+    Raised when a request names a method the server doesn't provide.
+    """
+
+
+class server:
+    def __init__(self, dictionary_file_path, directory, polling=False, interval=1.0):
+        """
+        Initialize a server that keeps the dictionary and its indexes in memory to answer column queries.
+
+        The server holds a read-only 'watcher', so the dictionary and the fields collected from the model files
+        are kept up to date as files change, without ever writing to them. After every change the lookup,
+        completion and usage indexes are rebuilt from the in-memory state.
+
+        Parameters:
+            dictionary_file_path (str or list): The file path to the YAML dictionary file, or the paths of the
+                dictionary layers, from the lowest to the highest precedence.
+            directory (str): The directory containing the model YAML files.
+            polling (bool, optional): Use the polling backend instead of inotify. Defaults to False.
+            interval (float, optional): The polling interval in seconds. Defaults to 1.0.
+
+        Returns:
+            None
+        """
+        self.watcher = watcher(
+            dictionary_file_path, directory, polling, interval, read_only=True
+        )
+        self.lock = threading.Lock()
+        self.documents = {}
+        self.lookup_index = {}
+        self.completion_names = []
+        self.usage_index = {}
+        self.entry_usage = {}
+        self._shutdown = False
+
+    def load(self) -> None:
+        """
+        Load the project and build the indexes.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.watcher.load()
+            self._build_indexes()
+
+    def _build_indexes(self) -> None:
+        dictionary = self.watcher.dictionary
+        self.lookup_index = dictionary.build_lookup_index()
+        usage_index = {}
+        for field in dictionary.existing_fields:
+            usage_index.setdefault(field["name"], set()).add(field["model"])
+        # The models using each entry, through any column name it matches
+        entry_usage = {}
+        for column_name, models in usage_index.items():
+            for entry in dictionary.match_entries(column_name):
+                entry_usage.setdefault(id(entry), set()).update(models)
+        self.usage_index = usage_index
+        self.entry_usage = entry_usage
+        self.completion_names = sorted(set(self.lookup_index) | set(usage_index))
+
+    def _entry(self, name) -> datadict_entry.DictionaryEntry:
+        matched = self.watcher.dictionary.match_entries(name)
+        return matched[0] if matched else None
+
+    def watch(self) -> None:
+        """
+        Start watching the project for changes on a background thread.
+
+        Returns:
+            None
+        """
+        self.watcher.start()
+        thread = threading.Thread(target=self._watch_loop, daemon=True)
+        thread.start()
+
+    def _watch_loop(self) -> None:
+        while not self._shutdown:
+            changed = self.watcher.wait_for_changes()
+            if changed:
+                with self.lock:
+                    if self.watcher.process_changes(changed):
+                        self._build_indexes()
+
+    def lookup(self, name) -> dict:
+        """
+        Resolve a column name to its dictionary entry, matching it as the dictionary is applied: against the names,
+        aliases and pattern aliases of the entries, once normalized.
+
+        Parameters:
+            name (str): The column name to look up.
+
+        Returns:
+            dict: The 'name', 'description' and 'aliases' of the dictionary entry, or None if the column isn't in
+                the dictionary.
+        """
+        entry = self._entry(name)
+        if entry is None:
+            return None
+        return {
+            "name": entry.name,
+            "description": entry.description,
+            "aliases": list(entry.aliases),
+        }
+
+    def complete(self, prefix, limit=50) -> list:
+        """
+        List the column names and aliases starting with the given prefix.
+
+        Parameters:
+            prefix (str): The prefix to complete.
+            limit (int, optional): The maximum number of names to return. Defaults to 50.
+
+        Returns:
+            list: A list of dictionaries with the 'name' and 'description' of each matching column.
+        """
+        names = self.completion_names
+        start = bisect.bisect_left(names, prefix)
+        completions = []
+        for name in names[start : start + limit]:
+            if not name.startswith(prefix):
+                break
+            entry = self._entry(name)
+            completions.append(
+                {
+                    "name": name,
+                    "description": entry.description if entry else "",
+                }
+            )
+        return completions
+
+    def usage(self, name) -> dict:
+        """
+        List the models that use a column, including the models whose columns match the same dictionary entry.
+
+        Parameters:
+            name (str): The column name to look up.
+
+        Returns:
+            dict: The 'name' of the column and the sorted list of 'models' using it.
+        """
+        entry = self._entry(name)
+        if entry is not None:
+            models = self.entry_usage.get(id(entry), ())
+        else:
+            models = self.usage_index.get(name, ())
+        return {"name": name, "models": sorted(models)}
+
+    def handle(self, method, params) -> object:
+        """
+        Dispatch a JSON-RPC request to the matching query.
+
+        Parameters:
+            method (str): The name of the method, one of 'lookup', 'complete' and 'usage'.
+            params (dict): The parameters of the request.
+
+        Returns:
+            object: The result of the query.
+
+        Raises:
+            _method_not_found: If the method doesn't exist.
+            TypeError: If the parameters don't match the method.
+        """
+        methods = {
+            "lookup": self.lookup,
+            "complete": self.complete,
+            "usage": self.usage,
+        }
+        query = methods.get(method)
+        if query is None:
+            raise _method_not_found(method)
+        with self.lock:
+            return query(**(params or {}))
+
+    def _dispatch(self, request) -> dict:
+        request_id = request.get("id")
+        try:
+            result = self.handle(request.get("method"), request.get("params"))
+            return {"jsonrpc": "2.0", "id": request_id, "result": result}
+        except _method_not_found:
+            error = {"code": METHOD_NOT_FOUND, "message": "Method not found"}
+        except TypeError as e:
+            error = {"code": INVALID_PARAMS, "message": str(e)}
+        except Exception as e:
+            error = {"code": INTERNAL_ERROR, "message": str(e)}
+        return {"jsonrpc": "2.0", "id": request_id, "error": error}
+
+    def serve_socket(self, host="127.0.0.1", port=7650) -> None:
+        """
+        Serve newline-delimited JSON-RPC 2.0 requests over a TCP socket until interrupted.
+
+        Each line received is one request, e.g. '{"jsonrpc": "2.0", "id": 1, "method": "lookup",
+        "params": {"name": "customer_id"}}', and each response is written back as a single line.
+
+        Parameters:
+            host (str, optional): The host to bind to. Defaults to '127.0.0.1'.
+            port (int, optional): The port to bind to. Defaults to 7650.
+
+        Returns:
+            None
+        """
+        datadict_server = self
+
+        class handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        response = datadict_server._dispatch(json.loads(line))
+                    except ValueError:
+                        response = {
+                            "jsonrpc": "2.0",
+                            "id": None,
+                            "error": {"code": PARSE_ERROR, "message": "Parse error"},
+                        }
+                    self.wfile.write(json.dumps(response).encode("UTF-8") + b"\n")
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        with socketserver.ThreadingTCPServer((host, port), handler) as tcp_server:
+            tcp_server.daemon_threads = True
+            logging.info(f"Serving JSON-RPC requests on {host}:{port}")
+            try:
+                tcp_server.serve_forever()
+            except KeyboardInterrupt:
+                logging.info("Stopped serving requests")
+
+    def _word_at(self, uri, position) -> tuple:
+        lines = self.documents.get(uri, "").splitlines()
+        line_number = position.get("line", 0)
+        if line_number >= len(lines):
+            return ("", "")
+        line = lines[line_number]
+        character = min(position.get("character", 0), len(line))
+        for match in WORD_PATTERN.finditer(line):
+            if match.start() <= character <= match.end():
+                return (match.group(), line[match.start() : character])
+        return ("", "")
+
+    def _lsp_hover(self, params) -> dict:
+        word, _ = self._word_at(params["textDocument"]["uri"], params["position"])
+        entry = self.lookup(word) if word else None
+        if entry is None:
+            return None
+        usage = self.usage(word)
+        value = f"**{entry['name']}**\n\n{entry['description']}"
+        if entry["aliases"]:
+            value += f"\n\nAliases: {', '.join(entry['aliases'])}"
+        if usage["models"]:
+            value += f"\n\nUsed in {len(usage['models'])} models"
+        return {"contents": {"kind": "markdown", "value": value}}
+
+    def _lsp_completion(self, params) -> list:
+        _, prefix = self._word_at(params["textDocument"]["uri"], params["position"])
+        return [
+            {
+                "label": completion["name"],
+                "kind": 5,
+                "detail": completion["description"],
+                "documentation": completion["description"],
+            }
+            for completion in self.complete(prefix)
+        ]
+
+    def _lsp_request(self, method, params) -> object:
+        if method == "initialize":
+            return {
+                "capabilities": {
+                    "textDocumentSync": 1,
+                    "hoverProvider": True,
+                    "completionProvider": {"resolveProvider": False},
+                },
+                "serverInfo": {"name": "datadict"},
+            }
+        elif method == "shutdown":
+            self._shutdown = True
+            return None
+        elif method == "textDocument/hover":
+            return self._lsp_hover(params)
+        elif method == "textDocument/completion":
+            return self._lsp_completion(params)
+        elif method.startswith("datadict/"):
+            return self.handle(method[len("datadict/") :], params)
+        raise _method_not_found(method)
+
+    def _lsp_notification(self, method, params) -> None:
+        if method == "textDocument/didOpen":
+            document = params["textDocument"]
+            self.documents[document["uri"]] = document["text"]
+        elif method == "textDocument/didChange":
+            changes = params["contentChanges"]
+            if changes:
+                self.documents[params["textDocument"]["uri"]] = changes[-1]["text"]
+        elif method == "textDocument/didClose":
+            self.documents.pop(params["textDocument"]["uri"], None)
+
+    def handle_lsp_message(self, message) -> dict:
+        """
+        Handle a single Language Server Protocol message.
+
+        Hover and completion are answered for the word under the cursor, using the documents synchronised through
+        'didOpen' and 'didChange'. The 'datadict/lookup', 'datadict/complete' and 'datadict/usage' requests expose
+        the JSON-RPC queries to editor extensions.
+
+        Parameters:
+            message (dict): The decoded JSON-RPC message.
+
+        Returns:
+            dict: The response to send, or None for notifications.
+        """
+        method = message.get("method", "")
+        params = message.get("params") or {}
+        if "id" not in message:
+            self._lsp_notification(method, params)
+            return None
+        try:
+            if method.startswith("textDocument/"):
+                with self.lock:
+                    result = self._lsp_request(method, params)
+            else:
+                result = self._lsp_request(method, params)
+            return {"jsonrpc": "2.0", "id": message["id"], "result": result}
+        except _method_not_found:
+            error = {"code": METHOD_NOT_FOUND, "message": f"Method not found: {method}"}
+        except (KeyError, TypeError) as e:
+            # A required parameter is missing, e.g. the 'textDocument' of a hover request
+            error = {"code": INVALID_PARAMS, "message": f"Invalid params: {e}"}
+        except Exception as e:
+            error = {"code": INTERNAL_ERROR, "message": str(e)}
+        return {"jsonrpc": "2.0", "id": message["id"], "error": error}
+
+    def serve_lsp(self, stdin=None, stdout=None) -> None:
+        """
+        Serve the Language Server Protocol over stdio until the client sends 'exit'.
+
+        Parameters:
+            stdin (file, optional): The binary stream to read messages from. Defaults to sys.stdin.
+            stdout (file, optional): The binary stream to write messages to. Defaults to sys.stdout.
+
+        Returns:
+            None
+        """
+        stdin = stdin or sys.stdin.buffer
+        stdout = stdout or sys.stdout.buffer
+        while True:
+            message = read_lsp_message(stdin)
+            if message is None or message.get("method") == "exit":
+                return
+            response = self.handle_lsp_message(message)
+            if response is not None:
+                write_lsp_message(stdout, response)
+
+
+def read_lsp_message(stream) -> dict:
+    """
+    Read a single message framed with a 'Content-Length' header from a binary stream.
+
+    Parameters:
+        stream (file): The binary stream to read from.
+
+    Returns:
+        dict: The decoded message, or None if the stream has ended.
+    """
+    content_length = None
+    while True:
+        line = stream.readline()
+        if not line:
+            return None
+        line = line.strip()
+        if not line:
+            break
+        name, _, value = line.decode("ascii").partition(":")
+        if name.lower() == "content-length":
+            content_length = int(value.strip())
+    if content_length is None:
+        return None
+    return json.loads(stream.read(content_length).decode("UTF-8"))
+
+
+def write_lsp_message(stream, message) -> None:
+    """
+    Write a single message framed with a 'Content-Length' header to a binary stream.
+
+    Parameters:
+        stream (file): The binary stream to write to.
+        message (dict): The message to encode and write.
+
+    Returns:
+        None
+    """
+    body = json.dumps(message).encode("UTF-8")
+    stream.write(f"Content-Length: {len(body)}\r\n\r\n".encode("ascii") + body)
+    stream.flush()
@@ -0,0 +1,435 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+
+from datadict import datadict_helpers, datadict_scanner
+from datadict.datadict_class import datadict
+
+YAML_EXTENSIONS = (".yml", ".yaml")
+
+# inotify event masks, from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_ISDIR = 0x40000000
+IN_IGNORED = 0x00008000
+
+WATCH_MASK = (
+    IN_MODIFY
+    | IN_CLOSE_WRITE
+    | IN_MOVED_FROM
+    | IN_MOVED_TO
+    | IN_CREATE
+    | IN_DELETE
+    | IN_DELETE_SELF
+)
+
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class inotify_backend:
+    def __init__(self, directories, files) -> None:
+        """
+        Initialize an inotify instance watching the given directories and all of their subdirectories.
+
+        Individual files are watched through their parent directory, which isn't watched recursively, so that
+        editors that save by replacing the file are still picked up.
+
+        Parameters:
+            directories (list): The directories to watch recursively.
+            files (list): Additional individual files to watch.
+
+        Returns:
+            None
+
+        Raises:
+            OSError: If inotify isn't available on this platform.
+        """
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.watches = {}
+        for directory in directories:
+            self.add_directory(directory)
+        for file in files:
+            self._watch(os.path.dirname(os.path.abspath(file)))
+
+    def add_directory(self, directory) -> None:
+        """
+        Watch a directory and all of its subdirectories.
+
+        Parameters:
+            directory (str): The directory to watch.
+
+        Returns:
+            None
+        """
+        for root, dirs, files in os.walk(directory):
+            self._watch(root)
+
+    def _watch(self, directory) -> None:
+        directory = os.path.abspath(directory)
+        if directory in self.watches.values():
+            return
+        descriptor = self._add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            logging.warning(
+                f"Unable to watch directory '{directory}': {os.strerror(error)}"
+            )
+            return
+        self.watches[descriptor] = directory
+
+    def wait(self, timeout) -> set:
+        """
+        Wait for file events and return the paths that changed.
+
+        Parameters:
+            timeout (float): The maximum number of seconds to wait for an event.
+
+        Returns:
+            set: The paths of the files that were created, modified, moved or deleted.
+        """
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(buffer):
+            descriptor, mask, _, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset : offset + length].rstrip(b"\0")
+            offset += length
+            directory = self.watches.get(descriptor)
+            if mask & IN_IGNORED:
+                self.watches.pop(descriptor, None)
+                continue
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_directory(path)
+                    for root, dirs, files in os.walk(path):
+                        changed.update(os.path.join(root, file) for file in files)
+                continue
+            changed.add(path)
+        return changed
+
+    def close(self) -> None:
+        """
+        Close the inotify instance.
+
+        Returns:
+            None
+        """
+        os.close(self.fd)
+
+
+class polling_backend:
+    def __init__(self, directories, files, interval=1.0) -> None:
+        """
+        Initialize a watcher that polls the modification time and size of every YAML file.
+
+        Parameters:
+            directories (list): The directories to scan recursively for YAML files.
+            files (list): Additional individual files to watch.
+            interval (float, optional): The number of seconds between scans. Defaults to 1.0.
+
+        Returns:
+            None
+        """
+        self.directories = [os.path.abspath(directory) for directory in directories]
+        self.files = [os.path.abspath(file) for file in files]
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> dict:
+        snapshot = {}
+        for directory in self.directories:
+            for root, dirs, files in os.walk(directory):
+                for file in files:
+                    if file.endswith(YAML_EXTENSIONS):
+                        path = os.path.join(root, file)
+                        snapshot[path] = datadict_helpers.file_stat(path)
+        for path in self.files:
+            snapshot[path] = datadict_helpers.file_stat(path)
+        return snapshot
+
+    def wait(self, timeout) -> set:
+        """
+        Wait for the polling interval and return the paths that changed since the previous scan.
+
+        Parameters:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            set: The paths of the files that were created, modified or deleted.
+        """
+        time.sleep(min(timeout, self.interval))
+        snapshot = self._scan()
+        changed = {
+            path
+            for path in set(snapshot) | set(self.snapshot)
+            if snapshot.get(path) != self.snapshot.get(path)
+        }
+        self.snapshot = snapshot
+        return changed
+
+    def close(self) -> None:
+        pass
+
+
+class watcher:
+    def __init__(
+        self,
+        dictionary_file_path,
+        directory,
+        polling=False,
+        interval=1.0,
+        read_only=False,
+    ) -> None:
+        """
+        Initialize a watcher that keeps the dictionary and model files of a project in memory.
+
+        The watcher holds a 'datadict' instance, the parsed YAML of every model file and the fields collected
+        from each file. When a model file changes, only that file is re-parsed and re-applied; when any of the
+        dictionary layers changes, they are reloaded and re-applied to the model files already held in memory.
+
+        In read-only mode, the dictionary is never applied or written: the watcher only keeps the dictionary and
+        the fields collected from the model files up to date. Model files are streamed with 'datadict_scanner'
+        rather than parsed and held in memory.
+
+        Parameters:
+            dictionary_file_path (str or list): The file path to the YAML dictionary file, or the paths of the
+                dictionary layers, from the lowest to the highest precedence. The last layer is collated.
+            directory (str): The directory containing the model YAML files. Only YAML files under it are treated as
+                model files, and every file is kept by its absolute path.
+            polling (bool, optional): Use the polling backend instead of inotify. Defaults to False.
+            interval (float, optional): The polling interval in seconds. Defaults to 1.0.
+            read_only (bool, optional): Don't write to the model files or dictionary. Defaults to False.
+
+        Returns:
+            None
+        """
+        self.directory = os.path.abspath(directory)
+        self.read_only = read_only
+        self.polling = polling
+        self.interval = interval
+        self.dictionary = datadict(
+            dictionary_file_path,
+            detailed_logs=False,
+            docs_directory=self.directory,
+            read_only=read_only,
+        )
+        self.dictionary_path = os.path.abspath(self.dictionary.dictionary_path)
+        self.layer_paths = sorted(
+            {os.path.abspath(path) for path in self.dictionary.layer_paths}
+        )
+        self.model_files = {}
+        self.known_stats = {}
+        self.backend = None
+
+    def load(self) -> None:
+        """
+        Apply the dictionary to every model file in the directory and write the collated dictionary.
+
+        This is equivalent to 'datadict apply', except that the parsed model files are kept in memory.
+
+        Returns:
+            None
+        """
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                if file.endswith(YAML_EXTENSIONS):
+                    file_path = os.path.join(root, file)
+                    if file_path not in self.layer_paths:
+                        self._apply_file(file_path)
+        self._output_dictionary()
+        logging.info(
+            f"Loaded {len(self.model_files)} model files and {len(self.dictionary.existing_fields)} columns"
+        )
+
+    def _apply_file(self, file_path) -> None:
+        self.dictionary.forget_file(file_path)
+        if self.read_only:
+            model_yaml = self._collect_file(file_path)
+        else:
+            model_yaml = self.dictionary.apply_data_dictionary_to_file(file_path)
+        if model_yaml is None:
+            self.model_files.pop(file_path, None)
+        else:
+            self.model_files[file_path] = model_yaml
+        self.known_stats[file_path] = datadict_helpers.file_stat(file_path)
+
+    def _collect_file(self, file_path) -> list:
+        # Read-only mode never re-applies the dictionary, so the file is streamed rather than kept in memory
+        try:
+            fields = datadict_scanner.read_file_fields(file_path)
+        except Exception as error:
+            logging.error(f"There was an issue reading file '{file_path}'. {error}")
+            return None
+        if fields is None:
+            return None
+        self.dictionary.existing_fields.extend(
+            {**field, "file": file_path} for field in fields
+        )
+        return fields
+
+    def _remove_file(self, file_path) -> None:
+        self.dictionary.forget_file(file_path)
+        self.model_files.pop(file_path, None)
+        self.known_stats.pop(file_path, None)
+        logging.info(f"File '{file_path}' has been removed")
+
+    def _reapply_dictionary(self) -> None:
+        self.dictionary.reload_dictionary()
+        if self.read_only:
+            return
+        self.dictionary.existing_fields = []
+        for file_path, model_yaml in self.model_files.items():
+            if self.dictionary.apply_data_dictionary_to_yaml(model_yaml, file_path):
+                logging.info(f"File '{file_path}' has been updated")
+            self.known_stats[file_path] = datadict_helpers.file_stat(file_path)
+
+    def _output_dictionary(self) -> None:
+        if self.read_only:
+            return
+        self.dictionary.collate_output_dictionary()
+        self.known_stats[self.dictionary_path] = datadict_helpers.file_stat(
+            self.dictionary_path
+        )
+
+    def process_changes(self, paths) -> bool:
+        """
+        Re-apply the dictionary for a set of changed paths and write the collated dictionary.
+
+        Changes made by the watcher itself are recognised by comparing the modification time and size of each
+        file with those recorded after the watcher last wrote or read it, and are ignored.
+
+        Parameters:
+            paths (iterable): The paths of the files that changed.
+
+        Returns:
+            bool: True if any change was processed, False if all changes were ignored.
+        """
+        started = time.perf_counter()
+        # Only the files applied in this batch are kept, so the list doesn't grow for the life of the watcher
+        self.dictionary.applied_files = []
+        dictionary_changed = False
+        changed_files = []
+        for path in sorted({os.path.abspath(path) for path in paths}):
+            if datadict_helpers.file_stat(path) == self.known_stats.get(path, False):
+                continue
+            if path in self.layer_paths:
+                dictionary_changed = (
+                    dictionary_changed or datadict_helpers.file_stat(path) is not None
+                )
+            elif path.endswith(YAML_EXTENSIONS) and path.startswith(
+                os.path.join(self.directory, "")
+            ):
+                # The directories of the dictionary layers are watched too, e.g. the project root, but only the
+                # YAML files under the model directory are model files
+                changed_files.append(path)
+        if not dictionary_changed and not changed_files:
+            return False
+
+        for file_path in changed_files:
+            if os.path.isfile(file_path):
+                self._apply_file(file_path)
+            else:
+                self._remove_file(file_path)
+        if dictionary_changed:
+            logging.info(
+                f"The dictionary has changed, re-applying to {len(self.model_files)} files"
+            )
+            self._reapply_dictionary()
+        self._output_dictionary()
+        logging.info(
+            f"Processed {len(changed_files)} changed files in {time.perf_counter() - started:.3f}s"
+        )
+        return True
+
+    def start(self) -> None:
+        """
+        Start the file watching backend, falling back to polling if inotify isn't available.
+
+        Returns:
+            None
+        """
+        if not self.polling:
+            try:
+                self.backend = inotify_backend([self.directory], self.layer_paths)
+                logging.info("Watching for changes using inotify")
+                return
+            except (OSError, AttributeError) as error:
+                logging.warning(
+                    f"inotify is unavailable ({error}), falling back to polling"
+                )
+        self.backend = polling_backend(
+            [self.directory], self.layer_paths, self.interval
+        )
+        logging.info(f"Watching for changes by polling every {self.interval}s")
+
+    def run(self, debounce=0.1) -> None:
+        """
+        Load the project and process changes until interrupted.
+
+        Events arriving within 'debounce' seconds of each other are processed together, so that editors which
+        write a file in several steps only trigger a single update.
+
+        Parameters:
+            debounce (float, optional): The number of seconds to wait for further events. Defaults to 0.1.
+
+        Returns:
+            None
+        """
+        self.load()
+        self.start()
+        try:
+            while True:
+                changed = self.wait_for_changes(debounce)
+                if changed:
+                    self.process_changes(changed)
+        except KeyboardInterrupt:
+            logging.info("Stopped watching for changes")
+        finally:
+            self.backend.close()
+
+    def wait_for_changes(self, debounce=0.1) -> set:
+        """
+        Wait for the next batch of changed paths from the backend.
+
+        Parameters:
+            debounce (float, optional): The number of seconds to wait for further events. Defaults to 0.1.
+
+        Returns:
+            set: The paths that changed, which may be empty if nothing changed within the polling interval.
+        """
+        changed = self.backend.wait(self.interval)
+        while changed:
+            more = self.backend.wait(debounce)
+            if not more:
+                break
+            changed |= more
+        return changed
@@ -1,28 +1,77 @@
+import io
 import logging
+import math
 import os
+import queue
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 import ruamel.yaml
 
-from datadict import datadict_dbt, datadict_helpers
+from datadict import (
+    datadict_dbt,
+    datadict_helpers,
+    datadict_manifest,
+    datadict_progress,
+    datadict_report,
+    datadict_scanner,
+)
+from datadict.datadict_profile import phase
 
 
-def check_files_for_models(yaml_obj, files) -> dict:
+def check_files_for_models(yaml_obj, files, load=True) -> dict:
     try:
         file_yamls = []
         model_list = []
+        skipped = 0
+        datadict_progress.advance("scanned", len(files))
         for file_path in files:
-            file_contents = datadict_helpers.open_model_yml_file(yaml_obj, file_path)
+            if load:
+                file_contents = datadict_helpers.open_model_yml_file(
+                    yaml_obj, file_path
+                )
+            else:
+                # Only the model names are needed, so the file is streamed rather than loaded
+                file_contents = {
+                    "status": "valid",
+                    "yaml": None,
+                    "parsed": datadict_helpers.might_contain_models(file_path),
+                }
+            datadict_progress.advance("checked")
+            if not file_contents["parsed"]:
+                skipped += 1
+                datadict_progress.advance("skipped")
+                datadict_report.event(
+                    "file_prefiltered",
+                    "File '{file}' has no top-level models and has been skipped without parsing.",
+                    file=file_path,
+                )
+                continue
+            datadict_progress.advance("parsed")
             if file_contents["status"] == "valid":
                 try:
-                    for model in file_contents["yaml"]["models"]:
-                        model_list.append({"name": model["name"], "file": file_path})
-                    file_yamls.append(
-                        {"file_path": file_path, "file_yaml": file_contents["yaml"]}
-                    )
+                    if load:
+                        for model in file_contents["yaml"]["models"]:
+                            model_list.append(
+                                {"name": model["name"], "file": file_path}
+                            )
+                        file_yamls.append(
+                            {"file_path": file_path, "file_yaml": file_contents["yaml"]}
+                        )
+                    else:
+                        with phase("parse", file_path):
+                            for model, column, _, _ in datadict_scanner.iter_model_columns(
+                                file_path
+                            ):
+                                if column is None:
+                                    model_list.append({"name": model, "file": file_path})
                 except Exception as error:
                     logging.error(
                         f"There was an issue processing file '{file_path}'. Ensure it is formatted correctly and retry. Error: {error}"
                     )
+        logging.info(
+            f"Parsed {len(files) - skipped} YAML files, and skipped {skipped} files without a top-level 'models' key"
+        )
         return {"model_list": model_list, "file_yamls": file_yamls}
     except Exception as error:
         logging.error(
@@ -30,7 +79,7 @@ def check_files_for_models(yaml_obj, files) -> dict:
         )
 
 
-def combine_column_lists(current_yml, expected_yml) -> dict:
+def combine_column_lists(current_yml, expected_yml, path=None) -> dict:
     updated = False
     combined_yaml = current_yml.copy()
     existing_columns = combined_yaml.setdefault("columns", [])
@@ -49,8 +98,13 @@ def combine_column_lists(current_yml, expected_yml) -> dict:
             if not found:
                 combined_yaml.setdefault("columns", []).append(column)
                 updated = True
-                logging.warning(
-                    f"Missing column '{column['name']}' to be added to model '{current_yml['name']}'"
+                datadict_report.event(
+                    "column_added",
+                    "Missing column '{column}' to be added to model '{model}'",
+                    column=column["name"],
+                    model=current_yml["name"],
+                    file=path,
+                    new=column.get("description"),
                 )
        
 	# Iterate through the existing columns and remove any that are not in the expected_yml
@@ -70,8 +124,13 @@ def combine_column_lists(current_yml, expected_yml) -> dict:
         for column in columns_to_remove:
             existing_columns.remove(column)
             updated = True
-            logging.warning(
-                f"Column '{column['name']}' removed from model '{current_yml['name']}'"
+            datadict_report.event(
+                "column_removed",
+                "Column '{column}' removed from model '{model}'",
+                column=column["name"],
+                model=current_yml["name"],
+                file=path,
+                old=column.get("description"),
             )
     
 	# Add the data_type to any columns that are missing it & set empty description if missing
@@ -81,9 +140,14 @@ def combine_column_lists(current_yml, expected_yml) -> dict:
         if 'data_type' not in column:
             column['data_type'] = data_types_dict[column['name']]
             updated = True
-            logging.info(
-			    f"Added data_type '{column['data_type']}' to '{column['name']}' in model '{current_yml['name']}'"
-		    )
+            datadict_report.event(
+                "data_type_added",
+                "Added data_type '{data_type}' to '{column}' in model '{model}'",
+                data_type=column["data_type"],
+                column=column["name"],
+                model=current_yml["name"],
+                file=path,
+            )
 
     sort_order = ['name', 'data_type', 'description', 'tests', 'data_tests', 'unit_tests', 'meta']
     
@@ -104,44 +168,183 @@ def combine_column_lists(current_yml, expected_yml) -> dict:
     return {"yaml": combined_yaml, "updated": updated}
 
 
-def updated_existing_files(yaml_obj, existing_file_yamls, models_to_be_updated, sort):
-    # loop through each existing file
+def merge_file_models(file_yaml, path, models_to_be_updated) -> int:
+    """
+    Combine the expected column lists of some models with the models in an existing file.
+
+    Parameters:
+        file_yaml (dict): The loaded YAML of the existing file, updated in place.
+        path (str): The path to the existing file.
+        models_to_be_updated (list): The models with their expected column lists, as generated by codegen.
+
+    Returns:
+        int: The number of models in the file that were updated.
+    """
     updated_count = 0
+    for model_num, model in enumerate(file_yaml["models"]):
+        for model_to_be_updated in models_to_be_updated:
+            if model_to_be_updated["name"] == model["name"]:
+                datadict_report.event(
+                    "model_checked",
+                    "Model {model} is being checked...",
+                    model=model["name"],
+                    file=path,
+                )
+                with phase("merge", path):
+                    combined_columns = combine_column_lists(
+                        model, model_to_be_updated, path
+                    )
+                file_yaml["models"][model_num] = combined_columns["yaml"]
+                updated = combined_columns["updated"]
+                if updated:
+                    updated_count += 1
+                else:
+                    datadict_report.event(
+                        "model_correct",
+                        "Model {model} is correct",
+                        model=model["name"],
+                        file=path,
+                    )
+    return updated_count
+
+
+def updated_existing_files(yaml_obj, existing_file_yamls, models_to_be_updated, sort):
+    # merge each model into the existing files as it is produced, then only write back the files with updated models
+    files_by_model = {}
     for file in existing_file_yamls:
-        file_yaml = file["file_yaml"]
-        path = file["file_path"]
+        for model in file["file_yaml"]["models"] or []:
+            files_by_model.setdefault(model["name"], []).append(file)
+    updated_counts = {}
+
+    for model_to_be_updated in models_to_be_updated:
+        for file in files_by_model.get(model_to_be_updated["name"], []):
+            path = file["file_path"]
+            try:
+                updated_counts[path] = updated_counts.get(path, 0) + merge_file_models(
+                    file["file_yaml"], path, [model_to_be_updated]
+                )
+            except Exception as error:
+                logging.error(
+                    f"There was an issue processing file '{path}'. This is likely a badly formatted YAML file. Error: {error}"
+                )
 
+    for file in existing_file_yamls:
+        path = file["file_path"]
         try:
-            for model_num, model in enumerate(file_yaml["models"]):
-                    for model_to_be_updated in models_to_be_updated:
-                        if model_to_be_updated["name"] == model["name"]:
-                            logging.info(f"Model {model['name']} is being checked...")
-                            combined_columns = combine_column_lists(
-                                model, model_to_be_updated
-                            )
-                            file_yaml["models"][model_num] = combined_columns["yaml"]
-                            updated = combined_columns["updated"]
-                            if updated:
-                                updated_count += 1
-                            else:
-                                logging.info(f"Model {model['name']} is correct")
-
-            if updated_count > 0:
-                    datadict_helpers.output_model_file(yaml_obj, path, file_yaml, sort)
+            if updated_counts.get(path, 0) > 0:
+                datadict_helpers.output_model_file(yaml_obj, path, file["file_yaml"], sort)
         except Exception as error:
             logging.error(
                 f"There was an issue processing file '{path}'. This is likely a badly formatted YAML file. Error: {error}"
             )
 
 
+def run_codegen(
+    model_names,
+    output_queue,
+    jobs=1,
+    chunk_size=100,
+    fast=False,
+    columns_from="codegen",
+    cancel=None,
+) -> None:
+    """
+    Run codegen for chunks of models concurrently, putting each model on a queue as soon as it is read.
+
+    At most 'jobs' chunks are run at once. The output of each run is streamed with 'datadict_dbt.stream_model_yaml',
+    and the workers block while the queue is full, so the number of generated models held in memory is bounded by
+    the speed they are consumed at. When more than one job is used, each worker is given its own dbt target path so
+    that concurrent runs don't overwrite each other's artifacts. A None is put on the queue once every chunk has
+    finished. If the consumer stops early, it sets 'cancel', and the workers stop putting models on the queue and
+    no further chunks are run, so that nothing is left blocked on the full queue.
+
+    The 'information_schema' backend isn't chunked: the manifest is loaded once and every model is fetched by a single
+    run-operation, whose queries are already batched by database and schema.
+
+    Parameters:
+        model_names (list): The names of the models to generate.
+        output_queue (queue.Queue): The bounded queue to put each generated model on.
+        jobs (int, optional): The number of codegen runs in flight at once. Defaults to 1.
+        chunk_size (int, optional): The number of models in each codegen run. Defaults to 100. Ignored for the
+            'information_schema' backend.
+        fast (bool, optional): Load the generated models with the fast, non round-trip loader. Defaults to False.
+        columns_from (str, optional): Where to get the columns from, either 'codegen' or 'information_schema' (see
+            'datadict_dbt.get_model_columns'). Defaults to 'codegen'.
+        cancel (threading.Event, optional): Set by the consumer to stop the run early. Defaults to never stopping.
+
+    Returns:
+        None
+    """
+    if cancel is None:
+        cancel = threading.Event()
+    if columns_from == "information_schema":
+        jobs = 1
+        chunk_size = max(1, len(model_names))
+    chunks = [
+        model_names[start : start + chunk_size]
+        for start in range(0, len(model_names), chunk_size)
+    ]
+    free_workers = list(range(jobs))
+    in_flight = {}
+
+    def put(item):
+        # Wait for room on the queue, but give up once the run has been cancelled
+        while not cancel.is_set():
+            try:
+                output_queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def generate_chunk(chunk, worker):
+        target_path = (
+            os.path.join("target", f"datadict_{worker}") if jobs > 1 else None
+        )
+        if columns_from == "information_schema":
+            model_yaml = datadict_dbt.get_model_columns(chunk, target_path=target_path)
+            models = model_yaml["models"] if model_yaml is not None else []
+        else:
+            models = datadict_dbt.stream_model_yaml(chunk, target_path, fast)
+        generated = 0
+        for model in models:
+            if not put(model):
+                return
+            generated += 1
+        if generated == 0:
+            logging.error(
+                f"No model YAML was generated for models: {', '.join(chunk)}"
+            )
+
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while (chunks and not cancel.is_set()) or in_flight:
+                while chunks and free_workers and not cancel.is_set():
+                    worker = free_workers.pop()
+                    chunk = chunks.pop(0)
+                    datadict_progress.advance("models_sent", len(chunk))
+                    future = executor.submit(generate_chunk, chunk, worker)
+                    in_flight[future] = worker
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    free_workers.append(in_flight.pop(future))
+                    try:
+                        future.result()
+                    except Exception as error:
+                        logging.error(f"Issues encountered running codegen: {error}")
+    finally:
+        put(None)
+
+
 def add_missing_models(yaml_obj, path, models, sort):
     if os.path.isfile(path) and os.path.exists(path):
         yaml = datadict_helpers.open_model_yml_file(yaml_obj, path)
         if yaml["status"] == "valid":
             logging.info(f"File '{path}' has been found and is a valid models file")
             updated = yaml["yaml"]
-            if len(models) > 0:
-                updated["models"] = updated["models"] + models
+            existing_count = len(updated["models"])
+            updated["models"].extend(models)
+            if len(updated["models"]) > existing_count:
                 datadict_helpers.output_model_file(yaml_obj, path, updated, sort)
             else:
                 logging.info(f"No updates to apply to '{path}'")
@@ -151,7 +354,7 @@ def add_missing_models(yaml_obj, path, models, sort):
             )
     else:
         logging.info(f"File '{path}' doesn't exist and will be created.")
-        file_yaml = {"version": 2, "models": models}
+        file_yaml = {"version": 2, "models": list(models)}
         datadict_helpers.output_model_file(yaml_obj, path, file_yaml, sort)
         
 def yaml_for_each_model(yaml_obj, model_file_list, existing_file_yamls, existing_model_list, models_to_be_added):
@@ -214,16 +417,156 @@ def yaml_for_each_model(yaml_obj, model_file_list, existing_file_yamls, existing
             
             if model['file'] is not None:
                 files_to_remove.add(model['file'])
-                logging.info(f"Model '{model['name']}' is being split into its own yaml file.")
+                datadict_report.event(
+                    "model_split",
+                    "Model '{model}' is being split into its own yaml file.",
+                    model=model["name"],
+                    file=model["expected_yml_path"],
+                )
 
         else:
-            logging.info(f"Model '{model['name']}' is correct")
+            datadict_report.event(
+                "model_correct",
+                "Model '{model}' is correct",
+                model=model["name"],
+                file=model["file"],
+            )
             
     for file in files_to_remove:
-        os.remove(file)
+        datadict_helpers.remove_file(file)
+
+
+class missing_models_file:
+    def __init__(self, yaml_obj, path) -> None:
+        """
+        Initialize a model file that models missing from existing files are appended to as they arrive.
+
+        Each model is serialized and appended to the end of the file on its own, so the models don't have to be
+        held in memory until codegen has finished. The file is only created, or an existing file rewritten with its
+        'models' key last, when the first model is added.
+
+        Parameters:
+            yaml_obj (ruamel.yaml.YAML): The YAML object to serialize the models with.
+            path (str): The path to the model file.
+
+        Returns:
+            None
+        """
+        self.yaml_obj = yaml_obj
+        self.path = path
+        self.added = 0
+        self.started = False
+        self.valid = True
+
+    def _dump_models(self, models) -> str:
+        stream = io.StringIO()
+        self.yaml_obj.dump({"models": models}, stream)
+        # The 'models' key is left out, so the items continue the list at the end of the file
+        return stream.getvalue().split("\n", 1)[1]
+
+    def _start(self) -> None:
+        self.started = True
+        if os.path.isfile(self.path):
+            loaded = datadict_helpers.open_model_yml_file(self.yaml_obj, self.path)
+            if loaded["status"] != "valid":
+                logging.error(
+                    f"File '{self.path}' has been found and but isn't a valid model file"
+                )
+                self.valid = False
+                return
+            logging.info(f"File '{self.path}' has been found and is a valid models file")
+            document = loaded["yaml"]
+            models = document.pop("models") or []
+        else:
+            logging.info(f"File '{self.path}' doesn't exist and will be created.")
+            document = {"version": 2}
+            models = []
+        content = ""
+        if document:
+            stream = io.StringIO()
+            self.yaml_obj.dump(document, stream)
+            content = stream.getvalue()
+        content += "models:\n"
+        if models:
+            content += self._dump_models(models)
+        datadict_helpers.write_file(self.path, content)
+
+    def add(self, model) -> None:
+        """
+        Append a model to the end of the file.
+
+        Parameters:
+            model (dict): The model generated by codegen.
+
+        Returns:
+            None
+        """
+        if not self.started:
+            self._start()
+        if not self.valid:
+            return
+        with phase("serialize", self.path):
+            content = self._dump_models([model])
+        datadict_helpers.append_file(self.path, content)
+        self.added += 1
+
+    def add_to(self, model, file_yaml) -> None:
+        """
+        Add a model to the loaded copy of the file, rather than appending it to the file on disk.
+
+        This is used while the file is itself waiting for the columns of its own models, as it is then written from
+        its loaded copy, which would overwrite any models appended to it.
+
+        Parameters:
+            model (dict): The model generated by codegen.
+            file_yaml (dict): The loaded copy of the file.
+
+        Returns:
+            None
+        """
+        file_yaml["models"].append(model)
+        self.added += 1
+
+    def finish(self, sort) -> None:
+        """
+        Sort the file once every model has been added, if sorting was requested, and report the models added.
+
+        Parameters:
+            sort (bool): Sort the models and their columns alphabetically, which rewrites the whole file.
+
+        Returns:
+            None
+        """
+        if not self.added:
+            logging.info("There are no models to be added.")
+            return
+        logging.info(f"There were {self.added} models added to file '{self.path}'")
+        if sort:
+            loaded = datadict_helpers.open_model_yml_file(self.yaml_obj, self.path)
+            datadict_helpers.output_model_file(
+                self.yaml_obj, self.path, loaded["yaml"], sort
+            )
+        elif self.started:
+            datadict_progress.advance("written")
+            datadict_report.event(
+                "file_written", "Updated model file '{file}'", file=self.path
+            )
 
 
-def generate_model_yamls(directory, name, unique_model_yaml, sort=True):
+def generate_model_yamls(
+    directory,
+    name,
+    unique_model_yaml,
+    sort=True,
+    state=None,
+    changed_since=None,
+    select=(),
+    exclude=(),
+    jobs=None,
+    chunk_size=None,
+    fast_yaml=False,
+    columns_from="codegen",
+):
     """
     Generate model YAML files in a given directory.
 
@@ -231,12 +574,44 @@ def generate_model_yamls(directory, name, unique_model_yaml, sort=True):
     and the model metadata is combined and written back to the existing files. For models missing from existing files,
     a new file is created and the metadata for the missing models is written to it.
 
+    The work is pipelined: codegen is run for chunks of models on several workers while the existing files are
+    parsed, and each existing file is written as soon as the columns of all of its models have arrived, so that
+    only the files still waiting for columns are held in memory. Models missing from existing files are appended to
+    the new file as they arrive, in the order codegen finishes them, and are only sorted if 'sort' is set. If the
+    new file is an existing file still waiting for the columns of its own models, they are added to its loaded copy
+    instead, and written with it.
+
     Parameters:
         directory (str): The directory where the model YAML files are located, and where new files will be created.
 
         name (str): The base name of the new YAML file to be created for models missing from existing files.
 
-        sort (bool, optional): Whether to sort the models alphabetically by their name. Default is False.
+        sort (bool, optional): Whether to sort the models alphabetically by their name. Sorting the new file reloads
+        and rewrites it once every model has been added, so the new models are only streamed to it when False.
+        Default is True.
+
+        state (str, optional): The path to a baseline manifest. When given, only models that are new or modified
+        compared with the baseline, and the models downstream of them, are generated.
+
+        changed_since (str, optional): A git reference. When given, only models whose SQL files have changed since
+        the reference, and the models downstream of them, are generated.
+
+        select (list, optional): dbt-style selectors, e.g. 'tag:finance' or 'path:models/staging+'. When given,
+        only the selected models are generated, and only the YAML files documenting them are parsed.
+
+        exclude (list, optional): dbt-style selectors for models to leave out.
+
+        jobs (int, optional): The number of codegen runs in flight at once. Defaults to the number of CPUs.
+
+        chunk_size (int, optional): The number of models in each codegen run. Defaults to spreading the models
+        over four chunks per job. The 'information_schema' backend fetches every model in a single run, so 'jobs'
+        and 'chunk_size' don't apply to it.
+
+        fast_yaml (bool, optional): Load the codegen output with the fast, non round-trip loader. Defaults to False.
+
+        columns_from (str, optional): Where to get the columns from, either 'codegen' or 'information_schema'. The
+        'information_schema' backend fetches the columns of every model in a few batched queries, and requires the
+        datadict dbt package. Defaults to 'codegen'.
 
     Returns:
         None
@@ -257,57 +632,220 @@ def generate_model_yamls(directory, name, unique_model_yaml, sort=True):
         yaml_obj.width = 200
 
         # 1. Validate dbt is configured and usable
-        if not datadict_dbt.validate_dbt():
+        if not datadict_dbt.validate_dbt(require_codegen=columns_from == "codegen"):
             return
 
-        # 2. Evaluate the existing yaml files in the directory for model metadata
-        yaml_file_list = datadict_helpers.list_directory_files(
-            directory, [".yml", ".yaml"]
-        )
-        if len(yaml_file_list) == 0:
-            SystemExit
-        existing_files = check_files_for_models(yaml_obj, yaml_file_list)
-        existing_model_list = existing_files["model_list"]
-        existing_file_yamls = existing_files["file_yamls"]
+        # 2. Select the models to generate, if a selection was given
+        selected_models = None
+        selected_yaml_files = None
+        if (
+            state is not None
+            or changed_since is not None
+            or select
+            or exclude
+            or columns_from == "information_schema"
+        ):
+            if not datadict_dbt.parse_project():
+                return
+            if changed_since is not None or (state is not None and not select):
+                selected_models = datadict_manifest.select_changed_models(
+                    state=state, changed_since=changed_since
+                )
+                if selected_models is None:
+                    return
+            if select or exclude:
+                selector_models = datadict_manifest.select_models(
+                    select=select, exclude=exclude, state=state
+                )
+                if selector_models is None:
+                    return
+                selected_models = (
+                    selector_models
+                    if selected_models is None
+                    else selected_models & selector_models
+                )
+                selected_yaml_files = {
+                    os.path.abspath(file)
+                    for file in datadict_manifest.model_yaml_files(
+                        datadict_manifest.DEFAULT_MANIFEST_PATH, selected_models
+                    )
+                }
 
-        # 3. Get the full column list for every model in the directory
+        # 3. Start generating the full column list for every selected model in the directory, in chunks
         model_file_list = datadict_helpers.list_directory_files(directory, [".sql"])
+        if selected_models is not None:
+            model_file_list = [
+                file
+                for file in model_file_list
+                if os.path.basename(file).split(".")[0] in selected_models
+            ]
+            if len(model_file_list) == 0:
+                logging.info("There are no selected models to generate.")
+                return
         model_names = [os.path.basename(file).split(".")[0] for file in model_file_list]
-        model_column_list = datadict_dbt.get_model_yaml(model_names)
-
-        # 4. Split out the models in existing files from models missing from existing files.
-        models_to_be_updated = []
-        models_to_be_added = []
-
-        for model_num, model in enumerate(model_column_list["models"]):
-            if any(
-                existing_model["name"] == model["name"]
-                for existing_model in existing_model_list
-            ):
-                models_to_be_updated.append(model_column_list["models"][model_num])
-            else:
-                models_to_be_added.append(model_column_list["models"][model_num])
+        jobs = jobs or os.cpu_count() or 1
+        if chunk_size is None:
+            chunk_size = max(1, math.ceil(len(model_names) / (jobs * 4)))
+        datadict_progress.add_total("models_generated", len(model_names))
+        codegen_queue = queue.Queue(maxsize=jobs * 4)
+        cancel_codegen = threading.Event()
+        codegen_thread = threading.Thread(
+            target=run_codegen,
+            args=(
+                model_names,
+                codegen_queue,
+                jobs,
+                chunk_size,
+                fast_yaml,
+                columns_from,
+                cancel_codegen,
+            ),
+            daemon=True,
+        )
+        codegen_thread.start()
 
-        # 5. For models in existing files, combine the column lists and write back to the existing file 
-        if len(models_to_be_updated) > 0:
-            logging.info(f"There are {len(models_to_be_updated)} models to be checked")
-            updated_existing_files(
-                yaml_obj, existing_file_yamls, models_to_be_updated, sort
+        try:
+            # 4. While codegen runs, evaluate the existing yaml files in the directory for model metadata
+            yaml_file_list = datadict_helpers.list_directory_files(
+                directory, [".yml", ".yaml"]
+            )
+            if selected_yaml_files is not None:
+                yaml_file_list = [
+                    file
+                    for file in yaml_file_list
+                    if os.path.abspath(file) in selected_yaml_files
+                ]
+            # Unless every file is needed to add models to, files are only loaded when their first model arrives
+            existing_files = check_files_for_models(
+                yaml_obj, yaml_file_list, load=unique_model_yaml
             )
+            existing_model_list = existing_files["model_list"]
+            existing_file_yamls = existing_files["file_yamls"]
+
+            # 5. As the columns of each model arrive, combine them with the models in existing files, and write each
+            # file back as soon as the columns of all its models have arrived. Models missing from existing files are
+            # written as they arrive, to their own file or appended to the file with the given name.
+            model_name_set = set(model_names)
+            file_yamls = {file["file_path"]: file["file_yaml"] for file in existing_file_yamls}
+            model_files = {}
+            pending_models = {}
+            for existing_model in existing_model_list:
+                model_files.setdefault(existing_model["name"], []).append(
+                    existing_model["file"]
+                )
+                if existing_model["name"] in model_name_set:
+                    pending_models.setdefault(existing_model["file"], set()).add(
+                        existing_model["name"]
+                    )
+            updated_counts = {}
+            models_checked = 0
+            if unique_model_yaml:
+                expected_paths = {
+                    os.path.splitext(os.path.basename(file))[0]: file.replace(".sql", ".yml")
+                    for file in model_file_list
+                }
+                models_written = []
+            else:
+                added_file = missing_models_file(yaml_obj, os.path.join(directory, name))
+                # The existing file the missing models are added to, if it is one of the files waiting for columns
+                added_path = next(
+                    (
+                        path
+                        for path in pending_models
+                        if os.path.normpath(path) == os.path.normpath(added_file.path)
+                    ),
+                    None,
+                )
+
+            def load_file(path):
+                if path not in file_yamls:
+                    file_yamls[path] = datadict_helpers.open_model_yml_file(
+                        yaml_obj, path
+                    )["yaml"]
+                return file_yamls[path]
+
+            def finish_file(path):
+                try:
+                    if updated_counts.get(path, 0) > 0:
+                        datadict_helpers.output_model_file(
+                            yaml_obj, path, file_yamls[path], sort
+                        )
+                except Exception as error:
+                    logging.error(
+                        f"There was an issue processing file '{path}'. This is likely a badly formatted YAML file. Error: {error}"
+                    )
+                if not unique_model_yaml:
+                    file_yamls.pop(path, None)
+
+            for path in [path for path in file_yamls if path not in pending_models]:
+                finish_file(path)
+
+            while True:
+                model = codegen_queue.get()
+                if model is None:
+                    break
+                datadict_progress.advance("models_generated")
+                datadict_progress.advance("columns", len(model.get("columns") or []))
+                if model["name"] not in model_files:
+                    if unique_model_yaml:
+                        path = expected_paths[model["name"]]
+                        datadict_helpers.output_model_file(
+                            yaml_obj, path, {"version": 2, "models": [model]}, sort=False
+                        )
+                        models_written.append({"name": model["name"], "file": path})
+                    elif added_path in pending_models:
+                        added_file.add_to(model, load_file(added_path))
+                        updated_counts[added_path] = updated_counts.get(added_path, 0) + 1
+                    else:
+                        added_file.add(model)
+                    continue
+                models_checked += 1
+                for path in model_files[model["name"]]:
+                    if path not in pending_models:
+                        continue
+                    try:
+                        updated_counts[path] = updated_counts.get(
+                            path, 0
+                        ) + merge_file_models(load_file(path), path, [model])
+                    except Exception as error:
+                        logging.error(
+                            f"There was an issue processing file '{path}'. This is likely a badly formatted YAML file. Error: {error}"
+                        )
+                        updated_counts[path] = 0
+                    pending_models[path].discard(model["name"])
+                    if not pending_models[path]:
+                        del pending_models[path]
+                        finish_file(path)
+        finally:
+            # If the models stop being consumed early, e.g. because a file couldn't be written, codegen is cancelled
+            # and the queue drained, so that its workers aren't left blocked on the full queue
+            cancel_codegen.set()
+            while True:
+                try:
+                    codegen_queue.get_nowait()
+                except queue.Empty:
+                    break
+            codegen_thread.join()
+
+        # Write any files with models that codegen failed to generate
+        for path in list(pending_models):
+            finish_file(path)
+
+        if models_checked > 0:
+            logging.info(f"There were {models_checked} models checked")
         else:
             logging.info("There are no models requiring updating.")
 
-        # 6. For models missing from existing files, create a new file with the given name and output the metadata
+        # 6. Split the models of existing files into their own files, or sort the file the missing models were
+        # added to
         if unique_model_yaml:
-            yaml_for_each_model(yaml_obj, model_file_list, existing_file_yamls, existing_model_list, models_to_be_added)
-        elif len(models_to_be_added) > 0:
-            file_name = os.path.join(directory, name)
-            logging.info(
-                f"There are {len(models_to_be_added)} models to be added to file '{file_name}'"
-            )
-            add_missing_models(yaml_obj, file_name, models_to_be_added, sort)
+            existing_file_yamls = [
+                {"file_path": path, "file_yaml": file_yaml}
+                for path, file_yaml in file_yamls.items()
+            ]
+            yaml_for_each_model(yaml_obj, model_file_list, existing_file_yamls, existing_model_list + models_written, [])
         else:
-            logging.info("There are no models to be added.")
+            added_file.finish(sort)
 
     except Exception as error:
         logging.error(f"There was an error generating the YAML files. Error: {error}")
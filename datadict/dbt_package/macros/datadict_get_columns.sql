@@ -0,0 +1,29 @@
+{#
+    Run the batched information_schema queries built by datadict, and print the rows returned as JSON so they can
+    be read from the output of `dbt run-operation datadict_get_columns`.
+
+    Each query has a 'database', a 'schema' and its 'sql', in which '__datadict_information_schema__' is replaced
+    with the adapter's information_schema columns relation.
+#}
+{% macro datadict_get_columns(queries) %}
+    {%- set rows = [] -%}
+    {%- for query in queries -%}
+        {%- set information_schema = adapter.dispatch('datadict_information_schema', 'dbt_datadict')(query.database, query.schema) -%}
+        {%- set results = run_query(query.sql | replace('__datadict_information_schema__', information_schema | string)) -%}
+        {%- for row in results.rows -%}
+            {%- do rows.append(row.values() | list) -%}
+        {%- endfor -%}
+    {%- endfor -%}
+    {%- do print('datadict_columns: ' ~ tojson(rows)) -%}
+{% endmacro %}
+
+
+{% macro default__datadict_information_schema(database, schema) %}
+    {{- return(api.Relation.create(database=database, schema=schema).information_schema('columns')) -}}
+{% endmacro %}
+
+
+{% macro duckdb__datadict_information_schema(database, schema) %}
+    {#- DuckDB has a single information_schema for every attached database -#}
+    {{- return('information_schema.columns') -}}
+{% endmacro %}
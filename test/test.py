@@ -1,10 +1,35 @@
+import importlib.util
+import io
+import json
 import unittest
 import os
+import queue
+import random
 import tempfile
+import unittest.mock
 import datadict
 import shutil
+import subprocess
+import sys
+import threading
+import time
 import ruamel.yaml
+from datadict import datadict_api
+from datadict import datadict_check
+from datadict import datadict_cluster
+from datadict import datadict_dbt
+from datadict import datadict_docs
+from datadict import datadict_drift
+from datadict import datadict_entry
 from datadict import datadict_helpers
+from datadict import datadict_index
+from datadict import datadict_manifest
+from datadict import datadict_profile
+from datadict import datadict_progress
+from datadict import datadict_report
+from datadict import datadict_scanner
+from datadict import datadict_server
+from datadict import datadict_watch
 from datadict import datadict_yaml
 
 
@@ -274,6 +299,23 @@ class TestDataDict(unittest.TestCase):
         self.assertEqual(updated_yaml1, expected_yaml1)
         self.assertEqual(updated_yaml2, expected_yaml2)
 
+    def test_apply_skips_files_without_models(self):
+        with open(os.path.join(self.temp_dir, "model_file.yml"), "w") as file:
+            file.write("models:\n  - name: orders\n    columns:\n      - name: id\n")
+        with open(os.path.join(self.temp_dir, "sources.yml"), "w") as file:
+            file.write("sources:\n  - name: raw\n")
+        datadict_report.start_reporting("apply", datadict_report.QUIET)
+        try:
+            self.datadict_instance.apply_data_dictionary_to_path(self.temp_dir)
+        finally:
+            summary = datadict_report.stop_reporting()
+        # The dictionary itself has no 'models' key either
+        self.assertEqual(summary["counts"]["file_checked"], 3)
+        self.assertEqual(summary["counts"]["file_prefiltered"], 2)
+        self.assertEqual(
+            [field["name"] for field in self.datadict_instance.existing_fields], ["id"]
+        )
+
     def test_collate_output_dictionary(self):
         # Test loading missing fields with existing fields
         self.datadict_instance.existing_fields = [
@@ -299,225 +341,972 @@ class TestDataDict(unittest.TestCase):
 
         self.assertEqual(new_dict["dictionary"], expected_missing_fields)
 
+    def test_apply_data_dictionary_to_stream(self):
+        with open(self.dictionary_file, "w") as file:
+            file.write(
+                "dictionary:\n  - name: id\n    description: The identifier\n    aliases: []\n"
+            )
+        with open(self.dictionary_file) as file:
+            dictionary_content = file.read()
+        instance = datadict.datadict(self.dictionary_file, read_only=True)
 
-class TestHelpers(unittest.TestCase):
-    def setUp(self):
-        # Create a temporary directory to store the test files
-        self.temp_dir = tempfile.mkdtemp()
-        self.yaml_obj = ruamel.yaml.YAML()
+        model = "version: 2\nmodels:\n  - name: orders  # The orders\n    columns:\n      - name: id\n      - name: other\n"
+        output = io.StringIO()
+        self.assertTrue(
+            instance.apply_data_dictionary_to_stream(io.StringIO(model), output)
+        )
+        self.assertEqual(
+            output.getvalue(),
+            "version: 2\nmodels:\n  - name: orders  # The orders\n    columns:\n      - name: id\n"
+            "        description: The identifier\n      - name: other\n",
+        )
 
-    def tearDown(self):
-        # Remove the temporary directory and its contents after the test
-        shutil.rmtree(self.temp_dir)
+        # Documents that aren't updated, or don't contain models, are written back exactly as they were read
+        for document in (output.getvalue(), "version: 2\nsources: []\n", "- a list\n"):
+            output = io.StringIO()
+            self.assertFalse(
+                instance.apply_data_dictionary_to_stream(io.StringIO(document), output)
+            )
+            self.assertEqual(output.getvalue(), document)
 
-    def test_open_model_yml_file(self):
-        # Test opening a valid model YAML file
-        model_yaml_file = os.path.join(self.temp_dir, "model_file.yml")
-        model_yaml = {
-            "models": [
-                {
-                    "name": "test_model",
-                    "columns": [{"name": "field1", "description": "old_desc"}],
-                }
-            ]
+        # Neither the dictionary nor any other file is written
+        instance.collate_output_dictionary()
+        with open(self.dictionary_file) as file:
+            self.assertEqual(file.read(), dictionary_content)
+        self.assertEqual(os.listdir(self.temp_dir), ["test_dictionary.yml"])
+
+        missing = datadict.datadict(
+            os.path.join(self.temp_dir, "missing.yml"), read_only=True
+        )
+        self.assertEqual(missing.dictionary_entries, [])
+        self.assertFalse(os.path.exists(missing.dictionary_path))
+
+
+class TestDictionaryEntry(unittest.TestCase):
+    def test_round_trip(self):
+        item = {
+            "name": "customer_id",
+            "description": "Unique customer",
+            "aliases": ["cust_id"],
+            "models": ["orders"],
+            "tags": ["pii"],
         }
-        with open(model_yaml_file, "w") as file:
-            self.yaml_obj.dump(model_yaml, file)
-        result = datadict_helpers.open_model_yml_file(self.yaml_obj, model_yaml_file)
-        self.assertTrue(result["status"] == "valid")
-        self.assertIsInstance(result["yaml"], dict)
+        entry = datadict_entry.DictionaryEntry.from_yaml(item)
+        self.assertEqual(entry.names, ("customer_id", "cust_id"))
+        self.assertEqual(entry.to_yaml(), item)
+        self.assertFalse(hasattr(entry, "__dict__"))
+        self.assertIs(entry.name, sys.intern("customer_id"))
 
-        # Test opening an invalid model YAML file
-        invalid_model_yaml_file = os.path.join(self.temp_dir, "invalid_model_file.yml")
-        with open(invalid_model_yaml_file, "w") as file:
-            file.write("invalid_data:\n")
-        result = datadict_helpers.open_model_yml_file(
-            self.yaml_obj, invalid_model_yaml_file
+        entry = datadict_entry.DictionaryEntry.from_yaml(
+            {"name": "amount", "description": None}
         )
-        self.assertTrue(result["status"] == "invalid")
-        self.assertIsNone(result["yaml"])
+        self.assertEqual(entry.to_yaml(), {"name": "amount", "description": ""})
 
-    def test_check_valid_model_file(self):
-        # Test checking a valid model YAML data
-        valid_model_yaml = {
-            "models": [
+    def test_build_matcher(self):
+        entries = datadict_entry.load_entries(
+            [
+                {"name": "customer_id", "aliases": ["cust_id", "customer_id"]},
+                {"name": "cust_id"},
+            ]
+        )
+        matches = datadict_entry.build_matcher(entries)
+        self.assertEqual(matches["customer_id"], (entries[0],))
+        self.assertEqual(matches["cust_id"], (entries[0], entries[1]))
+        self.assertNotIn("amount", matches)
+
+    def test_collate_entries_keeps_aliases(self):
+        entries = datadict_entry.load_entries(
+            [{"name": "customer_id", "description": "Old", "aliases": ["cust_id"]}]
+        )
+        existing_fields = [
+            {"name": "customer_id", "model": "payments", "description": "Unique"},
+            {"name": "customer_id", "model": "orders", "description": "Unique"},
+            {"name": "cust_id", "model": "orders"},
+        ]
+        collated = datadict_entry.collate_entries(existing_fields, entries)
+        self.assertEqual(
+            datadict_entry.entries_to_yaml(collated),
+            [
+                {"name": "cust_id", "description": "", "models": ["orders"]},
                 {
-                    "name": "model1",
-                    "columns": [{"name": "column1", "description": "desc1"}],
+                    "name": "customer_id",
+                    "description": "Unique",
+                    "aliases": ["cust_id"],
+                    "models": ["orders", "payments"],
+                },
+            ],
+        )
+
+    def test_dictionary_written_from_entries(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        dictionary_file = os.path.join(temp_dir, "dictionary.yml")
+        with open(dictionary_file, "w") as file:
+            file.write(
+                "# The project dictionary\n"
+                "dictionary:\n"
+                "  - name: customer_id\n"
+                "    description: Unique customer\n"
+                "    aliases:\n"
+                "      - cust_id\n"
+                "    tags: [pii]\n"
+                "    meta:\n"
+                "      owner: sales\n"
+            )
+        instance = datadict.datadict(dictionary_file)
+        self.assertEqual(instance.dictionary_items, ["customer_id", "cust_id"])
+        self.assertEqual(
+            instance.build_lookup_index(), {"customer_id": 0, "cust_id": 0}
+        )
+
+        model_yaml = {"models": [{"name": "orders", "columns": [{"name": "cust_id"}]}]}
+        updates = instance._iterate_dictionary_update(model_yaml, "orders.yml")
+        self.assertTrue(updates["updated"])
+        self.assertEqual(
+            model_yaml["models"][0]["columns"][0],
+            {"name": "cust_id", "description": "Unique customer"},
+        )
+        self.assertEqual(instance.dictionary_entries[0].models, ["orders"])
+
+        instance.existing_fields = [
+            {"name": "customer_id", "model": "orders", "description": "Unique customer"}
+        ]
+        instance.collate_output_dictionary()
+        with open(dictionary_file) as file:
+            written = file.read()
+        self.assertTrue(written.startswith("# The project dictionary\n"))
+        self.assertEqual(
+            instance.yaml.load(written)["dictionary"],
+            [
+                {
+                    "name": "customer_id",
+                    "description": "Unique customer",
+                    "aliases": ["cust_id"],
+                    "models": ["orders"],
+                    # Other keys of the entry are written back unchanged
+                    "tags": ["pii"],
+                    "meta": {"owner": "sales"},
                 }
+            ],
+        )
+
+    def test_build_layered_matcher(self):
+        company = datadict_entry.load_entries(
+            [
+                {
+                    "name": "customer_id",
+                    "description": "Company",
+                    "aliases": ["cust_id"],
+                },
+                {"name": "amount", "description": "Company", "aliases": ["amt"]},
             ]
-        }
-        result = datadict_helpers.check_valid_model_file(valid_model_yaml)
-        self.assertTrue(result)
+        )
+        domain = datadict_entry.load_entries(
+            [
+                {"name": "amount", "description": "Domain"},
+                {"name": "client_id", "aliases": ["cust_id"]},
+            ]
+        )
+        matches = datadict_entry.build_layered_matcher([company, domain])
+        self.assertEqual(matches["customer_id"], (company[0],))
+        # A later layer overrides an entry with the same name, aliases included
+        self.assertEqual(matches["amount"], (domain[0],))
+        self.assertNotIn("amt", matches)
+        # A name matched in several layers is taken from the last
+        self.assertEqual(matches["cust_id"], (domain[1],))
+        self.assertEqual(
+            datadict_entry.build_layered_matcher([company]),
+            datadict_entry.build_matcher(company),
+        )
 
-        # Test checking an invalid model YAML data
-        invalid_model_yaml = {"invalid_data": "data"}
-        result = datadict_helpers.check_valid_model_file(invalid_model_yaml)
-        self.assertFalse(result)
+    def test_layered_dictionary(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        company_file = os.path.join(temp_dir, "company.yml")
+        domain_file = os.path.join(temp_dir, "domain.yml")
+        with open(company_file, "w") as file:
+            file.write(
+                "dictionary:\n"
+                "  - name: customer_id\n    description: Unique customer\n"
+                "  - name: amount\n    description: Amount in cents\n"
+            )
+        with open(domain_file, "w") as file:
+            file.write(
+                "dictionary:\n  - name: amount\n    description: Amount in dollars\n"
+            )
+        instance = datadict.datadict([company_file, domain_file])
+        self.assertEqual(instance.dictionary_path, domain_file)
 
-    def test_output_model_file(self):
-        # Prepare test data
         model_yaml = {
             "models": [
                 {
-                    "name": "test_model",
-                    "description": "Test Model",
+                    "name": "orders",
                     "columns": [
-                        {"name": "col1", "description": "Column 1"},
-                        {"name": "col2", "description": "Column 2"},
+                        {"name": "customer_id"},
+                        {"name": "amount"},
+                        {"name": "status"},
                     ],
                 }
             ]
         }
-        test_file_path = "test_output_model.yaml"
-        try:
-            datadict_helpers.output_model_file(
-                self.yaml_obj, test_file_path, model_yaml, False
+        instance._iterate_dictionary_update(model_yaml, "orders.yml")
+        self.assertEqual(
+            [
+                column.get("description")
+                for column in model_yaml["models"][0]["columns"]
+            ],
+            ["Unique customer", "Amount in dollars", None],
+        )
+
+        # Only the columns that aren't matched by another layer are collated into the output layer
+        instance.collate_output_dictionary()
+        with open(domain_file) as file:
+            self.assertEqual(
+                [entry["name"] for entry in instance.yaml.load(file)["dictionary"]],
+                ["amount", "status"],
             )
-            self.assertTrue(os.path.exists(test_file_path))
-            with open(test_file_path, "r") as f:
-                loaded_yaml = self.yaml_obj.load(f)
-            self.assertEqual(loaded_yaml, model_yaml)
 
-        finally:
-            if os.path.exists(test_file_path):
-                os.remove(test_file_path)
+        # The company layer keeps its entry overridden by the domain layer when it is the output layer, and 'status'
+        # is now matched by the domain layer
+        instance = datadict.datadict(
+            [company_file, domain_file], output_layer=company_file
+        )
+        instance._iterate_dictionary_update(model_yaml, "orders.yml")
+        instance.collate_output_dictionary()
+        with open(company_file) as file:
+            self.assertEqual(
+                instance.yaml.load(file)["dictionary"],
+                [
+                    {"name": "amount", "description": "Amount in cents"},
+                    {
+                        "name": "customer_id",
+                        "description": "Unique customer",
+                        "models": ["orders"],
+                    },
+                ],
+            )
 
-    def test_list_directory_files(self):
-        extensions = [".yml", ".yaml"]
-        yaml_files = [
-            "file1.yaml",
-            "file2.yml",
-            "subdir/file3.yaml",
-            "subdir/file4.yml",
-            "subdir/subsubdir/file5.yaml",
-            "subdir/subsubdir/file6.yml",
-            "non_yaml_file.txt",
-        ]
-        for file in yaml_files:
-            file_path = os.path.join(self.temp_dir, file)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, "w") as f:
-                f.write("Sample YAML content")
-        # Call the function to get the list of YAML files in the temporary directory
-        yaml_files_list = datadict_helpers.list_directory_files(
-            self.temp_dir, extensions
+        with self.assertRaises(ValueError):
+            datadict.datadict([company_file], output_layer=domain_file)
+
+    def test_pattern_aliases(self):
+        entries = datadict_entry.load_entries(
+            [
+                {"name": "customer_id", "aliases": ["cust_id", "*_customer_id"]},
+                {"name": "loaded_at", "aliases": ["^src_.*_at$", "etl_*"]},
+                {"name": "code", "aliases": ["*_c?de", "[xy]_code"]},
+                {"name": "order_customer_id"},
+            ]
         )
+        self.assertEqual(datadict_entry.pattern_kind("*_customer_id"), "glob")
+        self.assertEqual(datadict_entry.pattern_kind("^src_.*_at$"), "regex")
+        self.assertIsNone(datadict_entry.pattern_kind("cust_id"))
+        # Pattern aliases aren't exact names
+        self.assertNotIn("*_customer_id", datadict_entry.build_matcher(entries))
 
-        # Assert that the function returns the correct list of YAML files
-        expected_yaml_files = [
-            os.path.join(self.temp_dir, "file1.yaml"),
-            os.path.join(self.temp_dir, "file2.yml"),
-            os.path.join(self.temp_dir, "subdir/file3.yaml"),
-            os.path.join(self.temp_dir, "subdir/file4.yml"),
-            os.path.join(self.temp_dir, "subdir/subsubdir/file5.yaml"),
-            os.path.join(self.temp_dir, "subdir/subsubdir/file6.yml"),
-        ]
-        self.assertCountEqual(yaml_files_list, expected_yaml_files)
+        matcher = datadict_entry.compile_matcher([entries])
+        self.assertEqual(matcher.match("cust_id"), (entries[0],))
+        self.assertEqual(matcher.match("billing_customer_id"), (entries[0],))
+        # An exact name takes precedence over a pattern
+        self.assertEqual(matcher.match("order_customer_id"), (entries[3],))
+        self.assertEqual(matcher.match("src_orders_loaded_at"), (entries[1],))
+        self.assertEqual(matcher.match("etl_batch"), (entries[1],))
+        self.assertEqual(matcher.match("country_cade"), (entries[2],))
+        self.assertEqual(matcher.match("x_code"), (entries[2],))
+        self.assertEqual(matcher.match("src_orders"), ())
+        # The first pattern in dictionary order wins
+        self.assertEqual(matcher.match("etl_customer_id"), (entries[0],))
+        self.assertIs(
+            matcher.match("etl_customer_id"), matcher.match("etl_customer_id")
+        )
 
-    def test_sort_model_file(self):
-        # Input dictionary with unsorted models and columns
-        input_dict = {
-            "version": 2,
+        # Patterns of a later layer take precedence
+        domain = datadict_entry.load_entries(
+            [{"name": "batch_id", "aliases": ["etl_*"]}]
+        )
+        matcher = datadict_entry.compile_matcher([entries, domain])
+        self.assertEqual(matcher.match("etl_customer_id"), (domain[0],))
+
+        with self.assertRaises(ValueError):
+            datadict_entry.compile_matcher(
+                [
+                    datadict_entry.load_entries(
+                        [{"name": "a", "aliases": ["^(unclosed$"]}]
+                    )
+                ]
+            )
+
+    def test_pattern_aliases_with_groups(self):
+        # Each of these is valid on its own, but not once combined with the others
+        entries = datadict_entry.load_entries(
+            [
+                {"name": "first", "aliases": ["^(?P<x>a+)_first$"]},
+                {"name": "second", "aliases": ["^(?P<x>b+)_second$"]},
+                {"name": "repeated", "aliases": [r"^(\w)\1_x$"]},
+                {"name": "flagged", "aliases": ["(?i)^flag_.*$"]},
+                {"name": "plain", "aliases": ["^.*_plain$"]},
+            ]
+        )
+        matcher = datadict_entry.compile_matcher([entries])
+        self.assertEqual(matcher.match("aa_first"), (entries[0],))
+        self.assertEqual(matcher.match("bb_second"), (entries[1],))
+        self.assertEqual(matcher.match("zz_x"), (entries[2],))
+        self.assertEqual(matcher.match("zy_x"), ())
+        self.assertEqual(matcher.match("FLAG_X"), (entries[3],))
+        self.assertEqual(matcher.match("a_plain"), (entries[4],))
+
+    def test_normalized_pattern_aliases(self):
+        entries = datadict_entry.load_entries(
+            [
+                {"name": "customer_id", "aliases": ["*_Customer_ID"]},
+                {"name": "order_id", "aliases": ["Order_*_ID", "*OrderKey"]},
+                {"name": "loaded_at", "aliases": ["^ETL_.*_At$"]},
+            ]
+        )
+        matcher = datadict_entry.compile_matcher(
+            [entries], datadict_entry.build_normalizer(["casefold"])
+        )
+        self.assertEqual(matcher.match("ORDER_CUSTOMER_ID"), (entries[0],))
+        self.assertEqual(matcher.match("x_Customer_ID"), (entries[0],))
+        self.assertEqual(matcher.match("order_line_id"), (entries[1],))
+        self.assertEqual(matcher.match("etl_orders_at"), (entries[2],))
+        # The literal text of globs is normalized with the names
+        matcher = datadict_entry.compile_matcher(
+            [entries], datadict_entry.build_normalizer(["snake_case"])
+        )
+        self.assertEqual(matcher.match("SalesOrderKey"), (entries[1],))
+        self.assertEqual(matcher.match("Billing_CustomerID"), (entries[0],))
+
+    def test_pattern_aliases_applied(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        dictionary_file = os.path.join(temp_dir, "dictionary.yml")
+        with open(dictionary_file, "w") as file:
+            file.write(
+                "dictionary:\n"
+                "  - name: loaded_at\n    description: When the row was loaded\n"
+                "    aliases:\n      - '^_?etl_.*_at$'\n"
+            )
+        instance = datadict.datadict(dictionary_file)
+        model_yaml = {
             "models": [
                 {
-                    "name": "dmn_clients",
-                    "columns": [
-                        {"name": "updated_at", "description": ""},
-                        {
-                            "name": "client_uuid",
-                            "description": "Unique identifier for the client",
-                            "tests": ["unique", "not_null"],
-                        },
-                        {
-                            "name": "name",
-                            "description": "Name of the client",
-                            "tests": ["not_null"],
-                        },
-                        {
-                            "name": "code",
-                            "description": "Code used to uniquely identify the client",
-                            "tests": ["not_null"],
-                        },
-                        {
-                            "name": "board_name",
-                            "description": "Name of the board in monday.com",
-                        },
-                        {
-                            "name": "status",
-                            "description": "Status of the client",
-                            "tests": ["not_null"],
-                        },
-                    ],
+                    "name": "orders",
+                    "columns": [{"name": "_etl_loaded_at"}, {"name": "id"}],
+                }
+            ]
+        }
+        instance._iterate_dictionary_update(model_yaml, "orders.yml")
+        self.assertEqual(
+            model_yaml["models"][0]["columns"][0]["description"],
+            "When the row was loaded",
+        )
+        self.assertEqual(instance.dictionary_entries[0].models, ["orders"])
+
+        report = datadict_check.check_dictionary(
+            [
+                {
+                    "name": "loaded_at",
+                    "description": "Loaded",
+                    "aliases": ["*_loaded_at"],
+                }
+            ],
+            {"orders.yml": [{"name": "etl_loaded_at", "model": "orders"}]},
+        )
+        self.assertEqual(report["missing_from_dictionary"], [])
+        self.assertEqual(len(report["drifted_descriptions"]), 1)
+
+    def test_build_normalizer(self):
+        self.assertIsNone(datadict_entry.build_normalizer([]))
+        normalize = datadict_entry.build_normalizer(
+            ["casefold", "strip_quotes", "snake_case"]
+        )
+        for name in [
+            '"CustomerID"',
+            "customer_id",
+            "CUSTOMER_ID",
+            "customerId",
+            "[Customer ID]",
+            "`customer-id`",
+        ]:
+            self.assertEqual(normalize(name), "customer_id")
+        self.assertEqual(normalize("HTTPResponseCode"), "http_response_code")
+        self.assertEqual(datadict_entry.build_normalizer(["casefold"])('"ID"'), '"id"')
+        self.assertIs(normalize("CustomerID"), normalize("CustomerID"))
+        with self.assertRaises(ValueError):
+            datadict_entry.build_normalizer(["upper"])
+
+    def test_normalized_matching_and_collation(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        dictionary_file = os.path.join(temp_dir, "dictionary.yml")
+        with open(dictionary_file, "w") as file:
+            file.write(
+                "normalize:\n  - strip_quotes\n  - snake_case\n"
+                "dictionary:\n"
+                "  - name: customer_id\n    description: Unique customer\n"
+                "    aliases:\n      - '*_customer_id'\n"
+            )
+        instance = datadict.datadict(dictionary_file)
+        model_yaml = {
+            "models": [
+                {
+                    "name": "orders",
+                    "columns": [{"name": '"CustomerID"'}, {"name": "OrderTotal"}],
                 },
                 {
-                    "name": "dmn_stories",
-                    "columns": [
-                        {"name": "valid_from", "description": ""},
-                        {"name": "story_id", "description": ""},
-                        {"name": "name", "description": ""},
-                        {"name": "client_uuid", "description": ""},
-                        {"name": "client_name", "description": ""},
-                    ],
+                    "name": "payments",
+                    "columns": [{"name": "CUSTOMER_ID"}, {"name": "BillingCustomerId"}],
                 },
-            ],
+                {
+                    "name": "refunds",
+                    "columns": [{"name": "order_total", "description": "Total"}],
+                },
+            ]
         }
+        instance._iterate_dictionary_update(model_yaml, "models.yml")
+        self.assertEqual(
+            [
+                column.get("description")
+                for model in model_yaml["models"][:2]
+                for column in model["columns"]
+            ],
+            ["Unique customer", None, "Unique customer", "Unique customer"],
+        )
 
-        # Expected output dictionary with sorted models and columns
-        expected_output = {
-            "version": 2,
-            "models": [
+        # Names that are the same once normalized are collated into one entry
+        instance.collate_output_dictionary()
+        with open(dictionary_file) as file:
+            written = instance.yaml.load(file)
+        self.assertEqual(written["normalize"], ["strip_quotes", "snake_case"])
+        self.assertEqual(
+            [(entry["name"], entry["models"]) for entry in written["dictionary"]],
+            [
+                ("billing_customer_id", ["payments"]),
+                ("customer_id", ["orders", "payments"]),
+                ("order_total", ["orders", "refunds"]),
+            ],
+        )
+
+        report = datadict_check.check_dictionary(
+            [
                 {
-                    "name": "dmn_clients",
-                    "columns": [
-                        {
-                            "name": "board_name",
-                            "description": "Name of the board in monday.com",
-                        },
-                        {
-                            "name": "client_uuid",
-                            "description": "Unique identifier for the client",
-                            "tests": ["unique", "not_null"],
-                        },
-                        {
-                            "name": "code",
-                            "description": "Code used to uniquely identify the client",
-                            "tests": ["not_null"],
-                        },
-                        {
-                            "name": "name",
-                            "description": "Name of the client",
-                            "tests": ["not_null"],
-                        },
-                        {
-                            "name": "status",
-                            "description": "Status of the client",
-                            "tests": ["not_null"],
-                        },
-                        {"name": "updated_at", "description": ""},
+                    "name": "customer_id",
+                    "description": "Unique customer",
+                    "aliases": [],
+                    "models": ["orders"],
+                }
+            ],
+            {
+                "orders.yml": [
+                    {
+                        "name": "CustomerID",
+                        "model": "orders",
+                        "description": "Unique customer",
+                    }
+                ]
+            },
+            datadict_entry.build_normalizer(["snake_case"]),
+        )
+        self.assertEqual(report["missing_from_dictionary"], [])
+        self.assertEqual(report["models_changed"], [])
+
+
+class TestCluster(unittest.TestCase):
+    def test_normalize_text(self):
+        self.assertEqual(
+            datadict_cluster.normalize_text("  The customer's ID.\n"),
+            "the customer s id",
+        )
+
+    def test_cluster_descriptions(self):
+        descriptions = [
+            "Unique identifier of the customer",
+            "Unique identifier of the customer.",
+            "unique identifier of the  customer",
+            "Date the order was placed",
+            "Total amount of the order, including tax",
+        ]
+        clusters = datadict_cluster.cluster_descriptions(descriptions)
+        self.assertEqual(
+            [sorted(cluster) for cluster in clusters], [sorted(descriptions[:3])]
+        )
+        # With a threshold of 1, only descriptions with the same normalized text are clustered
+        clusters = datadict_cluster.cluster_descriptions(descriptions, threshold=1)
+        self.assertEqual(
+            [sorted(cluster) for cluster in clusters], [sorted(descriptions[:3])]
+        )
+
+    def test_cluster_many_descriptions(self):
+        generator = random.Random(0)
+        descriptions = [
+            " ".join(
+                "".join(generator.choices("abcdefghijklmnopqrstuvwxyz", k=6))
+                for _ in range(6)
+            )
+            for _ in range(2000)
+        ]
+        # Every hundredth description has a near-duplicate that only differs in its punctuation and last letter
+        near_duplicates = [
+            f"{description[:-1]}s." for description in descriptions[::100]
+        ]
+        clusters = datadict_cluster.cluster_descriptions(descriptions + near_duplicates)
+        self.assertEqual(len(clusters), len(near_duplicates))
+        self.assertTrue(all(len(cluster) == 2 for cluster in clusters))
+
+    def test_cluster_templated_descriptions(self):
+        # Templated descriptions share most bands, so each bucket holds most of them
+        descriptions = [f"Column number {i} of the table" for i in range(2000)]
+        descriptions += [
+            "Unique identifier of the customer",
+            "Unique identifier of the customers.",
+        ]
+        with unittest.mock.patch.object(
+            datadict_cluster, "_similarity", wraps=datadict_cluster._similarity
+        ) as similarity:
+            clusters = datadict_cluster.cluster_descriptions(descriptions)
+        bands = datadict_cluster.SIGNATURE_BINS // datadict_cluster.BAND_BINS
+        self.assertLessEqual(
+            similarity.call_count,
+            len(descriptions) * bands * datadict_cluster.MAX_BUCKET_LEADERS,
+        )
+        self.assertIn(
+            sorted(descriptions[-2:]), [sorted(cluster) for cluster in clusters]
+        )
+
+    def test_canonical_descriptions(self):
+        canonical = datadict_cluster.canonical_descriptions(
+            {"Customer id": 3, "Customer ID.": 1, "customer id": 3, "Order date": 1}
+        )
+        self.assertEqual(
+            canonical,
+            {
+                "Customer id": "Customer id",
+                "Customer ID.": "Customer id",
+                "customer id": "Customer id",
+            },
+        )
+
+    def test_similarity_threshold(self):
+        self.assertIsNone(datadict_cluster.similarity_threshold(None))
+        self.assertEqual(datadict_cluster.similarity_threshold(1), 1.0)
+        for value in (0, 1.5, "high", True):
+            with self.assertRaises(ValueError):
+                datadict_cluster.similarity_threshold(value)
+
+    def test_collate_near_duplicates(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        dictionary_file = os.path.join(temp_dir, "dictionary.yml")
+        with open(dictionary_file, "w") as file:
+            file.write("description_similarity: 0.7\ndictionary: []\n")
+        instance = datadict.datadict(dictionary_file)
+        fields = [
+            {
+                "name": "customer_id",
+                "model": "orders",
+                "description": "Unique identifier of the customer",
+            },
+            {
+                "name": "customer_id",
+                "model": "payments",
+                "description": "Unique identifier of the customer.",
+            },
+            {
+                "name": "customer_id",
+                "model": "refunds",
+                "description": "Unique identifier of the customer",
+            },
+            {"name": "status", "model": "orders", "description": "Status of the order"},
+            {
+                "name": "status",
+                "model": "refunds",
+                "description": "Reason the refund was issued",
+            },
+            {
+                "name": "status",
+                "model": "payments",
+                "description": "Status of the order.",
+            },
+        ]
+        instance.existing_fields = fields
+        instance.collate_output_dictionary()
+        with open(dictionary_file) as file:
+            written = instance.yaml.load(file)
+        self.assertEqual(written["description_similarity"], 0.7)
+        entries = {entry["name"]: entry for entry in written["dictionary"]}
+        # Near-duplicates collapse to the canonical description, and only distinct descriptions are kept as versions
+        self.assertEqual(
+            entries["customer_id"]["description"], "Unique identifier of the customer"
+        )
+        self.assertNotIn("description_versions", entries["customer_id"])
+        self.assertEqual(
+            entries["status"]["description_versions"],
+            ["Reason the refund was issued", "Status of the order."],
+        )
+
+        report = datadict_check.check_dictionary(
+            [],
+            {"models.yml": fields},
+            similarity=0.7,
+        )
+        self.assertEqual(
+            report["description_conflicts"],
+            [
+                {
+                    "name": "status",
+                    "description_versions": [
+                        "Reason the refund was issued",
+                        "Status of the order.",
                     ],
+                }
+            ],
+        )
+
+    def test_columns_clustered_separately(self):
+        fields = (
+            [
+                {
+                    "name": "order_id",
+                    "model": "orders",
+                    "description": "The unique identifier of an order",
                 },
                 {
-                    "name": "dmn_stories",
-                    "columns": [
-                        {"name": "client_name", "description": ""},
-                        {"name": "client_uuid", "description": ""},
-                        {"name": "name", "description": ""},
-                        {"name": "story_id", "description": ""},
-                        {"name": "valid_from", "description": ""},
-                    ],
+                    "name": "order_id",
+                    "model": "payments",
+                    "description": "The unique identifier of an order.",
                 },
-            ],
+            ]
+            + [
+                {
+                    "name": "order_item_id",
+                    "model": model,
+                    "description": "The unique identifier of an order item!!",
+                }
+                for model in ["items", "returns", "shipments"]
+            ]
+            + [
+                {
+                    "name": "order_item_id",
+                    "model": "refunds",
+                    "description": "The unique identifier of an order item",
+                }
+            ]
+        )
+        # A column is never given a description that only another column uses
+        entries = {
+            entry.name: entry
+            for entry in datadict_entry.collate_entries(fields, similarity=0.8)
         }
+        self.assertEqual(
+            entries["order_id"].description, "The unique identifier of an order."
+        )
+        self.assertEqual(
+            entries["order_item_id"].description,
+            "The unique identifier of an order item!!",
+        )
+        report = datadict_check.check_dictionary(
+            [], {"models.yml": fields}, similarity=0.8
+        )
+        self.assertEqual(report["description_conflicts"], [])
 
-        # Call the function to sort the model file
-        sorted_output = datadict_helpers.sort_model_file(input_dict)
 
-        # Compare the actual output with the expected output
-        self.assertEqual(sorted_output, expected_output)
+class TestDocs(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.docs_file = os.path.join(self.temp_dir, "docs.md")
+        with open(self.docs_file, "w") as file:
+            file.write(
+                "# Customers\n"
+                "{% docs customer_id %}\nUnique identifier of the customer\n{% enddocs %}\n"
+                "{%- docs order_date -%}Date the order was placed{%- enddocs -%}\n"
+            )
 
+    def tearDown(self):
+        datadict_docs._indexes.clear()
+        shutil.rmtree(self.temp_dir)
 
-class TestYaml(unittest.TestCase):
+    def test_parse_docs_blocks(self):
+        with open(self.docs_file) as file:
+            blocks = datadict_docs.parse_docs_blocks(file.read())
+        self.assertEqual(
+            blocks,
+            {
+                "customer_id": "Unique identifier of the customer",
+                "order_date": "Date the order was placed",
+            },
+        )
+
+    def test_resolve_description(self):
+        blocks = {"customer_id": "Unique identifier of the customer"}
+        self.assertEqual(
+            datadict_docs.resolve_description("{{ doc('customer_id') }}", blocks),
+            "Unique identifier of the customer",
+        )
+        self.assertEqual(
+            datadict_docs.resolve_description(
+                '{{doc("project", "customer_id")}} ', blocks
+            ),
+            "Unique identifier of the customer",
+        )
+        self.assertEqual(
+            datadict_docs.resolve_description("{{ doc('unknown') }}", blocks),
+            "{{ doc('unknown') }}",
+        )
+
+    def test_docs_index_is_cached_by_mtime(self):
+        other_file = os.path.join(self.temp_dir, "other.md")
+        with open(other_file, "w") as file:
+            file.write("{% docs status %}Status{% enddocs %}")
+        index = datadict_docs.docs_index(self.temp_dir)
+        self.assertEqual(
+            sorted(index["blocks"]), ["customer_id", "order_date", "status"]
+        )
+
+        # Only the files that changed are read again
+        with open(other_file, "w") as file:
+            file.write("{% docs status %}Status of the order{% enddocs %}")
+        os.utime(other_file, ns=(0, 0))
+        with unittest.mock.patch.object(
+            datadict_docs, "_read_docs_file", wraps=datadict_docs._read_docs_file
+        ) as read_docs_file:
+            index = datadict_docs.docs_index(self.temp_dir)
+            datadict_docs.docs_index(self.temp_dir)
+        read_docs_file.assert_called_once_with(other_file)
+        self.assertEqual(index["blocks"]["status"], "Status of the order")
+
+        os.remove(other_file)
+        self.assertNotIn("status", datadict_docs.docs_index(self.temp_dir)["blocks"])
+
+    def test_collate_doc_references(self):
+        dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        instance = datadict.datadict(dictionary_file, docs_directory=self.temp_dir)
+        fields = [
+            {
+                "name": "customer_id",
+                "model": "orders",
+                "description": "Unique identifier of the customer",
+            },
+            {
+                "name": "customer_id",
+                "model": "payments",
+                "description": "{{ doc('customer_id') }}",
+            },
+            {
+                "name": "order_date",
+                "model": "orders",
+                "description": "{{ doc('order_date') }}",
+            },
+            {
+                "name": "order_date",
+                "model": "refunds",
+                "description": "Date the refund was issued",
+            },
+        ]
+        instance.existing_fields = fields
+        instance.collate_output_dictionary()
+        with open(dictionary_file) as file:
+            written = instance.yaml.load(file)
+        entries = {entry["name"]: entry for entry in written["dictionary"]}
+        # A literal description agreeing with a docs block is collated into the reference
+        self.assertEqual(
+            entries["customer_id"]["description"], "{{ doc('customer_id') }}"
+        )
+        self.assertNotIn("description_versions", entries["customer_id"])
+        self.assertEqual(
+            entries["order_date"]["description_versions"],
+            ["Date the refund was issued", "{{ doc('order_date') }}"],
+        )
+
+        report = datadict_check.check_dictionary(
+            [
+                {
+                    "name": "customer_id",
+                    "description": "{{ doc('customer_id') }}",
+                    "aliases": [],
+                }
+            ],
+            {"models.yml": fields},
+            resolve=datadict_docs.build_resolver(self.temp_dir),
+        )
+        # 'apply' rewrites the literal description to the reference, so it is drift
+        self.assertEqual(
+            [
+                (drift["model"], drift["actual"])
+                for drift in report["drifted_descriptions"]
+            ],
+            [("orders", "Unique identifier of the customer")],
+        )
+        self.assertEqual(
+            [conflict["name"] for conflict in report["description_conflicts"]],
+            ["order_date"],
+        )
+
+    def test_check_agrees_with_apply(self):
+        models_dir = os.path.join(self.temp_dir, "models")
+        os.makedirs(models_dir)
+        shutil.move(self.docs_file, os.path.join(models_dir, "docs.md"))
+        dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        with open(dictionary_file, "w") as file:
+            file.write(
+                "dictionary:\n  - name: customer_id\n    description: \"{{ doc('customer_id') }}\"\n"
+                "    aliases: []\n    models:\n      - orders\n"
+            )
+        model_file = os.path.join(models_dir, "m.yml")
+        with open(model_file, "w") as file:
+            file.write(
+                "version: 2\nmodels:\n  - name: orders\n    columns:\n"
+                "      - name: customer_id\n        description: Unique identifier of the customer\n"
+            )
+
+        # 'check' reports drift exactly when 'apply' changes the file: first the literal description is rewritten to
+        # the reference, then the tree is clean
+        results = []
+        for _ in range(2):
+            report = datadict_check.run_check(dictionary_file, models_dir, 1)
+            with open(model_file) as file:
+                before = file.read()
+            instance = datadict.datadict(dictionary_file, read_only=True)
+            instance.apply_data_dictionary_to_path(models_dir)
+            with open(model_file) as file:
+                changed = file.read() != before
+            results.append((bool(report["drifted_descriptions"]), changed))
+        self.assertEqual(results, [(True, True), (False, False)])
+        self.assertIn("{{ doc('customer_id') }}", before)
+
+
+class TestApi(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        os.makedirs(self.models_dir)
+        self.dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        self.index_file = os.path.join(self.temp_dir, "index.json")
+        self.model_file = os.path.join(self.models_dir, "orders.yml")
+        with open(self.dictionary_file, "w") as file:
+            file.write(
+                "dictionary:\n  - name: id\n    description: The identifier\n    aliases: []\n"
+            )
+        with open(self.model_file, "w") as file:
+            file.write(
+                "version: 2\nmodels:\n  - name: orders\n    columns:\n"
+                "      - name: id\n        description: Old\n      - name: amount\n"
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def read(self, path):
+        with open(path) as file:
+            return file.read()
+
+    def test_apply_deferred(self):
+        model_content = self.read(self.model_file)
+        dictionary_content = self.read(self.dictionary_file)
+        result = datadict_api.apply(
+            self.dictionary_file,
+            self.models_dir,
+            index_path=self.index_file,
+            write=False,
+        )
+
+        changes = [
+            (change.column, change.model, change.change, change.old, change.new)
+            for change in result.files[os.path.normpath(self.model_file)].columns
+        ]
+        self.assertEqual(
+            changes, [("id", "orders", "description_updated", "Old", "The identifier")]
+        )
+        self.assertEqual(
+            sorted(result.pending_writes),
+            sorted([os.path.normpath(self.model_file), self.dictionary_file]),
+        )
+        self.assertEqual(result.created_files, [])
+        self.assertGreater(result.seconds, 0)
+        self.assertEqual(result.counts["column_updated"], 1)
+        # Nothing is written until the caller writes it
+        self.assertEqual(self.read(self.model_file), model_content)
+        self.assertEqual(self.read(self.dictionary_file), dictionary_content)
+        self.assertFalse(os.path.exists(self.index_file))
+
+        self.assertEqual(
+            result.write([self.model_file]), [os.path.normpath(self.model_file)]
+        )
+        self.assertIn("description: The identifier", self.read(self.model_file))
+        self.assertEqual(self.read(self.dictionary_file), dictionary_content)
+        result.write()
+        self.assertIn("amount", self.read(self.dictionary_file))
+        self.assertEqual(result.pending_writes, {})
+
+    def test_apply_written(self):
+        new_dictionary = os.path.join(self.temp_dir, "new_dictionary.yml")
+        result = datadict_api.apply(
+            new_dictionary, self.models_dir, index_path=self.index_file
+        )
+        self.assertEqual(result.created_files, [new_dictionary])
+        self.assertEqual(result.pending_writes, {})
+        self.assertIn("name: amount", self.read(new_dictionary))
+        # A full run doesn't add an index to the project
+        self.assertFalse(os.path.exists(self.index_file))
+
+        # A run on a list of files builds the index, which later full runs keep up to date
+        datadict_api.apply(
+            new_dictionary,
+            self.models_dir,
+            files=[self.model_file],
+            index_path=self.index_file,
+        )
+        self.assertTrue(os.path.exists(self.index_file))
+        os.remove(self.model_file)
+        datadict_api.apply(new_dictionary, self.models_dir, index_path=self.index_file)
+        with open(self.index_file) as file:
+            self.assertEqual(json.load(file)["files"], {})
+
+    def test_recording(self):
+        model = {
+            "name": "orders",
+            "columns": [{"name": "id", "description": "Old", "data_type": "int"}],
+        }
+        expected = {
+            "name": "orders",
+            "columns": [{"name": "amount", "data_type": "decimal", "description": ""}],
+        }
+        removed_file = os.path.join(self.models_dir, "removed.yml")
+        with open(removed_file, "w") as file:
+            file.write("version: 2\n")
+        with datadict_api.recording(write=False) as result:
+            with self.assertRaises(RuntimeError):
+                with datadict_api.recording():
+                    pass
+            datadict_yaml.merge_file_models(
+                {"models": [model]}, self.model_file, [expected]
+            )
+            datadict_helpers.write_file(self.model_file, "version: 2\nmodels: []\n")
+            datadict_helpers.remove_file(removed_file)
+            # Reads within the run see the pending content
+            yaml_obj = ruamel.yaml.YAML()
+            self.assertEqual(
+                datadict_helpers.open_model_yml_file(yaml_obj, self.model_file)["yaml"][
+                    "models"
+                ],
+                [],
+            )
+
+        changes = [
+            (change.column, change.change, change.old, change.new)
+            for change in result.files[os.path.normpath(self.model_file)].columns
+        ]
+        self.assertEqual(
+            changes, [("amount", "added", None, ""), ("id", "removed", "Old", None)]
+        )
+        self.assertEqual(result.removed_files, [removed_file])
+        self.assertTrue(os.path.exists(removed_file))
+        result.write()
+        self.assertFalse(os.path.exists(removed_file))
+        self.assertEqual(self.read(self.model_file), "version: 2\nmodels: []\n")
+
+
+class TestHelpers(unittest.TestCase):
     def setUp(self):
         # Create a temporary directory to store the test files
         self.temp_dir = tempfile.mkdtemp()
@@ -527,50 +1316,309 @@ class TestYaml(unittest.TestCase):
         # Remove the temporary directory and its contents after the test
         shutil.rmtree(self.temp_dir)
 
-    def test_combine_column_lists_no_missing_columns(self):
-        # Test when there are no missing columns
-        current_yml = {
-            "name": "Model1",
-            "columns": [
-                {"name": "Column1", "type": "int"},
-                {"name": "Column2", "type": "str"},
-            ],
-        }
-        expected_yml = {
-            "columns": [
-                {"name": "Column1", "type": "int"},
-                {"name": "Column2", "type": "str"},
+    def test_open_model_yml_file(self):
+        # Test opening a valid model YAML file
+        model_yaml_file = os.path.join(self.temp_dir, "model_file.yml")
+        model_yaml = {
+            "models": [
+                {
+                    "name": "test_model",
+                    "columns": [{"name": "field1", "description": "old_desc"}],
+                }
             ]
         }
-        result = datadict_yaml.combine_column_lists(current_yml, expected_yml)
-        self.assertEqual(result["updated"], False)
-        self.assertDictEqual(result["yaml"], current_yml)
+        with open(model_yaml_file, "w") as file:
+            self.yaml_obj.dump(model_yaml, file)
+        result = datadict_helpers.open_model_yml_file(self.yaml_obj, model_yaml_file)
+        self.assertTrue(result["status"] == "valid")
+        self.assertIsInstance(result["yaml"], dict)
 
-    def test_combine_column_lists_missing_columns(self):
-        # Test when there are missing columns
-        current_yml = {
-            "name": "Model1",
-            "columns": [
-                {"name": "Column1", "type": "int"},
-            ],
+        # Test opening an invalid model YAML file
+        invalid_model_yaml_file = os.path.join(self.temp_dir, "invalid_model_file.yml")
+        with open(invalid_model_yaml_file, "w") as file:
+            file.write("invalid_data:\n")
+        result = datadict_helpers.open_model_yml_file(
+            self.yaml_obj, invalid_model_yaml_file
+        )
+        self.assertTrue(result["status"] == "invalid")
+        self.assertIsNone(result["yaml"])
+
+    def test_might_contain_models(self):
+        contents = {
+            "models.yml": "version: 2\nmodels:\n  - name: orders\n",
+            "quoted.yml": '"models" :\n  - name: orders\n',
+            "flow.yml": "{version: 2, models: [{name: orders}]}\n",
+            "sources.yml": "version: 2\nsources:\n  - name: raw\n    tables:\n      - name: models\n",
+            "selectors.yml": "selectors:\n  - name: nightly\n    definition:\n      models: tag:nightly\n",
+            "empty.yml": "",
         }
-        expected_yml = {
-            "columns": [
-                {"name": "Column1", "type": "int"},
-                {"name": "Column2", "type": "str"},
-            ]
+        expected = {
+            "models.yml": True,
+            "quoted.yml": True,
+            "flow.yml": True,
+            "sources.yml": False,
+            "selectors.yml": False,
+            "empty.yml": False,
         }
-        result = datadict_yaml.combine_column_lists(current_yml, expected_yml)
-        self.assertEqual(result["updated"], True)
-        self.assertIn({"name": "Column2", "type": "str"}, result["yaml"]["columns"])
+        for name, content in contents.items():
+            file_path = os.path.join(self.temp_dir, name)
+            with open(file_path, "w") as file:
+                file.write(content)
+            self.assertEqual(
+                datadict_helpers.might_contain_models(file_path), expected[name], name
+            )
+            # Files over the threshold are memory-mapped, with the same result
+            with unittest.mock.patch.object(datadict_helpers, "MMAP_THRESHOLD", 1):
+                self.assertEqual(
+                    datadict_helpers.might_contain_models(file_path),
+                    expected[name],
+                    name,
+                )
 
-    def test_combine_column_lists_additional_columns(self):
-        # Test when there are additional columns
-        current_yml = {
-            "name": "Model1",
-            "columns": [
-                {"name": "Column1", "type": "int"},
-                {"name": "Column2", "type": "str"},
+        result = datadict_helpers.open_model_yml_file(
+            self.yaml_obj, os.path.join(self.temp_dir, "sources.yml")
+        )
+        self.assertEqual(result, {"status": "invalid", "yaml": None, "parsed": False})
+
+        with self.assertRaises(FileNotFoundError):
+            datadict_helpers.might_contain_models(
+                os.path.join(self.temp_dir, "missing.yml")
+            )
+
+    def test_check_valid_model_file(self):
+        # Test checking a valid model YAML data
+        valid_model_yaml = {
+            "models": [
+                {
+                    "name": "model1",
+                    "columns": [{"name": "column1", "description": "desc1"}],
+                }
+            ]
+        }
+        result = datadict_helpers.check_valid_model_file(valid_model_yaml)
+        self.assertTrue(result)
+
+        # Test checking an invalid model YAML data
+        invalid_model_yaml = {"invalid_data": "data"}
+        result = datadict_helpers.check_valid_model_file(invalid_model_yaml)
+        self.assertFalse(result)
+
+    def test_output_model_file(self):
+        # Prepare test data
+        model_yaml = {
+            "models": [
+                {
+                    "name": "test_model",
+                    "description": "Test Model",
+                    "columns": [
+                        {"name": "col1", "description": "Column 1"},
+                        {"name": "col2", "description": "Column 2"},
+                    ],
+                }
+            ]
+        }
+        test_file_path = "test_output_model.yaml"
+        try:
+            datadict_helpers.output_model_file(
+                self.yaml_obj, test_file_path, model_yaml, False
+            )
+            self.assertTrue(os.path.exists(test_file_path))
+            with open(test_file_path, "r") as f:
+                loaded_yaml = self.yaml_obj.load(f)
+            self.assertEqual(loaded_yaml, model_yaml)
+
+        finally:
+            if os.path.exists(test_file_path):
+                os.remove(test_file_path)
+
+    def test_list_directory_files(self):
+        extensions = [".yml", ".yaml"]
+        yaml_files = [
+            "file1.yaml",
+            "file2.yml",
+            "subdir/file3.yaml",
+            "subdir/file4.yml",
+            "subdir/subsubdir/file5.yaml",
+            "subdir/subsubdir/file6.yml",
+            "non_yaml_file.txt",
+        ]
+        for file in yaml_files:
+            file_path = os.path.join(self.temp_dir, file)
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            with open(file_path, "w") as f:
+                f.write("Sample YAML content")
+        # Call the function to get the list of YAML files in the temporary directory
+        yaml_files_list = datadict_helpers.list_directory_files(
+            self.temp_dir, extensions
+        )
+
+        # Assert that the function returns the correct list of YAML files
+        expected_yaml_files = [
+            os.path.join(self.temp_dir, "file1.yaml"),
+            os.path.join(self.temp_dir, "file2.yml"),
+            os.path.join(self.temp_dir, "subdir/file3.yaml"),
+            os.path.join(self.temp_dir, "subdir/file4.yml"),
+            os.path.join(self.temp_dir, "subdir/subsubdir/file5.yaml"),
+            os.path.join(self.temp_dir, "subdir/subsubdir/file6.yml"),
+        ]
+        self.assertCountEqual(yaml_files_list, expected_yaml_files)
+
+    def test_sort_model_file(self):
+        # Input dictionary with unsorted models and columns
+        input_dict = {
+            "version": 2,
+            "models": [
+                {
+                    "name": "dmn_clients",
+                    "columns": [
+                        {"name": "updated_at", "description": ""},
+                        {
+                            "name": "client_uuid",
+                            "description": "Unique identifier for the client",
+                            "tests": ["unique", "not_null"],
+                        },
+                        {
+                            "name": "name",
+                            "description": "Name of the client",
+                            "tests": ["not_null"],
+                        },
+                        {
+                            "name": "code",
+                            "description": "Code used to uniquely identify the client",
+                            "tests": ["not_null"],
+                        },
+                        {
+                            "name": "board_name",
+                            "description": "Name of the board in monday.com",
+                        },
+                        {
+                            "name": "status",
+                            "description": "Status of the client",
+                            "tests": ["not_null"],
+                        },
+                    ],
+                },
+                {
+                    "name": "dmn_stories",
+                    "columns": [
+                        {"name": "valid_from", "description": ""},
+                        {"name": "story_id", "description": ""},
+                        {"name": "name", "description": ""},
+                        {"name": "client_uuid", "description": ""},
+                        {"name": "client_name", "description": ""},
+                    ],
+                },
+            ],
+        }
+
+        # Expected output dictionary with sorted models and columns
+        expected_output = {
+            "version": 2,
+            "models": [
+                {
+                    "name": "dmn_clients",
+                    "columns": [
+                        {
+                            "name": "board_name",
+                            "description": "Name of the board in monday.com",
+                        },
+                        {
+                            "name": "client_uuid",
+                            "description": "Unique identifier for the client",
+                            "tests": ["unique", "not_null"],
+                        },
+                        {
+                            "name": "code",
+                            "description": "Code used to uniquely identify the client",
+                            "tests": ["not_null"],
+                        },
+                        {
+                            "name": "name",
+                            "description": "Name of the client",
+                            "tests": ["not_null"],
+                        },
+                        {
+                            "name": "status",
+                            "description": "Status of the client",
+                            "tests": ["not_null"],
+                        },
+                        {"name": "updated_at", "description": ""},
+                    ],
+                },
+                {
+                    "name": "dmn_stories",
+                    "columns": [
+                        {"name": "client_name", "description": ""},
+                        {"name": "client_uuid", "description": ""},
+                        {"name": "name", "description": ""},
+                        {"name": "story_id", "description": ""},
+                        {"name": "valid_from", "description": ""},
+                    ],
+                },
+            ],
+        }
+
+        # Call the function to sort the model file
+        sorted_output = datadict_helpers.sort_model_file(input_dict)
+
+        # Compare the actual output with the expected output
+        self.assertEqual(sorted_output, expected_output)
+
+
+class TestYaml(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        self.yaml_obj = ruamel.yaml.YAML()
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def test_combine_column_lists_no_missing_columns(self):
+        # Test when there are no missing columns
+        current_yml = {
+            "name": "Model1",
+            "columns": [
+                {"name": "Column1", "type": "int"},
+                {"name": "Column2", "type": "str"},
+            ],
+        }
+        expected_yml = {
+            "columns": [
+                {"name": "Column1", "type": "int"},
+                {"name": "Column2", "type": "str"},
+            ]
+        }
+        result = datadict_yaml.combine_column_lists(current_yml, expected_yml)
+        self.assertEqual(result["updated"], False)
+        self.assertDictEqual(result["yaml"], current_yml)
+
+    def test_combine_column_lists_missing_columns(self):
+        # Test when there are missing columns
+        current_yml = {
+            "name": "Model1",
+            "columns": [
+                {"name": "Column1", "type": "int"},
+            ],
+        }
+        expected_yml = {
+            "columns": [
+                {"name": "Column1", "type": "int"},
+                {"name": "Column2", "type": "str"},
+            ]
+        }
+        result = datadict_yaml.combine_column_lists(current_yml, expected_yml)
+        self.assertEqual(result["updated"], True)
+        self.assertIn({"name": "Column2", "type": "str"}, result["yaml"]["columns"])
+
+    def test_combine_column_lists_additional_columns(self):
+        # Test when there are additional columns
+        current_yml = {
+            "name": "Model1",
+            "columns": [
+                {"name": "Column1", "type": "int"},
+                {"name": "Column2", "type": "str"},
             ],
         }
         expected_yml = {
@@ -594,5 +1642,1548 @@ class TestYaml(unittest.TestCase):
         self.assertIn({"name": "Column1", "type": "int"}, result["yaml"]["columns"])
 
 
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def test_phase_without_profiling(self):
+        # Phases are a no-op when profiling isn't active
+        with datadict_profile.phase("parse", "file.yml"):
+            pass
+        self.assertIsNone(datadict_profile.stop_profiling())
+
+    def test_profile_report(self):
+        report_path = os.path.join(self.temp_dir, "profile.json")
+        datadict_profile.start_profiling("apply")
+        with datadict_profile.phase("parse", "slow.yml"):
+            with datadict_profile.phase("serialize", "slow.yml"):
+                _ = [str(i) for i in range(10000)]
+        with datadict_profile.phase("parse", "fast.yml"):
+            pass
+        report = datadict_profile.stop_profiling(report_path, top=1)
+
+        self.assertEqual(report["command"], "apply")
+        self.assertEqual(list(report["phases"]), ["parse", "serialize"])
+        self.assertEqual(report["phases"]["parse"]["calls"], 2)
+        self.assertGreaterEqual(
+            report["phases"]["parse"]["peak_memory_bytes"],
+            report["phases"]["serialize"]["peak_memory_bytes"],
+        )
+        self.assertEqual(len(report["slowest_files"]), 1)
+        self.assertEqual(report["slowest_files"][0]["file"], "slow.yml")
+        with open(report_path, "r") as file:
+            self.assertEqual(json.load(file), report)
+
+
+class TestWatch(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        os.makedirs(self.models_dir)
+        self.dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        with open(self.dictionary_file, "w") as file:
+            file.write("dictionary:\n")
+        self.model_file = os.path.join(self.models_dir, "model_file.yml")
+        self.write_model("old_desc")
+        self.yaml_obj = ruamel.yaml.YAML()
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def write_model(self, description, column="field1"):
+        with open(self.model_file, "w") as file:
+            file.write(
+                "models:\n"
+                "  - name: test_model\n"
+                "    columns:\n"
+                f"      - name: {column}\n"
+                f"        description: {description}\n"
+            )
+        # Give every write a distinct modification time, however fast the test runs
+        self.mtime = getattr(self, "mtime", 0) + 1
+        os.utime(self.model_file, ns=(self.mtime, self.mtime))
+
+    def read(self, path):
+        with open(path, "r") as file:
+            return self.yaml_obj.load(file)
+
+    def test_model_file_change(self):
+        watcher = datadict_watch.watcher(self.dictionary_file, self.models_dir)
+        watcher.load()
+        self.assertIn(self.model_file, watcher.model_files)
+
+        # Changes written by the watcher itself are ignored
+        self.assertFalse(
+            watcher.process_changes({self.model_file, self.dictionary_file})
+        )
+
+        self.write_model("old_desc", column="field2")
+        self.assertTrue(watcher.process_changes({self.model_file}))
+        self.assertEqual(
+            [field["name"] for field in self.read(self.dictionary_file)["dictionary"]],
+            ["field2"],
+        )
+        self.assertEqual(len(watcher.dictionary.existing_fields), 1)
+        self.write_model("new_desc", column="field2")
+        self.assertTrue(watcher.process_changes({self.model_file}))
+        self.assertEqual(watcher.dictionary.applied_files, [self.model_file])
+
+        os.remove(self.model_file)
+        self.assertTrue(watcher.process_changes({self.model_file}))
+        self.assertEqual(watcher.model_files, {})
+        self.assertEqual(self.read(self.dictionary_file)["dictionary"], [])
+
+    def test_dictionary_change(self):
+        watcher = datadict_watch.watcher(self.dictionary_file, self.models_dir)
+        watcher.load()
+        with open(self.dictionary_file, "w") as file:
+            file.write("dictionary:\n  - name: field1\n    description: new_desc\n")
+        self.assertTrue(watcher.process_changes({self.dictionary_file}))
+        self.assertEqual(
+            self.read(self.model_file)["models"][0]["columns"][0]["description"],
+            "new_desc",
+        )
+
+    def test_layer_change(self):
+        base_file = os.path.join(self.temp_dir, "base.yml")
+        with open(base_file, "w") as file:
+            file.write("dictionary:\n  - name: field1\n    description: base_desc\n")
+        watcher = datadict_watch.watcher(
+            [base_file, self.dictionary_file], self.models_dir
+        )
+        watcher.load()
+        self.assertEqual(
+            self.read(self.model_file)["models"][0]["columns"][0]["description"],
+            "base_desc",
+        )
+        # Columns matched by the base layer aren't collated into the output layer
+        self.assertEqual(self.read(self.dictionary_file)["dictionary"], [])
+
+        with open(base_file, "w") as file:
+            file.write("dictionary:\n  - name: field1\n    description: new_desc\n")
+        self.assertTrue(watcher.process_changes({base_file}))
+        self.assertEqual(
+            self.read(self.model_file)["models"][0]["columns"][0]["description"],
+            "new_desc",
+        )
+
+    def test_changes_outside_model_directory(self):
+        # The dictionary's directory, here the project root, is watched, but its other YAML files aren't models
+        watcher = datadict_watch.watcher(self.dictionary_file, self.models_dir)
+        watcher.load()
+        project_file = os.path.join(self.temp_dir, "dbt_project.yml")
+        with open(project_file, "w") as file:
+            file.write("name: project\n")
+        self.assertFalse(watcher.process_changes({project_file}))
+        self.assertNotIn(project_file, watcher.model_files)
+
+    def test_relative_paths(self):
+        # A dictionary inside the model directory, with both given relative to the working directory
+        os.rename(self.dictionary_file, os.path.join(self.models_dir, "dictionary.yml"))
+        working_directory = os.getcwd()
+        os.chdir(self.temp_dir)
+        try:
+            watcher = datadict_watch.watcher(
+                os.path.join("models", "dictionary.yml"), "models"
+            )
+            watcher.load()
+            self.write_model("new_desc")
+            self.assertTrue(
+                watcher.process_changes({os.path.join("models", "model_file.yml")})
+            )
+            self.write_model("newer_desc")
+            self.assertTrue(watcher.process_changes({self.model_file}))
+        finally:
+            os.chdir(working_directory)
+        self.assertEqual(list(watcher.model_files), [self.model_file])
+        self.assertEqual(len(watcher.dictionary.existing_fields), 1)
+
+    def test_polling_backend(self):
+        backend = datadict_watch.polling_backend(
+            [self.models_dir], [self.dictionary_file], interval=0
+        )
+        self.assertEqual(backend.wait(0), set())
+        self.write_model("edited_desc")
+        self.assertEqual(backend.wait(0), {self.model_file})
+
+
+class TestServer(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        os.makedirs(self.models_dir)
+        self.dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        with open(self.dictionary_file, "w") as file:
+            file.write(
+                "dictionary:\n"
+                "  - name: customer_id\n"
+                "    description: Unique customer identifier\n"
+                "    aliases:\n"
+                "      - cust_id\n"
+            )
+        self.model_file = os.path.join(self.models_dir, "model_file.yml")
+        with open(self.model_file, "w") as file:
+            file.write(
+                "models:\n"
+                "  - name: orders\n"
+                "    columns:\n"
+                "      - name: cust_id\n"
+                "  - name: customers\n"
+                "    columns:\n"
+                "      - name: customer_id\n"
+                "      - name: created_at\n"
+            )
+        self.server = datadict_server.server(self.dictionary_file, self.models_dir)
+        self.server.load()
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def test_load_is_read_only(self):
+        with open(self.model_file, "r") as file:
+            self.assertNotIn("description", file.read())
+        # A missing dictionary isn't created
+        os.remove(self.dictionary_file)
+        server = datadict_server.server(self.dictionary_file, self.models_dir)
+        server.load()
+        self.assertFalse(os.path.exists(self.dictionary_file))
+        self.assertIsNone(server.lookup("customer_id"))
+
+    def test_queries(self):
+        self.assertEqual(
+            self.server.lookup("cust_id"),
+            {
+                "name": "customer_id",
+                "description": "Unique customer identifier",
+                "aliases": ["cust_id"],
+            },
+        )
+        self.assertIsNone(self.server.lookup("missing"))
+        self.assertEqual(
+            [completion["name"] for completion in self.server.complete("c")],
+            ["created_at", "cust_id", "customer_id"],
+        )
+        self.assertEqual(
+            self.server.usage("customer_id"),
+            {"name": "customer_id", "models": ["customers", "orders"]},
+        )
+
+    def test_normalized_and_pattern_queries(self):
+        with open(self.dictionary_file, "w") as file:
+            file.write(
+                "normalize: [snake_case, casefold]\n"
+                "dictionary:\n"
+                "  - name: customer_id\n"
+                "    description: Unique customer identifier\n"
+                "    aliases:\n"
+                "      - '*_customer_id'\n"
+            )
+        with open(self.model_file, "w") as file:
+            file.write(
+                "models:\n"
+                "  - name: orders\n"
+                "    columns:\n"
+                "      - name: CustomerID\n"
+                "  - name: invoices\n"
+                "    columns:\n"
+                "      - name: billing_customer_id\n"
+            )
+        server = datadict_server.server(self.dictionary_file, self.models_dir)
+        server.load()
+        self.assertEqual(server.lookup("CustomerID")["name"], "customer_id")
+        self.assertEqual(server.lookup("BillingCustomerId")["name"], "customer_id")
+        self.assertEqual(
+            server.usage("customer_id"),
+            {"name": "customer_id", "models": ["invoices", "orders"]},
+        )
+
+    def test_json_rpc_dispatch(self):
+        response = self.server._dispatch(
+            {"id": 1, "method": "usage", "params": {"name": "created_at"}}
+        )
+        self.assertEqual(response["result"]["models"], ["customers"])
+        response = self.server._dispatch({"id": 2, "method": "missing"})
+        self.assertEqual(response["error"]["code"], datadict_server.METHOD_NOT_FOUND)
+        # Errors raised by an existing method aren't reported as a missing method
+        response = self.server._dispatch({"id": 3, "method": "lookup", "params": {}})
+        self.assertEqual(response["error"]["code"], datadict_server.INVALID_PARAMS)
+        with unittest.mock.patch.object(
+            self.server, "usage", side_effect=KeyError("models")
+        ):
+            response = self.server._dispatch(
+                {"id": 4, "method": "usage", "params": {"name": "created_at"}}
+            )
+        self.assertEqual(response["error"]["code"], datadict_server.INTERNAL_ERROR)
+        response = self.server.handle_lsp_message(
+            {"id": 5, "method": "textDocument/hover", "params": {}}
+        )
+        self.assertEqual(response["error"]["code"], datadict_server.INVALID_PARAMS)
+        response = self.server.handle_lsp_message({"id": 6, "method": "missing"})
+        self.assertEqual(response["error"]["code"], datadict_server.METHOD_NOT_FOUND)
+
+    def test_lsp(self):
+        messages = [
+            {"jsonrpc": "2.0", "id": 1, "method": "initialize", "params": {}},
+            {
+                "jsonrpc": "2.0",
+                "method": "textDocument/didOpen",
+                "params": {
+                    "textDocument": {"uri": "file:///a.sql", "text": "select cust_id"}
+                },
+            },
+            {
+                "jsonrpc": "2.0",
+                "id": 2,
+                "method": "textDocument/hover",
+                "params": {
+                    "textDocument": {"uri": "file:///a.sql"},
+                    "position": {"line": 0, "character": 9},
+                },
+            },
+            {"jsonrpc": "2.0", "method": "exit"},
+        ]
+        stdin = io.BytesIO()
+        for message in messages:
+            datadict_server.write_lsp_message(stdin, message)
+        stdin.seek(0)
+        stdout = io.BytesIO()
+        self.server.serve_lsp(stdin, stdout)
+
+        stdout.seek(0)
+        initialize = datadict_server.read_lsp_message(stdout)
+        self.assertTrue(initialize["result"]["capabilities"]["hoverProvider"])
+        hover = datadict_server.read_lsp_message(stdout)
+        self.assertIn(
+            "Unique customer identifier", hover["result"]["contents"]["value"]
+        )
+        self.assertIsNone(datadict_server.read_lsp_message(stdout))
+
+    def test_reload(self):
+        with open(self.dictionary_file, "w") as file:
+            file.write("dictionary:\n  - name: created_at\n    description: Created\n")
+        self.server.watcher.process_changes({self.dictionary_file})
+        self.server._build_indexes()
+        self.assertIsNone(self.server.lookup("cust_id"))
+        self.assertEqual(self.server.lookup("created_at")["description"], "Created")
+
+
+class TestIndex(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        os.makedirs(self.models_dir)
+        self.dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        self.index_file = os.path.join(self.temp_dir, ".datadict", "index.json")
+        with open(self.dictionary_file, "w") as file:
+            file.write(
+                "dictionary:\n"
+                "  - name: customer_id\n"
+                "    description: Unique customer identifier\n"
+                "    aliases:\n"
+                "      - cust_id\n"
+            )
+        self.orders_file = os.path.join(self.models_dir, "orders.yml")
+        with open(self.orders_file, "w") as file:
+            file.write(
+                "models:\n"
+                "  - name: orders\n"
+                "    columns:\n"
+                "      - name: cust_id\n"
+                "        description: Customer\n"
+            )
+        self.customers_file = os.path.join(self.models_dir, "customers.yml")
+        with open(self.customers_file, "w") as file:
+            file.write(
+                "models:\n"
+                "  - name: customers\n"
+                "    columns:\n"
+                "      - name: customer_id\n"
+            )
+        with open(os.path.join(self.models_dir, "sources.yml"), "w") as file:
+            file.write("sources:\n  - name: raw\n")
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def test_queries(self):
+        index = datadict_index.get_index(
+            self.dictionary_file, self.models_dir, self.index_file
+        )
+        self.assertEqual(
+            datadict_index.lookup_column(index, "cust_id")["name"], "customer_id"
+        )
+        self.assertIsNone(datadict_index.lookup_column(index, "missing"))
+        usage = datadict_index.column_usage(index, "customer_id")
+        self.assertEqual(
+            [(use["model"], use["column"]) for use in usage["models"]],
+            [("customers", "customer_id"), ("orders", "cust_id")],
+        )
+        self.assertEqual(usage["models"][1]["description"], "Customer")
+
+    def test_normalized_and_pattern_queries(self):
+        with open(self.dictionary_file, "w") as file:
+            file.write(
+                "normalize: [snake_case, casefold]\n"
+                "dictionary:\n"
+                "  - name: customer_id\n"
+                "    description: Unique customer identifier\n"
+                "    aliases:\n"
+                "      - 'cust_*'\n"
+            )
+        with open(self.customers_file, "w") as file:
+            file.write(
+                "models:\n"
+                "  - name: customers\n"
+                "    columns:\n"
+                "      - name: CustomerID\n"
+            )
+        index = datadict_index.get_index(
+            self.dictionary_file, self.models_dir, self.index_file
+        )
+        self.assertEqual(
+            datadict_index.lookup_column(index, "CustomerID")["name"], "customer_id"
+        )
+        self.assertEqual(
+            datadict_index.lookup_column(index, "CustId")["name"], "customer_id"
+        )
+        usage = datadict_index.column_usage(index, "customer_id")
+        self.assertEqual(
+            [(use["model"], use["column"]) for use in usage["models"]],
+            [("customers", "CustomerID"), ("orders", "cust_id")],
+        )
+
+    def test_layered_queries(self):
+        base_file = os.path.join(self.temp_dir, "base.yml")
+        with open(base_file, "w") as file:
+            file.write(
+                "normalize: [casefold]\n"
+                "dictionary:\n"
+                "  - name: customer_id\n"
+                "    description: Company customer\n"
+                "  - name: order_id\n"
+                "    description: Company order\n"
+                "    aliases: ['ord_*']\n"
+            )
+        layers = [base_file, self.dictionary_file]
+        index = datadict_index.get_index(layers, self.models_dir, self.index_file)
+        # The later layer overrides an entry, and the entries only in the base layer are still matched
+        self.assertEqual(
+            datadict_index.lookup_column(index, "CUST_ID")["description"],
+            "Unique customer identifier",
+        )
+        self.assertEqual(
+            datadict_index.lookup_column(index, "ORD_REF")["name"], "order_id"
+        )
+
+        with open(base_file, "a") as file:
+            file.write("  - name: created_at\n    description: Creation time\n")
+        index = datadict_index.load_index(self.index_file, layers, self.models_dir)
+        self.assertTrue(datadict_index.update_index(index)["dictionary_reloaded"])
+        self.assertEqual(
+            datadict_index.lookup_column(index, "created_at")["name"], "created_at"
+        )
+        # An index built for other layers is rebuilt
+        self.assertIsNone(
+            datadict_index.lookup_column(
+                datadict_index.load_index(
+                    self.index_file, self.dictionary_file, self.models_dir
+                ),
+                "order_id",
+            )
+        )
+
+    def test_incremental_update(self):
+        datadict_index.get_index(self.dictionary_file, self.models_dir, self.index_file)
+        index = datadict_index.load_index(
+            self.index_file, self.dictionary_file, self.models_dir
+        )
+        self.assertEqual(
+            datadict_index.update_index(index),
+            {"parsed_files": 0, "removed_files": 0, "dictionary_reloaded": False},
+        )
+
+        with open(self.customers_file, "a") as file:
+            file.write("      - name: created_at\n")
+        os.remove(self.orders_file)
+        self.assertEqual(
+            datadict_index.update_index(index),
+            {"parsed_files": 1, "removed_files": 1, "dictionary_reloaded": False},
+        )
+        self.assertEqual(
+            [
+                use["model"]
+                for use in datadict_index.column_usage(index, "created_at")["models"]
+            ],
+            ["customers"],
+        )
+
+    def test_ledger(self):
+        index = datadict_index.get_index(
+            self.dictionary_file, self.models_dir, self.index_file
+        )
+        os.remove(self.orders_file)
+        datadict_index.record_fields(
+            index,
+            [self.customers_file, self.orders_file],
+            [{"name": "created_at", "model": "customers", "file": self.customers_file}],
+        )
+        self.assertEqual(
+            datadict_index.ledger_fields(index),
+            [
+                {
+                    "name": "created_at",
+                    "model": "customers",
+                    "file": os.path.normpath(self.customers_file),
+                }
+            ],
+        )
+
+    def test_apply_to_files(self):
+        instance = datadict.datadict(self.dictionary_file)
+        removed = instance.apply_data_dictionary_to_files(
+            [self.orders_file, self.dictionary_file, "missing.yml", "model.sql"]
+        )
+        self.assertEqual(removed, ["missing.yml"])
+        self.assertEqual(instance.applied_files, [os.path.normpath(self.orders_file)])
+        self.assertEqual(
+            instance.existing_fields[0]["description"], "Unique customer identifier"
+        )
+
+
+class TestCheck(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        self.models_dir = os.path.join(self.temp_dir, "models")
+        os.makedirs(self.models_dir)
+        self.dictionary_file = os.path.join(self.temp_dir, "dictionary.yml")
+        self.model_file = os.path.join(self.models_dir, "models.yml")
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def write(self, path, content):
+        with open(path, "w") as file:
+            file.write(content)
+
+    def test_clean_project(self):
+        self.write(
+            self.dictionary_file,
+            "dictionary:\n"
+            "  - name: field1\n"
+            "    description: desc1\n"
+            "    models:\n"
+            "      - model1\n",
+        )
+        self.write(
+            self.model_file,
+            "models:\n"
+            "  - name: model1\n"
+            "    columns:\n"
+            "      - name: field1\n"
+            "        description: desc1\n",
+        )
+        report = datadict_check.run_check(self.dictionary_file, self.models_dir, 1)
+        self.assertEqual(report["exit_code"], datadict_check.EXIT_OK)
+        self.assertEqual(report["summary"]["files_checked"], 1)
+
+    def test_layers(self):
+        base_file = os.path.join(self.temp_dir, "base.yml")
+        self.write(
+            base_file,
+            "dictionary:\n" "  - name: field1\n" "    description: desc1\n",
+        )
+        self.write(self.dictionary_file, "dictionary:\n")
+        self.write(
+            self.model_file,
+            "models:\n"
+            "  - name: model1\n"
+            "    columns:\n"
+            "      - name: field1\n"
+            "        description: other\n",
+        )
+        report = datadict_check.run_check(
+            [base_file, self.dictionary_file], self.models_dir, 1
+        )
+        # The column is matched by the base layer, so it isn't missing from, or collated into, the output layer
+        self.assertEqual(
+            [
+                (drift["column"], drift["expected"])
+                for drift in report["drifted_descriptions"]
+            ],
+            [("field1", "desc1")],
+        )
+        self.assertEqual(report["missing_from_dictionary"], [])
+        self.assertEqual(report["models_changed"], [])
+
+    def test_findings(self):
+        self.write(
+            self.dictionary_file,
+            "dictionary:\n"
+            "  - name: field1\n"
+            "    description: desc1\n"
+            "    aliases:\n"
+            "      - f1\n"
+            "    models:\n"
+            "      - model1\n",
+        )
+        model_yaml = (
+            "models:\n"
+            "  - name: model1\n"
+            "    columns:\n"
+            "      - name: f1\n"
+            "        description: old\n"
+            "      - name: field2\n"
+            "        description: a\n"
+            "  - name: model2\n"
+            "    columns:\n"
+            "      - name: field2\n"
+            "        description: b\n"
+        )
+        self.write(self.model_file, model_yaml)
+        self.write(os.path.join(self.models_dir, "broken.yml"), "models: [\n")
+        report = datadict_check.run_check(self.dictionary_file, self.models_dir, 2)
+
+        self.assertEqual(report["exit_code"], datadict_check.EXIT_ERROR)
+        self.assertEqual(len(report["errors"]), 1)
+        self.assertEqual(
+            report["drifted_descriptions"],
+            [
+                {
+                    "file": self.model_file,
+                    "model": "model1",
+                    "column": "f1",
+                    "expected": "desc1",
+                    "actual": "old",
+                }
+            ],
+        )
+        self.assertEqual(
+            report["missing_from_dictionary"],
+            [{"name": "field2", "models": ["model1", "model2"]}],
+        )
+        self.assertEqual(
+            report["description_conflicts"],
+            [{"name": "field2", "description_versions": ["a", "b"]}],
+        )
+        self.assertEqual(
+            [change["name"] for change in report["models_changed"]],
+            ["f1", "field1", "field2"],
+        )
+        with open(self.model_file, "r") as file:
+            self.assertEqual(file.read(), model_yaml)
+
+
+class TestDrift(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        for name in ["orders", "customers", "payments"]:
+            with open(os.path.join(self.temp_dir, f"{name}.sql"), "w") as file:
+                file.write("select 1 as id\n")
+        self.orders_file = os.path.join(self.temp_dir, "orders.yml")
+        with open(self.orders_file, "w") as file:
+            file.write(
+                "version: 2\nmodels:\n  - name: orders\n    columns:\n"
+                "      - name: id\n        data_type: integer\n"
+                "      - name: amount\n        data_type: numeric\n"
+                "      - name: removed\n        data_type: text\n"
+                "  - name: customers\n    columns:\n"
+                "      - name: id\n        data_type: INTEGER\n"
+            )
+        with open(os.path.join(self.temp_dir, "sources.yml"), "w") as file:
+            file.write("version: 2\nsources:\n  - name: raw\n")
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def stream_model_yaml(self, model_names, target_path=None, fast=False):
+        columns = {
+            "orders": [("id", "integer"), ("amount", "float"), ("added", "text")],
+            "customers": [("id", "integer")],
+        }
+        for name in model_names:
+            if name in columns:
+                yield {
+                    "name": name,
+                    "columns": [
+                        {"name": column, "data_type": data_type, "description": ""}
+                        for column, data_type in columns[name]
+                    ],
+                }
+
+    def test_compare_columns(self):
+        changes = datadict_drift.compare_columns(
+            {"id": "integer", "amount": "numeric", "note": None, "removed": "text"},
+            {"id": "INTEGER", "amount": "float", "note": "text", "added": "text"},
+        )
+        self.assertEqual(changes["added"], ["added"])
+        self.assertEqual(changes["removed"], ["removed"])
+        # Types are compared ignoring case, and only when both are known
+        self.assertEqual(
+            changes["type_changed"],
+            [{"column": "amount", "expected": "numeric", "actual": "float"}],
+        )
+
+    def test_yaml_columns(self):
+        documented = datadict_drift.yaml_columns(
+            datadict_helpers.list_directory_files(self.temp_dir, [".yml"])
+        )
+        self.assertEqual(documented["errors"], [])
+        self.assertEqual(set(documented["models"]), {"orders", "customers"})
+        self.assertEqual(documented["models"]["orders"]["file"], self.orders_file)
+        self.assertEqual(
+            documented["models"]["orders"]["columns"],
+            {"id": "integer", "amount": "numeric", "removed": "text"},
+        )
+
+    def test_drift_from_codegen(self):
+        mtime = os.stat(self.orders_file).st_mtime_ns
+        with unittest.mock.patch.object(
+            datadict_dbt, "validate_dbt", return_value=True
+        ), unittest.mock.patch.object(
+            datadict_dbt, "stream_model_yaml", side_effect=self.stream_model_yaml
+        ):
+            report = datadict_drift.run_drift(self.temp_dir, jobs=2, chunk_size=1)
+
+        self.assertEqual(
+            report["models"],
+            [
+                {
+                    "model": "orders",
+                    "file": self.orders_file,
+                    "added": ["added"],
+                    "removed": ["removed"],
+                    "type_changed": [
+                        {"column": "amount", "expected": "numeric", "actual": "float"}
+                    ],
+                }
+            ],
+        )
+        self.assertEqual(report["undocumented_models"], [])
+        self.assertEqual(report["summary"]["models_checked"], 2)
+        self.assertEqual(report["exit_code"], datadict_check.EXIT_FINDINGS)
+        # No file is written
+        self.assertEqual(os.stat(self.orders_file).st_mtime_ns, mtime)
+        self.assertIn("type_changed  amount", datadict_drift.format_table(report))
+
+    def test_drift_from_catalog(self):
+        catalog_path = os.path.join(self.temp_dir, "catalog.json")
+        with open(catalog_path, "w") as file:
+            json.dump(
+                {
+                    "nodes": {
+                        "model.p.orders": {
+                            "columns": {
+                                "AMOUNT": {
+                                    "name": "AMOUNT",
+                                    "type": "NUMERIC",
+                                    "index": 2,
+                                },
+                                "ID": {"name": "ID", "type": "INTEGER", "index": 1},
+                                "REMOVED": {
+                                    "name": "REMOVED",
+                                    "type": "TEXT",
+                                    "index": 3,
+                                },
+                            }
+                        },
+                        "model.p.customers": {
+                            "columns": {
+                                "ID": {"name": "ID", "type": "INTEGER", "index": 1}
+                            }
+                        },
+                        "model.p.payments": {
+                            "columns": {
+                                "ID": {"name": "ID", "type": "INTEGER", "index": 1}
+                            }
+                        },
+                        "seed.p.orders": {"columns": {}},
+                    }
+                },
+                file,
+            )
+        report = datadict_drift.run_drift(
+            self.temp_dir, columns_from="catalog", catalog_path=catalog_path
+        )
+        self.assertEqual(report["models"], [])
+        self.assertEqual(report["undocumented_models"], ["payments"])
+        self.assertEqual(report["exit_code"], datadict_check.EXIT_FINDINGS)
+
+        # A missing catalog is an error
+        report = datadict_drift.run_drift(
+            self.temp_dir,
+            columns_from="catalog",
+            catalog_path=os.path.join(self.temp_dir, "missing.json"),
+        )
+        self.assertEqual(report["exit_code"], datadict_check.EXIT_ERROR)
+
+
+class TestManifest(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+
+        def node(name, checksum, parents=()):
+            return {
+                "name": name,
+                "resource_type": "model",
+                "original_file_path": f"models/{name}.sql",
+                "checksum": {"name": "sha256", "checksum": checksum},
+                "depends_on": {"nodes": list(parents)},
+            }
+
+        self.baseline = {
+            "nodes": {
+                "model.p.stg_orders": node("stg_orders", "a"),
+                "model.p.orders": node("orders", "b", ["model.p.stg_orders"]),
+                "model.p.customers": node("customers", "c"),
+            }
+        }
+        self.manifest = {
+            "nodes": {
+                "model.p.stg_orders": node("stg_orders", "a2"),
+                "model.p.orders": node("orders", "b", ["model.p.stg_orders"]),
+                "model.p.customers": node("customers", "c"),
+                "model.p.payments": node("payments", "d"),
+                "test.p.not_null": {"name": "not_null", "resource_type": "test"},
+            },
+            "child_map": {
+                "model.p.stg_orders": ["model.p.orders", "test.p.not_null"],
+                "model.p.orders": [],
+                "model.p.customers": [],
+                "model.p.payments": [],
+            },
+        }
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def test_modified_models(self):
+        self.assertEqual(
+            datadict_manifest.modified_models(self.manifest, self.baseline),
+            {"model.p.stg_orders", "model.p.payments"},
+        )
+
+    def test_downstream_models(self):
+        self.assertEqual(
+            datadict_manifest.downstream_models(self.manifest, {"model.p.stg_orders"}),
+            {"model.p.stg_orders", "model.p.orders"},
+        )
+        # The graph is built from depends_on when the manifest has no child_map
+        del self.manifest["child_map"]
+        self.assertEqual(
+            datadict_manifest.downstream_models(self.manifest, {"model.p.stg_orders"}),
+            {"model.p.stg_orders", "model.p.orders"},
+        )
+
+    def test_models_for_files(self):
+        self.assertEqual(
+            datadict_manifest.models_for_files(
+                self.manifest, ["./models/customers.sql", "models/customers.yml"]
+            ),
+            {"model.p.customers"},
+        )
+
+    def test_select_changed_models(self):
+        manifest_path = os.path.join(self.temp_dir, "manifest.json")
+        state_path = os.path.join(self.temp_dir, "state")
+        os.makedirs(state_path)
+        with open(manifest_path, "w") as file:
+            json.dump(self.manifest, file)
+        with open(os.path.join(state_path, "manifest.json"), "w") as file:
+            json.dump(self.baseline, file)
+        self.assertEqual(
+            datadict_manifest.select_changed_models(manifest_path, state=state_path),
+            {"stg_orders", "orders", "payments"},
+        )
+        self.assertIsNone(
+            datadict_manifest.select_changed_models(
+                manifest_path, state=os.path.join(self.temp_dir, "missing")
+            )
+        )
+
+    def test_match_selectors(self):
+        self.manifest["nodes"]["model.p.orders"]["tags"] = ["finance"]
+        self.manifest["nodes"]["model.p.payments"]["config"] = {"tags": ["finance"]}
+        self.manifest["nodes"]["model.p.stg_orders"]["fqn"] = [
+            "p",
+            "staging",
+            "stg_orders",
+        ]
+        self.manifest["nodes"]["model.p.stg_orders"][
+            "original_file_path"
+        ] = "models/staging/stg_orders.sql"
+
+        def select(*selectors):
+            return datadict_manifest.match_selectors(
+                self.manifest, selectors, self.baseline
+            )
+
+        self.assertEqual(select("orders"), {"model.p.orders"})
+        self.assertEqual(select("stg_*"), {"model.p.stg_orders"})
+        self.assertEqual(select("staging"), {"model.p.stg_orders"})
+        self.assertEqual(select("path:models/staging"), {"model.p.stg_orders"})
+        self.assertEqual(select("tag:finance"), {"model.p.orders", "model.p.payments"})
+        self.assertEqual(select("+orders"), {"model.p.orders", "model.p.stg_orders"})
+        self.assertEqual(
+            select("stg_orders+"), {"model.p.orders", "model.p.stg_orders"}
+        )
+        self.assertEqual(select("stg_orders+0"), {"model.p.stg_orders"})
+        self.assertEqual(
+            select("@stg_orders"), {"model.p.orders", "model.p.stg_orders"}
+        )
+        self.assertEqual(select("state:new"), {"model.p.payments"})
+        # Spaces combine selectors as a union, and commas as an intersection
+        self.assertEqual(
+            select("customers tag:finance,orders"),
+            {"model.p.customers", "model.p.orders"},
+        )
+        self.assertEqual(
+            select("customers", "payments"), {"model.p.customers", "model.p.payments"}
+        )
+        with self.assertRaises(ValueError):
+            select("unknown:value")
+
+    def test_select_models(self):
+        self.manifest["nodes"]["model.p.orders"][
+            "patch_path"
+        ] = "p://models/marts/orders.yml"
+        manifest_path = os.path.join(self.temp_dir, "manifest.json")
+        with open(manifest_path, "w") as file:
+            json.dump(self.manifest, file)
+        self.assertEqual(
+            datadict_manifest.select_models(manifest_path, ["stg_orders+"], ["orders"]),
+            {"stg_orders"},
+        )
+        self.assertEqual(
+            datadict_manifest.select_models(manifest_path, exclude=["stg_orders"]),
+            {"orders", "customers", "payments"},
+        )
+        self.assertIsNone(
+            datadict_manifest.select_models(manifest_path, ["state:modified"])
+        )
+        self.assertEqual(
+            datadict_manifest.model_yaml_files(manifest_path, {"orders", "customers"}),
+            [os.path.join("models", "marts", "orders.yml")],
+        )
+
+
+class TestGenerate(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+        for name in ["orders", "customers", "payments", "refunds"]:
+            with open(os.path.join(self.temp_dir, f"{name}.sql"), "w") as file:
+                file.write("select 1 as id\n")
+        with open(os.path.join(self.temp_dir, "orders.yml"), "w") as file:
+            file.write(
+                "version: 2\nmodels:\n  - name: orders\n    columns:\n"
+                "      - name: id\n        data_type: integer\n        description: The order\n"
+                "      - name: removed\n        data_type: text\n        description: ''\n"
+            )
+        with open(os.path.join(self.temp_dir, "customers.yml"), "w") as file:
+            file.write(
+                "version: 2\nmodels:\n  - name: customers\n    columns:\n"
+                "      - name: id\n        data_type: integer\n        description: ''\n"
+            )
+        self.codegen_calls = []
+
+    def tearDown(self):
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def codegen_output(self, model_names):
+        output = "12:00:00  Running with dbt\n12:00:01  version: 2\n\nmodels:\n"
+        for name in model_names:
+            output += (
+                f'  - name: {name}\n    description: ""\n    columns:\n'
+                '      - name: id\n        data_type: integer\n        description: ""\n\n'
+            )
+        return output + "12:00:02  Finished\n"
+
+    def stream_model_yaml(self, model_names, target_path=None, fast=False):
+        self.codegen_calls.append(sorted(model_names))
+        output = self.codegen_output(model_names)
+        yield from datadict_dbt.iter_model_yamls(io.StringIO(output), fast)
+
+    def test_iter_model_yamls(self):
+        output = self.codegen_output(["orders", "customers"])
+        for fast in [False, True]:
+            models = list(datadict_dbt.iter_model_yamls(io.StringIO(output), fast))
+            self.assertEqual(
+                [model["name"] for model in models], ["orders", "customers"]
+            )
+            self.assertEqual(
+                models[0]["columns"],
+                [{"name": "id", "data_type": "integer", "description": ""}],
+            )
+        self.assertEqual(
+            list(datadict_dbt.iter_model_yamls(io.StringIO("Compilation Error\n"))), []
+        )
+
+    def test_pipelined_generate(self):
+        customers_path = os.path.join(self.temp_dir, "customers.yml")
+        customers_mtime = os.stat(customers_path).st_mtime_ns
+        with unittest.mock.patch.object(
+            datadict_dbt, "validate_dbt", return_value=True
+        ), unittest.mock.patch.object(
+            datadict_dbt, "stream_model_yaml", side_effect=self.stream_model_yaml
+        ):
+            datadict_yaml.generate_model_yamls(
+                self.temp_dir, "models.yml", False, jobs=2, chunk_size=1
+            )
+
+        # Every model is generated in its own chunk
+        self.assertEqual(len(self.codegen_calls), 4)
+        # Existing files are merged, and unchanged files aren't written
+        orders = datadict_helpers.load_yaml_file_fast(
+            os.path.join(self.temp_dir, "orders.yml")
+        )
+        self.assertEqual(
+            orders["models"][0]["columns"],
+            [{"name": "id", "data_type": "integer", "description": "The order"}],
+        )
+        self.assertEqual(os.stat(customers_path).st_mtime_ns, customers_mtime)
+        # Missing models are added in a new file, sorted once they have all arrived
+        added = datadict_helpers.load_yaml_file_fast(
+            os.path.join(self.temp_dir, "models.yml")
+        )
+        self.assertEqual(
+            [model["name"] for model in added["models"]], ["payments", "refunds"]
+        )
+
+    def test_missing_models_are_appended(self):
+        models_path = os.path.join(self.temp_dir, "models.yml")
+        with open(models_path, "w") as file:
+            file.write("version: 2\nmodels: []\nsources:\n  - name: raw\n")
+        with unittest.mock.patch.object(
+            datadict_dbt, "validate_dbt", return_value=True
+        ), unittest.mock.patch.object(
+            datadict_dbt, "stream_model_yaml", side_effect=self.stream_model_yaml
+        ), unittest.mock.patch.object(
+            datadict_helpers, "append_file", wraps=datadict_helpers.append_file
+        ) as append_file:
+            datadict_yaml.generate_model_yamls(
+                self.temp_dir, "models.yml", False, sort=False, jobs=1, chunk_size=1
+            )
+        # Each missing model is appended on its own as it arrives, rather than held until codegen has finished
+        self.assertEqual(
+            [call.args[0] for call in append_file.call_args_list],
+            [models_path, models_path],
+        )
+        added = datadict_helpers.load_yaml_file_fast(models_path)
+        self.assertEqual(
+            sorted(model["name"] for model in added["models"]), ["payments", "refunds"]
+        )
+        self.assertEqual(added["sources"], [{"name": "raw"}])
+
+        # Deferred appends are kept with the rest of the content the file will be written with
+        os.remove(models_path)
+        with unittest.mock.patch.object(
+            datadict_dbt, "validate_dbt", return_value=True
+        ), unittest.mock.patch.object(
+            datadict_dbt, "stream_model_yaml", side_effect=self.stream_model_yaml
+        ):
+            result = datadict_api.generate(
+                self.temp_dir, sort=False, jobs=1, write=False
+            )
+        self.assertFalse(os.path.exists(models_path))
+        self.assertEqual(result.created_files, [os.path.normpath(models_path)])
+        result.write()
+        added = datadict_helpers.load_yaml_file_fast(models_path)
+        self.assertEqual(
+            sorted(model["name"] for model in added["models"]), ["payments", "refunds"]
+        )
+
+    def test_failed_write_cancels_codegen(self):
+        for index in range(20):
+            with open(os.path.join(self.temp_dir, f"model_{index}.sql"), "w") as file:
+                file.write("select 1 as id\n")
+        with unittest.mock.patch.object(
+            datadict_dbt, "validate_dbt", return_value=True
+        ), unittest.mock.patch.object(
+            datadict_dbt, "stream_model_yaml", side_effect=self.stream_model_yaml
+        ), unittest.mock.patch.object(
+            datadict_helpers, "output_model_file", side_effect=OSError("disk full")
+        ):
+            # The consumer stops at the first write, with far more models still to be put on the full queue
+            thread = threading.Thread(
+                target=datadict_yaml.generate_model_yamls,
+                args=(self.temp_dir, "models.yml", True),
+                kwargs={"jobs": 1, "chunk_size": 30},
+                daemon=True,
+            )
+            thread.start()
+            thread.join(timeout=10)
+        self.assertFalse(thread.is_alive())
+
+    def test_missing_models_added_to_pending_file(self):
+        # The file the new models are added to is loaded when its first model arrives, and is still waiting for
+        # its second model when the new models arrive
+        os.remove(os.path.join(self.temp_dir, "customers.yml"))
+        with open(os.path.join(self.temp_dir, "orders.yml"), "a") as file:
+            file.write("  - name: customers\n")
+
+        def stream_model_yaml(model_names, target_path=None, fast=False):
+            output = self.codegen_output(["orders", "payments", "refunds", "customers"])
+            yield from datadict_dbt.iter_model_yamls(io.StringIO(output), fast)
+
+        with unittest.mock.patch.object(
+            datadict_dbt, "validate_dbt", return_value=True
+        ), unittest.mock.patch.object(
+            datadict_dbt, "stream_model_yaml", side_effect=stream_model_yaml
+        ):
+            datadict_yaml.generate_model_yamls(
+                self.temp_dir, "orders.yml", False, sort=False, jobs=1, chunk_size=10
+            )
+        added = datadict_helpers.load_yaml_file_fast(
+            os.path.join(self.temp_dir, "orders.yml")
+        )
+        self.assertEqual(
+            [model["name"] for model in added["models"]],
+            ["orders", "customers", "payments", "refunds"],
+        )
+        self.assertEqual(
+            [column["name"] for column in added["models"][0]["columns"]], ["id"]
+        )
+
+
+class TestInformationSchema(unittest.TestCase):
+    def setUp(self):
+        self.relations = [
+            {
+                "model": "orders",
+                "database": "memory",
+                "schema": "analytics",
+                "identifier": "Orders",
+            },
+            {
+                "model": "customers",
+                "database": "memory",
+                "schema": "analytics",
+                "identifier": "customers",
+            },
+            {
+                "model": "stg_orders",
+                "database": "memory",
+                "schema": "staging",
+                "identifier": "stg_orders",
+            },
+            {
+                "model": "missing",
+                "database": "memory",
+                "schema": "staging",
+                "identifier": "missing",
+            },
+        ]
+
+    def test_build_columns_queries(self):
+        queries = datadict_dbt.build_columns_queries(self.relations, batch_size=1)
+        self.assertEqual(
+            [
+                (query["schema"], query["sql"].count("lower(table_name) in ('"))
+                for query in queries
+            ],
+            [("analytics", 1), ("analytics", 1), ("staging", 1), ("staging", 1)],
+        )
+        queries = datadict_dbt.build_columns_queries(self.relations)
+        self.assertEqual(len(queries), 2)
+        self.assertIn("in ('customers', 'orders')", queries[0]["sql"])
+        self.assertIn(datadict_dbt.INFORMATION_SCHEMA_PLACEHOLDER, queries[0]["sql"])
+
+    def test_model_relations(self):
+        node = {"resource_type": "model", "database": "db", "schema": "s"}
+        manifest = {
+            "nodes": {
+                "model.p.orders": {**node, "name": "orders", "alias": "fct_orders"},
+                "model.p.base": {
+                    **node,
+                    "name": "base",
+                    "config": {"materialized": "ephemeral"},
+                },
+            }
+        }
+        self.assertEqual(
+            datadict_manifest.model_relations(manifest, ["orders", "base"]),
+            [
+                {
+                    "model": "orders",
+                    "database": "db",
+                    "schema": "s",
+                    "identifier": "fct_orders",
+                }
+            ],
+        )
+
+    def test_single_run_operation(self):
+        output_queue = queue.Queue()
+        model_yaml = {"version": 2, "models": [{"name": "orders", "columns": []}]}
+        with unittest.mock.patch.object(
+            datadict_dbt, "get_model_columns", return_value=model_yaml
+        ) as get_model_columns:
+            datadict_yaml.run_codegen(
+                ["orders", "customers", "stg_orders"],
+                output_queue,
+                jobs=4,
+                chunk_size=1,
+                columns_from="information_schema",
+            )
+        # The models aren't chunked, as the run-operation batches its queries by database and schema
+        get_model_columns.assert_called_once_with(
+            ["orders", "customers", "stg_orders"], target_path=None
+        )
+        self.assertEqual(output_queue.get()["name"], "orders")
+        self.assertIsNone(output_queue.get())
+
+    @unittest.skipUnless(importlib.util.find_spec("duckdb"), "duckdb isn't installed")
+    def test_duckdb_columns(self):
+        import duckdb
+
+        connection = duckdb.connect()
+        connection.execute(
+            "create schema analytics; create schema staging;"
+            "create table analytics.Orders (ID integer, amount decimal(10, 2));"
+            "create table analytics.customers (id integer, name varchar);"
+            "create table staging.stg_orders (id integer);"
+            "create table staging.other (id integer);"
+        )
+        rows = []
+        for query in datadict_dbt.build_columns_queries(self.relations):
+            rows += connection.execute(
+                datadict_dbt.render_columns_query(query)
+            ).fetchall()
+        model_yaml = datadict_dbt.columns_to_models(self.relations, rows)
+        self.assertEqual(
+            [model["name"] for model in model_yaml["models"]],
+            ["orders", "customers", "stg_orders"],
+        )
+        self.assertEqual(
+            model_yaml["models"][0]["columns"],
+            [
+                {"name": "id", "data_type": "integer", "description": ""},
+                {"name": "amount", "data_type": "decimal(10,2)", "description": ""},
+            ],
+        )
+
+    @unittest.skipUnless(
+        shutil.which("dbt")
+        and importlib.util.find_spec("dbt")
+        and importlib.util.find_spec("dbt.adapters.duckdb"),
+        "dbt-duckdb isn't installed",
+    )
+    def test_macro_in_dbt_duckdb_project(self):
+        # A dbt project on a local DuckDB file, so the macro is run by dbt without a warehouse
+        project_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, project_dir)
+        os.makedirs(os.path.join(project_dir, "models"))
+        files = {
+            "dbt_project.yml": (
+                "name: datadict_test\nversion: '1.0.0'\nconfig-version: 2\nprofile: datadict_test\n"
+            ),
+            "profiles.yml": (
+                "datadict_test:\n  target: dev\n  outputs:\n    dev:\n      type: duckdb\n"
+                f"      path: {os.path.join(project_dir, 'warehouse.duckdb')}\n      threads: 1\n"
+            ),
+            "packages.yml": f"packages:\n  - local: {datadict_dbt.PACKAGE_PATH}\n",
+            os.path.join(
+                "models", "orders.sql"
+            ): "select 1 as ID, cast(2.5 as decimal(10, 2)) as amount\n",
+            os.path.join("models", "customers.sql"): "select 1 as id, 'a' as name\n",
+        }
+        for path, content in files.items():
+            with open(os.path.join(project_dir, path), "w") as file:
+                file.write(content)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(project_dir)
+        with unittest.mock.patch.dict(os.environ, {"DBT_PROFILES_DIR": project_dir}):
+            for command in (["dbt", "deps"], ["dbt", "run"]):
+                subprocess.run(command, check=True, capture_output=True)
+            model_yaml = datadict_dbt.get_model_columns(["orders", "customers"])
+        self.assertEqual(
+            {model["name"]: model["columns"] for model in model_yaml["models"]},
+            {
+                "orders": [
+                    {"name": "id", "data_type": "integer", "description": ""},
+                    {"name": "amount", "data_type": "decimal(10,2)", "description": ""},
+                ],
+                "customers": [
+                    {"name": "id", "data_type": "integer", "description": ""},
+                    {"name": "name", "data_type": "varchar", "description": ""},
+                ],
+            },
+        )
+
+
+class TestStartup(unittest.TestCase):
+    # The time the CLI may take to start, over that of the Python interpreter itself. Raise it deliberately.
+    STARTUP_BUDGET_SECONDS = 0.15
+    # Modules that mustn't be imported until a command needs them
+    DEFERRED_MODULES = [
+        "ruamel.yaml",
+        "subprocess",
+        "concurrent.futures.process",
+        "ctypes",
+        "socketserver",
+        "datadict.datadict_class",
+        "datadict.datadict_yaml",
+        "tracemalloc",
+        "mmap",
+    ]
+
+    def run_python(self, code):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            cwd=root,
+            env={**os.environ, "PYTHONPATH": root},
+        )
+        return time.perf_counter() - start, result.stdout.decode("UTF-8")
+
+    def test_imports_are_lazy(self):
+        _, output = self.run_python(
+            "import json, sys, datadict; datadict.cli; print(json.dumps(sorted(sys.modules)))"
+        )
+        modules = json.loads(output)
+        for module in self.DEFERRED_MODULES:
+            self.assertNotIn(module, modules)
+        # The lazy attributes still resolve
+        self.assertTrue(callable(datadict.generate_model_yamls))
+
+    def test_startup_budget(self):
+        interpreter = min(self.run_python("pass")[0] for _ in range(5))
+        startup = min(self.run_python("from datadict import cli")[0] for _ in range(5))
+        self.assertLess(
+            startup - interpreter,
+            self.STARTUP_BUDGET_SECONDS,
+            f"CLI startup took {(startup - interpreter) * 1000:.1f}ms over the interpreter",
+        )
+
+
+class TestReport(unittest.TestCase):
+    def setUp(self):
+        # Create a temporary directory to store the test files
+        self.temp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        datadict_report.stop_reporting()
+        # Remove the temporary directory and its contents after the test
+        shutil.rmtree(self.temp_dir)
+
+    def test_levels(self):
+        class unformattable:
+            def __format__(self, spec):
+                raise AssertionError("Message formatted when it wasn't logged")
+
+        datadict_report.start_reporting("apply", datadict_report.NORMAL)
+        with self.assertLogs(level="INFO") as logs:
+            datadict_report.event(
+                "column_updated", "Field '{column}'", column=unformattable()
+            )
+            datadict_report.event(
+                "file_updated", "File {file} has been updated", file="a.yml"
+            )
+            datadict_report.event(
+                "column_added", "Missing column '{column}'", column="id"
+            )
+        self.assertEqual(
+            logs.output,
+            [
+                "INFO:root:File a.yml has been updated",
+                "WARNING:root:Missing column 'id'",
+            ],
+        )
+        summary = datadict_report.stop_reporting()
+        self.assertEqual(
+            summary["counts"],
+            {"file_updated": 1, "column_updated": 1, "column_added": 1},
+        )
+
+    def test_verbose_and_quiet(self):
+        datadict_report.start_reporting("apply", datadict_report.VERBOSE)
+        with self.assertLogs(level="INFO") as logs:
+            datadict_report.event(
+                "model_correct", "Model {model} is correct", model="orders"
+            )
+        self.assertEqual(logs.output, ["INFO:root:Model orders is correct"])
+        datadict_report.stop_reporting()
+
+        datadict_report.start_reporting("apply", datadict_report.QUIET)
+        with self.assertLogs(level="INFO") as logs:
+            datadict_report.event(
+                "file_updated", "File {file} has been updated", file="a.yml"
+            )
+            datadict_report.event(
+                "file_missing", "File '{file}' not found.", file="b.yml"
+            )
+        self.assertEqual(logs.output, ["ERROR:root:File 'b.yml' not found."])
+
+    def test_event_stream(self):
+        events_path = os.path.join(self.temp_dir, "events.jsonl")
+        datadict_report.start_reporting("apply", datadict_report.QUIET, events_path)
+        datadict_report.event("file_checked", "Checking file '{file}'...", file="a.yml")
+        datadict_report.stop_reporting()
+        with open(events_path) as file:
+            events = [json.loads(line) for line in file]
+        self.assertEqual(
+            [(event["event"], event.get("file")) for event in events],
+            [("file_checked", "a.yml"), ("summary", None)],
+        )
+        self.assertEqual(events[-1]["counts"], {"file_checked": 1})
+
+
+class TestProgress(unittest.TestCase):
+    class terminal(io.StringIO):
+        def isatty(self):
+            return True
+
+    def tearDown(self):
+        datadict_progress.stop_progress()
+
+    def test_status(self):
+        progress = datadict_progress.progress("apply", io.StringIO(), interval=3600)
+        progress.add_total("parsed", 100)
+        progress.advance("scanned", 100)
+        progress.advance("parsed", 25)
+        progress.advance("columns", 500)
+        status = progress.status(now=progress._started + 5)
+        self.assertEqual((status["done"], status["total"]), (25, 100))
+        self.assertAlmostEqual(status["files_per_second"], 5.0)
+        self.assertAlmostEqual(status["columns_per_second"], 100.0)
+        self.assertAlmostEqual(status["eta"], 15.0)
+        self.assertEqual(
+            progress.render(now=progress._started + 5),
+            "[#####---------------]  25% 25/100 parsed | scanned 100 | 5.0 files/s, 100 columns/s | ETA 0:15",
+        )
+
+    def test_terminal_bar(self):
+        stream = self.terminal()
+        datadict_progress.start_progress("apply", stream, interval=0)
+        datadict_progress.add_total("parsed", 2)
+        datadict_progress.advance("parsed")
+        self.assertTrue(
+            stream.getvalue().startswith(
+                "\r\x1b[K[##########----------]  50% 1/2 parsed"
+            )
+        )
+        datadict_progress.advance("parsed")
+        datadict_progress.stop_progress()
+        self.assertIn("100% 2/2 parsed", stream.getvalue())
+        self.assertTrue(stream.getvalue().endswith("\n"))
+
+    def test_log_lines(self):
+        datadict_progress.start_progress("generate", io.StringIO(), interval=0)
+        datadict_progress.add_total("models_generated", 4)
+        with self.assertLogs(level="INFO") as logs:
+            datadict_progress.advance("models_sent", 4)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Progress of 'generate': [", logs.output[0])
+        self.assertIn("0/4 generated | models sent to codegen 4", logs.output[0])
+
+
+class TestScanner(unittest.TestCase):
+    MODEL_YAML = """version: 2
+defaults: &defaults
+  description: Shared
+models:
+  - name: orders
+    description: "Orders"
+    config: {materialized: table, tags: [nightly]}
+    columns:
+      - name: id
+        description: The id
+        data_type: integer
+        tests: [unique, not_null]
+      - name: "amount"
+        description: ~
+      - name: note
+        description: >
+          Folded
+          text
+  - name: empty
+  - name: typed
+    columns:
+      - name: flag
+        description: 123
+  - name: merged
+    columns:
+      - <<: *defaults
+        name: shared
+sources:
+  - name: raw
+"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.file_path = os.path.join(self.temp_dir, "models.yml")
+        with open(self.file_path, "w") as file:
+            file.write(self.MODEL_YAML)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_iter_model_columns(self):
+        self.assertEqual(
+            list(datadict_scanner.iter_model_columns(self.file_path)),
+            [
+                ("orders", None, None, None),
+                ("orders", "id", "The id", "integer"),
+                ("orders", "amount", None, None),
+                ("orders", "note", "Folded text\n", None),
+                ("empty", None, None, None),
+                # A description that isn't a string, and a merge key, are read from the loaded file instead
+                ("typed", None, None, None),
+                ("typed", "flag", 123, None),
+                ("merged", None, None, None),
+                ("merged", "shared", "Shared", None),
+            ],
+        )
+
+    def test_read_file_fields_matches_loaded_file(self):
+        expected = datadict_index.collect_file_fields(
+            datadict_helpers.load_yaml_file_fast(self.file_path)
+        )
+        expected[1]["description"] = None
+        self.assertEqual(
+            [
+                {key: field.get(key) for key in ("name", "model", "description")}
+                for field in datadict_scanner.read_file_fields(self.file_path)
+            ],
+            expected,
+        )
+
+        sources_path = os.path.join(self.temp_dir, "sources.yml")
+        with open(sources_path, "w") as file:
+            file.write("sources:\n  - name: raw\n")
+        self.assertIsNone(datadict_scanner.read_file_fields(sources_path))
+
+    def test_check_files_for_models_without_loading(self):
+        yaml_obj = ruamel.yaml.YAML()
+        loaded = datadict_yaml.check_files_for_models(yaml_obj, [self.file_path])
+        streamed = datadict_yaml.check_files_for_models(
+            yaml_obj, [self.file_path], load=False
+        )
+        self.assertEqual(streamed["model_list"], loaded["model_list"])
+        self.assertEqual(len(loaded["file_yamls"]), 1)
+        self.assertEqual(streamed["file_yamls"], [])
+
+
 if __name__ == "__main__":
     unittest.main()